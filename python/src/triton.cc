@@ -36,7 +36,11 @@
 
 #include <Python.h>
 #include <cctype>
+#include <chrono>
 #include <fstream>
+#include <map>
+#include <memory>
+#include <mutex>
 #include <optional>
 #include <pybind11/buffer_info.h>
 #include <pybind11/functional.h>
@@ -69,6 +73,51 @@ void init_triton_runtime(py::module &&m) {
 /* Python bindings for triton::ir                                            */
 /*****************************************************************************/
 
+// Records the wall time of every pass run by a pass manager, as
+// (pass name, start, duration) in seconds since the recorder was created.
+// Nested pass managers may run passes on several threads concurrently.
+class PassTimings : public mlir::PassInstrumentation {
+public:
+  using Record = std::tuple<std::string, double, double>;
+
+  struct Records {
+    std::mutex mutex;
+    std::vector<Record> records;
+  };
+
+  PassTimings(std::shared_ptr<Records> records)
+      : records(records), origin(std::chrono::steady_clock::now()) {}
+
+  void runBeforePass(mlir::Pass *pass, mlir::Operation *) override {
+    auto now = std::chrono::steady_clock::now();
+    std::lock_guard<std::mutex> lock(records->mutex);
+    starts[pass] = now;
+  }
+
+  void runAfterPass(mlir::Pass *pass, mlir::Operation *) override {
+    record(pass);
+  }
+
+  void runAfterPassFailed(mlir::Pass *pass, mlir::Operation *) override {
+    record(pass);
+  }
+
+private:
+  void record(mlir::Pass *pass) {
+    auto now = std::chrono::steady_clock::now();
+    std::lock_guard<std::mutex> lock(records->mutex);
+    auto start = starts[pass];
+    std::chrono::duration<double> offset = start - origin;
+    std::chrono::duration<double> duration = now - start;
+    records->records.emplace_back(pass->getName().str(), offset.count(),
+                                  duration.count());
+  }
+
+  std::shared_ptr<Records> records;
+  std::chrono::steady_clock::time_point origin;
+  std::map<mlir::Pass *, std::chrono::steady_clock::time_point> starts;
+};
+
 void init_triton_ir(py::module &&m) {
   using ret = py::return_value_policy;
   using namespace pybind11::literals;
@@ -1373,6 +1422,13 @@ void init_triton_ir(py::module &&m) {
         self.create<mlir::gpu::BarrierOp>(loc);
       });
 
+  py::class_<PassTimings::Records, std::shared_ptr<PassTimings::Records>>(
+      m, "pass_timings")
+      .def("records", [](PassTimings::Records &self) {
+        std::lock_guard<std::mutex> lock(self.mutex);
+        return self.records;
+      });
+
   py::class_<mlir::PassManager>(m, "pass_manager")
       .def(py::init<mlir::MLIRContext *>())
       .def("enable_debug",
@@ -1390,6 +1446,12 @@ void init_triton_ir(py::module &&m) {
                  /*printAfterOnlyOnFailure*/ false, llvm::dbgs(),
                  printingFlags);
            })
+      .def("enable_timing",
+           [](mlir::PassManager &self) {
+             auto records = std::make_shared<PassTimings::Records>();
+             self.addInstrumentation(std::make_unique<PassTimings>(records));
+             return records;
+           })
       .def("run",
            [](mlir::PassManager &self, mlir::ModuleOp &mod) {
              // TODO: maybe dump module to file and print error for better
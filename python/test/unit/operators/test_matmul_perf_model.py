@@ -0,0 +1,62 @@
+import itertools
+import random
+
+import pytest
+import torch
+
+import triton
+from triton.ops.matmul_perf_model import (SAMPLE_FIELDS, DeviceModel, calibrate,
+                                          calibration_loss)
+
+
+def make_samples(model, n_samples, noise=0.05, seed=0):
+    # a recorded dataset, for a device that `model` describes exactly
+    rng = random.Random(seed)
+    samples = []
+    for _ in range(n_samples):
+        sample = dict(M=rng.choice([128, 512, 2048, 8192]), N=rng.choice([128, 1024, 4096]),
+                      K=rng.choice([64, 512, 4096]), BLOCK_M=rng.choice([32, 64, 128]),
+                      BLOCK_N=rng.choice([32, 64, 128]), BLOCK_K=32, SPLIT_K=rng.choice([1, 1, 4]),
+                      num_warps=rng.choice([2, 4, 8]), num_stages=3, dtype="float16")
+        sample["time_ms"] = model.estimate(*[sample[field] for field in SAMPLE_FIELDS]) * rng.lognormvariate(0, noise)
+        samples.append(sample)
+    return samples
+
+
+def test_calibrate():
+    device = DeviceModel("Other", 60, 900, {"float16": 150}, saturating_ctas=48, l2_hit_rate=0.5,
+                         l2_bw_ratio=2.0, store_efficiency=0.9)
+    samples = make_samples(device, 200)
+    # A100 coefficients
+    default = DeviceModel("Other", 60, 900, {"float16": 150})
+    fitted, loss = calibrate(default, samples)
+    assert loss < calibration_loss(default, samples) / 10
+    # close to the noise of the samples
+    assert loss < 2 * 0.05 ** 2
+    # the fitted model ranks the configs of new shapes like the device does
+    for sample in make_samples(device, 20, noise=0, seed=1):
+        configs = [dict(sample, BLOCK_M=block_m, BLOCK_N=block_n, SPLIT_K=split_k)
+                   for block_m in [32, 64, 128] for block_n in [32, 64, 128] for split_k in [1, 4]]
+
+        def best(model):
+            return min(configs, key=lambda config: model.estimate(*[config[field] for field in SAMPLE_FIELDS]))
+        assert device.estimate(*[best(fitted)[field] for field in SAMPLE_FIELDS]) <= \
+            1.05 * device.estimate(*[best(device)[field] for field in SAMPLE_FIELDS])
+    # models are stored as JSON
+    assert DeviceModel.from_json(fitted.to_json()).coefficients() == fitted.coefficients()
+
+
+@pytest.mark.parametrize("num_sm", [108, 16])
+def test_estimate_configs(num_sm):
+    model = DeviceModel("Device", num_sm, 1555, {"float16": 312})
+    configs = [triton.Config({'BLOCK_M': block_m, 'BLOCK_N': block_n, 'BLOCK_K': 32, 'SPLIT_K': split_k},
+                             num_warps=num_warps, num_stages=3)
+               for block_m, block_n, split_k, num_warps in itertools.product([16, 64, 256], [16, 64, 256], [1, 4],
+                                                                             [2, 4, 8])]
+    A = torch.empty(0, dtype=torch.float16)
+    for M, N, K in [(16, 16, 16), (1000, 3000, 512), (8192, 8192, 8192)]:
+        estimates = model.perf_model().batched(configs, A=A, M=M, N=N, K=K)
+        for config, estimate in zip(configs, estimates):
+            expected = model.estimate_matmul_time(config.num_warps, config.num_stages, A, None, None, M, N, K,
+                                                  **config.kwargs)
+            assert estimate == pytest.approx(expected, rel=1e-12)
@@ -0,0 +1,379 @@
+import json
+import multiprocessing
+import random
+import threading
+import time
+
+import pytest
+import torch
+
+import triton
+import triton.language as tl
+from triton.compiler import OutOfResources
+from triton.runtime import (Config, ConfigSpace, Heuristics, config_space, search,
+                            telemetry)
+from triton.runtime.autotuner import Autotuner
+from triton.runtime.compile_farm import CompileResult
+from triton.runtime.tuning_cache import TuningTable, import_results
+from triton.testing import Bencher, BenchResult
+
+
+class SyntheticKernel:
+    """A config whose runs take :code:`mean` ms, with gaussian noise."""
+
+    def __init__(self, mean, noise=0.05):
+        self.mean = mean
+        self.noise = noise
+
+    def __repr__(self):
+        return f"SyntheticKernel({self.mean})"
+
+
+def make_measure(rng):
+    spent = []
+
+    def measure(config, rep):
+        n_runs = max(1, int(rep / config.mean))
+        spent.append(n_runs * config.mean)
+        return [rng.gauss(config.mean, config.noise * config.mean) for _ in range(n_runs)]
+    return measure, spent
+
+
+@pytest.mark.parametrize("strategy", [search.Exhaustive(), search.SuccessiveHalving(), search.Racing()])
+def test_search_strategies(strategy):
+    rng = random.Random(0)
+    # like `get_configs_io_bound()`: a few good configs, many clearly slower ones
+    configs = [SyntheticKernel(0.1 * (1 + i / 20)) for i in range(4)] + \
+              [SyntheticKernel(rng.uniform(0.3, 1.0)) for _ in range(60)]
+    measure, spent = make_measure(rng)
+    samples = strategy(configs, measure)
+    timings = {config: search.timing(config_samples) for config, config_samples in samples.items()}
+    assert min(timings, key=timings.get) is configs[0]
+    if not isinstance(strategy, search.Exhaustive):
+        assert sum(spent) < 100 * len(configs) / 10
+
+
+@pytest.mark.parametrize("strategy", [search.SuccessiveHalving(), search.Racing()])
+def test_search_failed_configs(strategy):
+    configs = [SyntheticKernel(1.0), SyntheticKernel(2.0)]
+
+    def measure(config, rep):
+        return [float('inf')] if config is configs[0] else [config.mean] * 2
+    samples = strategy(configs, measure)
+    assert samples[configs[0]] == [float('inf')]
+    assert search.timing(samples[configs[1]]) == (2.0, 2.0, 2.0)
+
+
+def test_timing():
+    assert search.timing([4, 1, 3, 2, 5]) == (3, 1.8, 4.2)
+
+
+def test_heuristics_depends_on():
+    class Kernel:
+        arg_names = ['X', 'N', 'BLOCK', 'num_warps']
+
+        def run(self, *args, **kwargs):
+            return kwargs
+    calls = []
+
+    def block(nargs):
+        calls.append(nargs['N'])
+        return nargs['N'] * 2
+    values = {'BLOCK': block, 'num_warps': lambda nargs: nargs['BLOCK'] // 32}
+    kernel = Heuristics(Kernel(), Kernel.arg_names, values, depends_on=['N'])
+    for n in [64, 64, 128, 64]:
+        assert kernel.run(None, n, grid=(1,)) == {'grid': (1,), 'BLOCK': 2 * n, 'num_warps': n // 16}
+    assert calls == [64, 128]
+    with pytest.raises(ValueError):
+        Heuristics(Kernel(), Kernel.arg_names, values, depends_on=['M'])
+
+
+def test_config_space():
+    space = ConfigSpace(BLOCK_M=[16, 32], BLOCK_N=[32, 64], num_warps=[2, 4], num_stages=[2, 3],
+                        constraints=[lambda c: c['BLOCK_M'] <= c['BLOCK_N'],
+                                     lambda c: c['num_warps'] == (2 if c['BLOCK_N'] <= 32 else 4)])
+    configs = list(space)
+    assert len(space) == len(configs) == 8
+    assert all(config.kwargs['BLOCK_M'] <= config.kwargs['BLOCK_N'] for config in configs)
+    assert [(config.kwargs['BLOCK_N'], config.num_warps) for config in configs if config.num_stages == 2] == \
+        [(32, 2), (64, 4), (32, 2), (64, 4)]
+
+
+class FakeCompiledKernel:
+    """A compiled kernel using the given resources, instead of those of a loaded binary."""
+
+    def __init__(self, n_regs, n_spills=0, shared=0, num_warps=4):
+        self.n_regs = n_regs
+        self.n_spills = n_spills
+        self.shared = shared
+        self.num_warps = num_warps
+
+    def _init_handles(self):
+        if self.shared > 49152:
+            raise OutOfResources(self.shared, 49152, "shared memory")
+
+
+def test_prune_by_resources(monkeypatch):
+    # BLOCK -> (registers per thread, spilled registers, shared memory); BLOCK=8 fails to compile
+    usage = {16: (32, 0, 0), 32: (255, 0, 0), 64: (64, 4, 0), 128: (64, 0, 98304), 256: (40, 0, 0), 512: (48, 0, 0)}
+
+    class Kernel:
+        arg_names = ['N']
+
+        def compile_job(self, *args, **kwargs):
+            return kwargs['BLOCK']
+
+        def warmup(self, *args, num_warps, num_stages, **kwargs):
+            return FakeCompiledKernel(*usage[kwargs['BLOCK']], num_warps=num_warps)
+    compiled = []
+
+    def compile_many(jobs, max_workers=None):
+        compiled.extend(jobs)
+        return [CompileResult(job, "ptxas error" if job == 8 else None, 0.0) for job in jobs]
+    monkeypatch.setattr(config_space, "compile_many", compile_many)
+    configs = [Config({'BLOCK': block}, num_warps=16 if block == 32 else 4) for block in [8, 16, 32, 64, 128, 256, 512]]
+    kept, dropped = config_space.prune_by_resources(Kernel(), configs[:5], [1024], {})
+    assert kept == [configs[1]]
+    assert dropped[configs[0]] == "ptxas error"
+    assert dropped[configs[2]].startswith("out of resources: registers, required: 130560")
+    assert dropped[configs[3]].startswith("out of resources: spilled registers, required: 4")
+    assert dropped[configs[4]].startswith("out of resource: shared memory")
+    assert config_space.prune_by_resources(Kernel(), configs[3:4], [1024], {}, config_space.ResourceLimits(max_spills=4))[0] \
+        == [configs[3]]
+    # configs are compiled by increasing estimated time, until `top_k` of them fit
+    del compiled[:]
+    perf_model = lambda N, BLOCK, num_stages, num_warps: BLOCK
+    kernel = Autotuner(Kernel(), Kernel.arg_names, configs, ['N'], None, persistent=False,
+                       prune_configs_by={'perf_model': perf_model, 'top_k': 2, 'resources': True})
+    kernel.nargs = {'N': 1024}
+    assert kernel.prune_configs({}) == [configs[1], configs[5]]
+    assert compiled == [8, 16, 32, 64, 128, 256]
+    assert sorted(kernel.resource_report) == sorted(str(configs[i]) for i in [0, 2, 3, 4])
+
+
+def test_telemetry(tmp_path):
+    compiled = []
+
+    class Kernel:
+        arg_names = ['N']
+
+        def warmup(self, *args, **kwargs):
+            compiled.append(kwargs['BLOCK'])
+
+        def run(self, *args, **kwargs):
+            return kwargs['BLOCK']
+    configs = [Config({'BLOCK': block}) for block in [16, 32, 64]]
+    kernel = Autotuner(Kernel(), Kernel.arg_names, configs, ['N'], None, persistent=False, precompile=False)
+    fastest_large = 64
+
+    def bench(*args, config, rep=100, **meta):
+        # 16 is the fastest for small N, `fastest_large` for large N; 32 runs out of resources
+        if config.kwargs['BLOCK'] == 32:
+            return [float('inf')]
+        return [1.0 if config.kwargs['BLOCK'] == (16 if args[0] < 1024 else fastest_large) else 2.0]
+    kernel._bench = bench
+    log = tmp_path / "tuning.jsonl"
+    with telemetry.log(str(log)):
+        for n in [128, 128, 4096, 256]:
+            kernel.run(n, grid=(1,))
+        # retuned, e.g. by another process, with a different winner
+        kernel.cache.clear()
+        fastest_large = 16
+        kernel.run(4096, grid=(1,))
+    assert compiled == [16, 32, 64] * 4
+    assert kernel.stats.tunes == 4
+    assert kernel.stats.winner_changes == 1
+    assert kernel.stats.out_of_resources == 4
+    assert kernel.stats.failed == 0
+    assert kernel.stats.summary() in telemetry.summary()
+    events = [json.loads(line) for line in log.read_text().splitlines()]
+    assert [event["key"] for event in events] == [[128], [4096], [256], [4096]]
+    assert [event["best"] for event in events] == [str(configs[0]), str(configs[2]), str(configs[0]), str(configs[0])]
+    assert [event["changed"] for event in events] == [False, False, False, True]
+    assert all(event["margin"] == 1.0 for event in events)
+    # configs dropped by pruning by resources are counted once, as out of resources or as failed
+    dropped = {str(configs[1]): "out of resources: spilled registers, required: 4, limit: 0",
+               str(configs[2]): "ptxas error"}
+    report = {"compile_wait_s": 0.0, "bench_s": 0.0,
+              "configs": {str(configs[0]): {"compile_s": 0.0, "bench_s": 0.0, "runs": 1, "error": None}}}
+    event = telemetry.TuningStats("kernel").record_tune((1,), 3, 0, 0.0, report, {configs[0]: (1.0,) * 3}, dropped)
+    assert (event["pruned"], event["failed"], event["out_of_resources"]) == (0, 1, 1)
+
+
+@triton.jit
+def _tuned(X, BLOCK: tl.constexpr):
+    pass
+
+
+def _put_entries(process):
+    table = TuningTable(_tuned, ["a", "b"])
+    for i in range(20):
+        table.put((process, i), 0, 1.0)
+
+
+def _import_entries(path):
+    table = TuningTable(_tuned, ["a", "b"])
+    for i in range(20):
+        table.entries = {repr(("import", i)): {"config": 0, "timing": 1.0}}
+        with open(path, "w") as f:
+            json.dump({"tables": [table.to_json()]}, f)
+        import_results(path)
+
+
+def test_tuning_table_concurrent_put(tmp_path, monkeypatch):
+    monkeypatch.setenv("TRITON_CACHE_DIR", str(tmp_path / "cache"))
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=_put_entries, args=(i,)) for i in range(4)]
+    procs.append(ctx.Process(target=_import_entries, args=(str(tmp_path / "tables.json"),)))
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join()
+    # no process overwrote the entries of another
+    table = TuningTable(_tuned, ["a", "b"])
+    table.load()
+    assert len(table.entries) == 100
+
+
+class FakeTimer:
+    """Runs of :code:`mean` ms, with gaussian noise."""
+
+    def __init__(self, mean, noise, seed=0):
+        self.rng = random.Random(seed)
+        self.mean = mean
+        self.noise = noise
+        self.calls = 0
+
+    def measure(self, fn, n, before=None):
+        self.calls += n
+        return [self.rng.gauss(self.mean, self.noise) for _ in range(n)]
+
+
+def test_bencher():
+    result = BenchResult([5, 1, 4, 2, 3])
+    assert (result.median, result.iqr) == (3, 2)
+    assert result.quantiles([0.2, 0.8]) == (1.8, 4.2)
+    assert result.ci[0] <= result.median <= result.ci[1]
+    # fixed repetition time
+    timer = FakeTimer(mean=0.1, noise=0.01)
+    result = Bencher(timer=timer, flush=False).run(lambda: None, warmup=1, rep=10)
+    assert 90 <= len(result.samples) <= 110
+    assert abs(result.median - 0.1) < 0.005
+    # adaptive repetition, until the interval of the median is within 1%
+    timer = FakeTimer(mean=0.1, noise=0.01)
+    result = Bencher(timer=timer, flush=False).run(lambda: None, warmup=1, rep=10, rel_ci=0.01, max_rep=1000)
+    assert len(result.samples) > 110
+    assert result.rel_ci <= 0.01
+    # the interval can't be reached within `max_rep`
+    timer = FakeTimer(mean=0.1, noise=0.01)
+    result = Bencher(timer=timer, flush=False).run(lambda: None, warmup=1, rep=10, rel_ci=1e-6, max_rep=50)
+    assert 50 <= sum(result.samples) < 65
+    # threads sharing a bencher benchmark one at a time
+    running = []
+
+    class SlowTimer(FakeTimer):
+        def measure(self, fn, n, before=None):
+            running.append(None)
+            assert len(running) == 1, "concurrent measurements"
+            time.sleep(0.001)
+            running.pop()
+            return super().measure(fn, n, before)
+    bencher = Bencher(timer=SlowTimer(mean=0.1, noise=0.01), flush=False)
+    errors = []
+
+    def run():
+        try:
+            bencher.run(lambda: None, warmup=1, rep=1)
+        except AssertionError as e:
+            errors.append(e)
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+
+
+@triton.jit
+def _store(X, i, BLOCK: tl.constexpr):
+    tl.store(X, i + 1)
+
+
+def test_autotune_bucketing(monkeypatch):
+    from triton.runtime.bucketing import Combine, Divisibility, Edges, PowerOfTwo
+    assert [PowerOfTwo(min=16)(n) for n in [1, 16, 17, 1000]] == [16, 16, 32, 1024]
+    assert [Edges([256, 64])(n) for n in [1, 64, 65, 300]] == [64, 64, 256, float("inf")]
+    assert [Divisibility()(n) for n in [32, 24, 6, 7]] == [16, 8, 2, 1]
+    assert Combine(PowerOfTwo(), Divisibility())(48) == (64, 16)
+    configs = [triton.Config({'BLOCK': block}) for block in [128, 256]]
+    benchmarked = []
+
+    def bench(self, *args, config, **meta):
+        benchmarked.append(config)
+        return [1.0]
+    monkeypatch.setattr(triton.runtime.autotuner.Autotuner, "_bench", bench)
+    x = torch.empty(1, dtype=torch.int32, device='cuda')
+    tuned = triton.autotune(configs, key=['i'], bucket=PowerOfTwo())(_store)
+    for i in [3, 4, 5, 8, 4]:
+        tuned[(1,)](x, i)
+    # 3 and 4 share a bucket, as do 5 and 8
+    assert len(benchmarked) == 2 * len(configs)
+    stats = tuned.bucket_stats.summary()
+    assert stats["lookups"] == 5 and stats["hit_rate"] == 3 / 5
+    assert stats["buckets"] == 2 and stats["shapes"] == 4
+    assert tuned.measure_regret(x, 5) == 0.0
+
+
+def test_bucket_stats():
+    from triton.runtime.bucketing import BucketStats, PowerOfTwo
+    stats = BucketStats(max_shapes=16)
+    for n in range(1, 1025):
+        stats.record((n,), (PowerOfTwo()(n),), False)
+    # buckets of at most 16 shapes: 1, 2, 4, 8 and 16 are exact
+    summary = stats.summary()
+    assert summary["buckets"] == 11
+    assert summary["shapes"] == 1 + 1 + 2 + 4 + 8 + 16 * 6
+    assert summary["full_buckets"] == 6
+
+
+@triton.jit
+def _arange(X, BLOCK: tl.constexpr):
+    tl.store(X + tl.arange(0, BLOCK), 0)
+
+
+def test_autotune_precompile(tmp_path, monkeypatch):
+    # compiled from scratch
+    monkeypatch.setenv("TRITON_CACHE_DIR", str(tmp_path))
+    # tl.arange requires a power-of-two range
+    configs = [triton.Config({'BLOCK': block}) for block in [32, 48, 64]]
+    x = torch.empty(64, dtype=torch.int32, device='cuda')
+    tuned = triton.autotune(configs, key=[], precompile=True)(_arange)
+    tuned[(1,)](x)
+    report = tuned.tuning_report
+    assert [entry["error"] is None for entry in report["configs"].values()].count(False) == 1
+    assert tuned.configs_timings[configs[1]] == (float('inf'),) * 3
+    assert tuned.best_config is not configs[1]
+
+
+tuned_kernel = triton.autotune([triton.Config({'BLOCK': block}) for block in [128, 256]], key=['i'])(_store)
+
+
+def test_workload_trace(tmp_path, monkeypatch):
+    monkeypatch.setenv("TRITON_CACHE_DIR", str(tmp_path / "cache"))
+    x = torch.empty(1, dtype=torch.int32, device='cuda')
+    trace = str(tmp_path / "trace.jsonl")
+    with triton.runtime.workload.record(trace):
+        for i in [3, 3, 4]:
+            tuned_kernel[(1,)](x, i)
+    entries = triton.runtime.workload.load(trace)
+    # one entry per key
+    assert [entry["args"][1] for entry in entries] == [{"value": 3}, {"value": 4}]
+    tuned_kernel.cache.clear()
+    try:
+        autotuners = triton.runtime.workload.replay(entries)
+        assert list(autotuners.values()) == [tuned_kernel]
+        assert sorted(tuned_kernel.cache) == [(3,), (4,)]
+        # results are in the kernel cache
+        assert triton.runtime.tuning_cache.export_results(str(tmp_path / "tuning.json")) == 1
+    finally:
+        tuned_kernel.persistent = False
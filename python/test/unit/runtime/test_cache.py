@@ -1,3 +1,4 @@
+import json
 import multiprocessing
 import os
 import re
@@ -9,6 +10,7 @@ import torch
 
 import triton
 import triton.language as tl
+from triton.runtime import cache
 from triton.runtime.jit import JITFunction
 
 tmpdir = ".tmp"
@@ -204,3 +206,242 @@ def test_compile_in_subproc() -> None:
     proc.start()
     proc.join()
     assert proc.exitcode == 0
+
+
+def test_manifest_warm_load() -> None:
+    reset_tmp_dir()
+    manifest_path = os.path.join(tmpdir, "manifest.jsonl")
+    os.makedirs(tmpdir)
+    JITFunction.cache_hook = None
+    triton.runtime.manifest.record(manifest_path)
+    try:
+        x = torch.empty(1, dtype=torch.int32, device='cuda')
+        kernel[(1,)](x, 1, BLOCK=1024)
+        kernel[(1,)](x, 8, BLOCK=1024)
+    finally:
+        JITFunction.manifest = None
+    device = torch.cuda.current_device()
+    keys = set(kernel.cache[device].keys())
+    kernel.cache.clear()
+    stats = triton.runtime.manifest.warm_load(manifest_path)
+    assert stats == {"loaded": 2, "skipped": 0, "failed": 0}
+    assert set(kernel.cache[device].keys()) == keys
+
+
+def test_compile_farm() -> None:
+    reset_tmp_dir()
+    major, minor = torch.cuda.get_device_capability(0)
+    cc = major * 10 + minor
+    configs = [triton.Config({'BLOCK': block}, num_warps=num_warps)
+               for block in [128, 256] for num_warps in [2, 4]]
+    autotuned = triton.autotune(configs, key=['i'])(kernel)
+    results = autotuned.warmup(torch.int32, 1, cc=cc, max_workers=2)
+    assert len(results) == len(configs)
+    assert all(result.ok for result in results)
+    assert len(os.listdir(tmpdir)) > len(configs)
+
+
+def test_compile_farm_in_process() -> None:
+    pids = []
+
+    class Job:
+        fn = kernel
+        cc = 80
+
+        def __init__(self, ok):
+            self.ok = ok
+
+        def run(self):
+            pids.append(os.getpid())
+            assert self.ok
+    results = triton.runtime.compile_farm.compile_many([Job(True), Job(False)], max_workers=0)
+    assert pids == [os.getpid()] * 2
+    assert [result.ok for result in results] == [True, False]
+    assert "AssertionError" in results[1].error
+
+
+def test_ttir_reuse(monkeypatch) -> None:
+    reset_tmp_dir()
+    calls = []
+    ast_to_ttir = triton.compiler.ast_to_ttir
+    monkeypatch.setattr(triton.compiler, "ast_to_ttir", lambda *args: calls.append(args) or ast_to_ttir(*args))
+    kernel.cache.clear()
+    x = torch.empty(1, dtype=torch.int32, device='cuda')
+    for num_warps in [1, 2, 4]:
+        for num_stages in [2, 3]:
+            kernel[(1,)](x, 1, BLOCK=1024, num_warps=num_warps, num_stages=num_stages)
+    assert len(calls) == 1
+    assert len(kernel.cache[x.device.index]) == 6
+
+
+def test_compile_trace() -> None:
+    reset_tmp_dir()
+    kernel.cache.clear()
+    triton.runtime.compile_trace.reset()
+    triton.runtime.compile_trace.enable()
+    try:
+        x = torch.empty(1, dtype=torch.int32, device='cuda')
+        kernel[(1,)](x, 1, BLOCK=1024)
+    finally:
+        triton.runtime.compile_trace.disable()
+    events = triton.runtime.compile_trace.events()
+    stages = [event["name"] for event in events if event["cat"] == "stage"]
+    assert stages[:4] == ["ast", "ttir", "ttgir", "llir"]
+    assert all(event["args"]["ops"] > 0 for event in events if event["name"] in ["ttir", "ttgir", "llir"])
+    assert any(event["cat"] == "pass" and event["args"]["stage"] == "ttgir" for event in events)
+    summary = triton.runtime.compile_trace.summary()
+    assert summary["kernels"]["kernel"]["count"] == len(stages)
+    path = os.path.join(tmpdir, "trace.json")
+    triton.runtime.compile_trace.dump(path)
+    with open(path) as f:
+        assert len(json.load(f)["traceEvents"]) == len(events)
+
+
+def test_persistent_autotune(tmp_path, monkeypatch) -> None:
+    reset_tmp_dir()
+    configs = [triton.Config({'BLOCK': block}) for block in [128, 256]]
+    x = torch.empty(1, dtype=torch.int32, device='cuda')
+    triton.autotune(configs, key=['i'], persistent=True)(kernel)[(1,)](x, 1)
+    # another process reuses the tuning results...
+    monkeypatch.setattr(triton.runtime.autotuner.Autotuner, "_bench", None)
+    triton.autotune(configs, key=['i'], persistent=True)(kernel)[(1,)](x, 1)
+    # ...also when seeded from an export
+    path = str(tmp_path / "tuning.json")
+    assert triton.runtime.tuning_cache.export_results(path) == 1
+    reset_tmp_dir()
+    assert triton.runtime.tuning_cache.import_results(path) == 1
+    triton.autotune(configs, key=['i'], persistent=True)(kernel)[(1,)](x, 1)
+
+
+def test_cache_eviction(monkeypatch) -> None:
+    reset_tmp_dir()
+    for i in range(8):
+        cache.CacheManager(f"key{i}").put(b"0" * 1024, "kernel.cubin")
+        # keep mtimes distinct on coarse-grained filesystems
+        os.utime(os.path.join(tmpdir, f"key{i}"), (i, i))
+    # a lookup marks a key as recently used
+    assert cache.CacheManager("key0").has_file("kernel.cubin")
+    cache.reset_cache_stats()
+    monkeypatch.setenv("TRITON_CACHE_MAX_BYTES", "4K")
+    # a key being written is skipped
+    with cache.CacheManager("key1").lock():
+        cache.CacheManager("key8").put(b"0" * 1024, "kernel.cubin")
+    assert sorted(os.listdir(tmpdir)) == ["key0", "key1", "key7", "key8"]
+    stats = cache.get_cache_stats()
+    assert stats["evictions"] == 5
+    assert stats["evicted_bytes"] == 5 * 1024
+
+
+def test_remote_cache() -> None:
+    import http.server
+    import threading
+    store = dict()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path not in store:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(store[self.path])
+
+        def do_PUT(self):
+            store[self.path] = self.rfile.read(int(self.headers["Content-Length"]))
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    cache.set_remote_backend(f"http://127.0.0.1:{server.server_port}")
+    try:
+        reset_tmp_dir()
+        cache.reset_cache_stats()
+        cache.CacheManager("key").put(b"binary", "kernel.cubin")
+        cache.flush()
+        assert store == {"/key/kernel.cubin": b"binary"}
+        # a fresh local cache is populated from the remote one
+        reset_tmp_dir()
+        assert cache.CacheManager("key").has_file("kernel.cubin")
+        assert not cache.CacheManager("key").has_file("kernel.ptx")
+        with open(os.path.join(tmpdir, "key", "kernel.cubin"), "rb") as f:
+            assert f.read() == b"binary"
+        stats = cache.get_cache_stats()
+        assert stats["remote_puts"] == 1
+        assert stats["remote_hits"] == 1
+        assert stats["misses"] == 1
+    finally:
+        cache.set_remote_backend(None)
+        server.shutdown()
+
+
+def test_remote_cache_unreachable(monkeypatch) -> None:
+    import socket
+    import threading
+
+    # a port nothing listens on
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    backend = cache.HTTPCacheBackend(f"http://127.0.0.1:{port}", retry_after=60)
+    with pytest.raises(OSError):
+        backend.get("key", "kernel.cubin")
+    # the server isn't contacted again until `retry_after` elapsed
+
+    def urlopen(*args, **kwargs):
+        raise AssertionError("unreachable server contacted")
+    monkeypatch.setattr(cache.urllib.request, "urlopen", urlopen)
+    with pytest.raises(ConnectionError):
+        backend.get("key", "kernel.cubin")
+    # uploads submitted concurrently all go to the same, drained, queue
+    uploaded = []
+
+    class Backend(cache.CacheBackend):
+        def put(self, key, filename, data):
+            uploaded.append(filename)
+    uploader = cache._Uploader()
+    threads = [threading.Thread(target=uploader.submit, args=(Backend(), "key", str(i), b""))
+               for i in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    uploader.flush()
+    assert sorted(uploaded) == sorted(str(i) for i in range(16))
+
+
+def test_probe_memo(monkeypatch) -> None:
+    reset_tmp_dir()
+    os.makedirs(tmpdir)
+    monkeypatch.setenv("HOME", os.path.abspath(tmpdir))
+    tool = os.path.join(tmpdir, "tool")
+    with open(tool, "w") as f:
+        f.write("v1")
+    calls = []
+
+    def query():
+        calls.append(None)
+        return open(tool).read()
+    version = triton.runtime.probes.Probe("tool_version", query, depends_on=lambda: [tool])
+    assert version() == "v1" and version() == "v1"
+    assert len(calls) == 1
+    # memoized on disk for other processes
+    version.invalidate()
+    assert version() == "v1"
+    assert len(calls) == 1
+    # until the tool changes
+    with open(tool, "w") as f:
+        f.write("v2")
+    os.utime(tool, (0, 0))
+    version.invalidate()
+    assert version() == "v2"
+    assert len(calls) == 2
+    # not persisted: evaluated once per process
+    arch = triton.runtime.probes.Probe("arch", query, persist=False)
+    assert arch() == "v2" and arch() == "v2"
+    arch.invalidate()
+    assert arch() == "v2"
+    assert len(calls) == 4
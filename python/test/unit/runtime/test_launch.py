@@ -0,0 +1,148 @@
+import contextlib
+import time
+
+import pytest
+import torch
+
+import triton
+import triton.language as tl
+from triton.tools import regression
+
+
+class StubKernel:
+    """
+    Stands in for a `CompiledKernel` whose driver launch is a no-op, so that
+    only the host-side dispatch cost of `JITFunction.run` is measured.
+    """
+
+    def __init__(self, num_warps):
+        self.num_warps = num_warps
+        self.shared = 0
+        self.cu_function = 0
+        self.launches = 0
+
+    def c_wrapper(self, *args):
+        self.launches += 1
+
+
+@contextlib.contextmanager
+def stubbed_compile():
+    compiled = []
+
+    def stub_compile(fn, **kwargs):
+        compiled.append(StubKernel(kwargs["num_warps"]))
+        return compiled[-1]
+    compile, triton.compile = triton.compile, stub_compile
+    # the launcher holds on to the cache: clear it in place
+    _kernel.cache.clear()
+    try:
+        yield compiled
+    finally:
+        triton.compile = compile
+        _kernel.cache.clear()
+
+
+@pytest.fixture
+def stub_driver():
+    with stubbed_compile() as compiled:
+        yield compiled
+
+
+@triton.jit
+def _kernel(X, Y, Z, N, BLOCK: tl.constexpr):
+    pass
+
+
+def test_launch_cache_key(stub_driver):
+    x = torch.empty(64, device='cuda')
+    _kernel[(1,)](x, x, x, 64, BLOCK=64, stream=0)
+    _kernel[(1,)](x, x, x, 64, BLOCK=64, stream=0)
+    assert len(stub_driver) == 1
+    # num_warps and num_stages select a different binary
+    _kernel[(1,)](x, x, x, 64, BLOCK=64, num_warps=8, stream=0)
+    _kernel[(1,)](x, x, x, 64, BLOCK=64, num_stages=2, stream=0)
+    assert len(stub_driver) == 3
+    assert stub_driver[0].launches == 2
+
+
+@regression.benchmark([dict(n_launches=1000)], unit='launches/s')
+def launch_throughput(n_launches):
+    x = torch.empty(64, device='cuda')
+    grid = lambda META: (triton.cdiv(META['N'], META['BLOCK']),)
+    with stubbed_compile() as compiled:
+        _kernel[grid](x, x, x, 64, BLOCK=64)
+        start = time.perf_counter()
+        for _ in range(n_launches):
+            _kernel[grid](x, x, x, 64, BLOCK=64)
+        elapsed = time.perf_counter() - start
+    # compiled once, then every launch goes straight to the cached binary
+    assert len(compiled) == 1
+    assert compiled[0].launches == n_launches + 1
+    return n_launches / elapsed
+
+
+def test_launch_overhead():
+    # the host-side dispatch throughput depends on the machine: it is reported, not asserted on, e.g. by
+    #   python -m triton.tools.regression measure test/unit/runtime/test_launch.py -o launch.json
+    results = regression.measure(launch_throughput.cases, repeat=1)
+    assert results["launch_throughput/n_launches=1000"]["samples"][0] > 0
+
+
+def test_launcher_arg_types():
+    signature = {0: "*fp32", 1: "*i8", 2: "i32", 3: "i64", 4: "fp32", 5: "i32"}
+    # argument 5 was specialized as equal to 1
+    assert triton.compiler.launcher_arg_types(signature, {5: 1, 6: 64}) == b"PPiLf-"
+
+
+@pytest.fixture
+def fake_driver(monkeypatch):
+    launches = []
+
+    class FakeCudaUtils:
+        def launch(self, types, *args):
+            launches.append((types,) + args)
+
+        def launch_many(self, all_args):
+            for args in all_args:
+                self.launch(*args)
+
+    def fake_compile(fn, **kwargs):
+        launcher = triton.compiler.make_launcher(fn.__name__, kwargs["signature"], kwargs["constants"])
+        metadata = {"shared": 0, "num_warps": kwargs["num_warps"], "num_stages": kwargs["num_stages"]}
+        kernel = triton.compiler.CompiledKernel(launcher, metadata, dict())
+        # no driver handles to load
+        kernel.cu_module, kernel.cu_function = 0, 0
+        return kernel
+    monkeypatch.setattr(triton.compiler, "cuda_utils", FakeCudaUtils())
+    monkeypatch.setattr(triton, "compile", fake_compile)
+    _kernel.cache.clear()
+    yield launches
+    _kernel.cache.clear()
+
+
+def test_launch_plan(fake_driver):
+    x, y, z = [torch.empty(64, device='cuda') for _ in range(3)]
+    _kernel[(1,)](x, x, x, 64, BLOCK=64, stream=0)
+    with triton.runtime.launch_plan.capture() as plan:
+        _kernel[(2,)](x, y, x, 64, BLOCK=64, stream=0)
+        # compiled while capturing
+        _kernel[(4,)](y, y, y, 64, BLOCK=64, num_warps=8, stream=0)
+    assert len(plan) == 2
+    # replayed launches get buffer addresses instead of tensors
+    captured = [tuple(arg.data_ptr() if hasattr(arg, "data_ptr") else arg for arg in args)
+                for args in fake_driver[1:]]
+    del fake_driver[:]
+    plan.replay()
+    assert fake_driver == captured
+    assert fake_driver[0][:7] == (b"PPPi", 2, 1, 1, 4, 0, 0)
+    assert fake_driver[0][-4:] == (x.data_ptr(), y.data_ptr(), x.data_ptr(), 64)
+    assert fake_driver[1][4] == 8
+    # rebinding only changes the buffer addresses
+    del fake_driver[:]
+    plan.rebind({x: z})
+    plan.replay(stream=1)
+    assert fake_driver[0][-4:] == (z.data_ptr(), y.data_ptr(), z.data_ptr(), 64)
+    assert fake_driver[0][6] == 1
+    # launches after the capture are not recorded
+    _kernel[(2,)](x, y, x, 64, BLOCK=64, stream=0)
+    assert len(plan) == 2
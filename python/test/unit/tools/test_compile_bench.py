@@ -0,0 +1,28 @@
+import pytest
+
+from triton.tools import compile_bench
+
+
+@pytest.mark.parametrize("case", compile_bench.SUITE, ids=lambda case: case.name)
+def test_suite(case):
+    # loads the kernel, without a GPU, and checks the signature against its arguments
+    fn, signature, constants, config = case.compile_args()
+    assert len(signature) + len(constants) == len(fn.arg_names)
+    assert config.divisible_by_16 == {i for i, ty in signature.items() if ty.startswith("*")}
+
+
+def test_target():
+    assert compile_bench.Target("sm80").capability == 80
+    target = compile_bench.Target("gfx90a")
+    assert (target.backend, target.capability) == ("hip", 90)
+    with pytest.raises(ValueError):
+        compile_bench.Target("ampere")
+
+
+def test_compile_case():
+    # compiles down to PTX on the CPU
+    case = next(case for case in compile_bench.SUITE if case.name == "tutorials/vector-add")
+    result = compile_bench.compile_case(case, compile_bench.Target("sm80"))
+    assert list(result["stages"]) == ["ttir", "ttgir", "llir", "ptx"]
+    assert all(stats["time_s"] > 0 and stats["size"] > 0 for stats in result["stages"].values())
+    assert result["peak_rss_kb"] > 0
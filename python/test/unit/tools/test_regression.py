@@ -0,0 +1,70 @@
+import random
+
+from triton.tools import regression
+
+BENCHMARKS = '''
+import triton
+from triton.tools import regression
+
+calls = []
+
+
+@regression.benchmark([dict(n=1), dict(n=2)], unit='ms', higher_is_better=False)
+def sleep(n):
+    return 0.5 * n
+
+
+@triton.testing.perf_report(triton.testing.Benchmark(
+    x_names=['size'], x_vals=[64, 128], line_arg='provider', line_vals=['triton', 'torch'],
+    line_names=['Triton', 'Torch'], plot_name='add', args={'scale': 2}, ylabel='GB/s'))
+def bench_add(size, provider, scale):
+    calls.append(size)
+    return size * scale, size, size
+
+
+assert bench_add.run(print_data=True) is None and not calls
+'''
+
+
+def results(samples, higher_is_better=False, unit="ms"):
+    return {"samples": samples, "unit": unit, "higher_is_better": higher_is_better}
+
+
+def test_discover(tmp_path):
+    path = tmp_path / "bench.py"
+    path.write_text(BENCHMARKS)
+    cases = regression.discover([str(tmp_path)])
+    assert [case.name for case in cases] == [
+        "sleep/n=1", "sleep/n=2",
+        "add/size=64,provider=triton", "add/size=64,provider=torch",
+        "add/size=128,provider=triton", "add/size=128,provider=torch"]
+    assert [case.higher_is_better for case in cases] == [False] * 2 + [True] * 4
+    measured = regression.measure(cases, repeat=3, pattern="add/size=128*")
+    names = ["add/size=128,provider=triton", "add/size=128,provider=torch"]
+    assert measured == {name: results([256.0] * 3, True, "GB/s") for name in names}
+
+
+def test_compare(tmp_path):
+    rng = random.Random(0)
+
+    def sample(mean, n=20):
+        return [rng.gauss(mean, 0.02 * mean) for _ in range(n)]
+    assert regression.mann_whitney_u(sample(1.1), sample(1.0)) < 0.001
+    assert regression.mann_whitney_u(sample(1.0), sample(1.1)) > 0.999
+    path = tmp_path / "device.json"
+    measured = {"slower": results(sample(1.0)), "noisy": results(sample(1.0)), "faster": results(sample(1.0)),
+                "throughput": results(sample(1.0), True), "single": results([1.0]), "missing": results(sample(1.0)),
+                "small": dict(results([0.008], True), tolerance=0.015)}
+    regression.save_baseline(str(path), measured, "device", clocks={"sm": 1350, "memory": 1215})
+    assert regression.baseline_path(str(tmp_path), "nvidia-device-80gb") == str(path)
+    # updating a baseline with results read from a file keeps its clocks
+    regression.save_baseline(str(path), {}, "device")
+    baseline = regression.load_baseline(str(path))
+    assert baseline["clocks"] == {"sm": 1350, "memory": 1215}
+    current = {"slower": results(sample(1.1)), "noisy": results(sample(1.01)), "faster": results(sample(0.9)),
+               "throughput": results(sample(0.9), True), "single": results([1.1]), "new": results(sample(1.0)),
+               "small": results([0.0076], True)}
+    statuses = {c.name: c.status for c in regression.compare(baseline, current)}
+    assert statuses == {"slower": "regression", "noisy": "unchanged", "faster": "improvement",
+                        "throughput": "regression", "single": "regression", "missing": "missing", "new": "new",
+                        "small": "unchanged"}
@@ -0,0 +1,20 @@
+import pytest
+
+from triton.tools import roofline
+
+
+def test_roofline(tmp_path):
+    # a device with 100 TFLOP/s and 1000 GB/s: ridge at 100 FLOP/B
+    gemm = roofline.LaunchReport("gemm", time_ms=1.0, flops=50e9, nbytes=100e6, peak_tflops=100, peak_gbps=1000)
+    assert (gemm.intensity, gemm.ridge, gemm.bound) == (500, 100, "compute")
+    assert gemm.tflops == pytest.approx(50) and gemm.efficiency == pytest.approx(0.5)
+    copy = roofline.LaunchReport("copy", time_ms=0.5, flops=None, nbytes=400e6, peak_tflops=100, peak_gbps=1000)
+    assert copy.bound == "memory" and copy.efficiency == pytest.approx(0.8)
+    assert copy.headroom_ms == pytest.approx(0.1)
+    report = roofline.Roofline([gemm, copy, gemm])
+    summary = report.summary()
+    assert [row["name"] for row in summary] == ["gemm", "copy"]
+    assert summary[0]["launches"] == 2 and summary[0]["headroom_ms"] == pytest.approx(1.0)
+    report.dump(tmp_path / "roofline.json")
+    assert roofline.Roofline.load(tmp_path / "roofline.json").summary() == summary
+    assert report.table().splitlines()[1].startswith("gemm")
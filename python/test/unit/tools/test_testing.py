@@ -0,0 +1,40 @@
+import pytest
+
+import triton
+
+
+def test_sweep(tmp_path, monkeypatch):
+    calls, reports = [], []
+    monkeypatch.setattr(triton.testing.Mark, "_report",
+                        lambda self, bench, results, *args: reports.append(results))
+
+    def fn(n, provider, scale):
+        calls.append((n, provider))
+        if n == 4 and provider == "b" and crash:
+            raise KeyboardInterrupt
+        return n * scale, n, n
+
+    bench = triton.testing.Benchmark(x_names=["n"], x_vals=[1, 2, 4, 8], line_arg="provider", line_vals=["a", "b"],
+                                     line_names=["A", "B"], plot_name="sweep", args={"scale": 2})
+    mark = triton.testing.perf_report(bench)(fn)
+    # interrupted, then resumed from the stored points
+    crash = True
+    with pytest.raises(KeyboardInterrupt):
+        mark.run(results_dir=tmp_path / "resume")
+    crash = False
+    # a point cut short by the interruption
+    with open(tmp_path / "resume" / "sweep.jsonl", "a") as f:
+        f.write('{"x": "4", "li')
+    del calls[:]
+    mark.run(results_dir=tmp_path / "resume")
+    assert calls == [(4, "b"), (8, "a"), (8, "b")]
+    assert len(reports[-1]) == 8 and reports[-1].get(8, "b") == (16.0, 8.0, 8.0)
+    assert len(triton.testing.SweepResults(bench, tmp_path / "resume" / "sweep.jsonl")) == 8
+    # sharded: reported once all shards are measured
+    del calls[:], reports[:]
+    mark.run(results_dir=tmp_path / "shards", shard="0/2")
+    assert not reports and calls == [(1, "a"), (2, "a"), (4, "a"), (8, "a")]
+    mark.run(results_dir=tmp_path / "shards", shard=(1, 2))
+    assert len(reports) == 1 and len(reports[0]) == 8
+    mark.report(tmp_path / "shards")
+    assert reports[-1].points == reports[0].points
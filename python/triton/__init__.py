@@ -20,6 +20,7 @@ from .utils import (
 from .runtime import (
     autotune,
     Config,
+    ConfigSpace,
     heuristics,
     JITFunction,
     KernelInterface,
@@ -36,6 +37,7 @@ __all__ = [
     "CompilationError",
     "compile",
     "Config",
+    "ConfigSpace",
     "heuristics",
     "impl",
     "jit",
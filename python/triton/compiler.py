@@ -14,6 +14,7 @@ import sys
 import sysconfig
 import tempfile
 import warnings
+import weakref
 from collections import namedtuple
 from pathlib import Path
 from sysconfig import get_paths
@@ -21,20 +22,15 @@ from typing import Any, Callable, Dict, Tuple, Union
 
 import setuptools
 import torch
-from filelock import FileLock
 
 import triton
 import triton._C.libtriton.triton as _triton
 from . import impl
+from .runtime import compile_trace
+from .runtime.cache import CacheManager, default_cache_dir  # noqa: F401
+from .runtime.probes import probe
 from .tools.disasm import extract
 
-def static_vars(**kwargs):
-    def decorate(func):
-        for k in kwargs:
-            setattr(func, k, kwargs[k])
-        return func
-    return decorate
-
 def str_to_ty(name):
     if name[0] == "*":
         ty = str_to_ty(name[1:])
@@ -884,7 +880,7 @@ def optimize_triton_ir(mod):
     pm.add_canonicalizer_pass()
     pm.add_cse_pass()
     pm.add_licm_pass()
-    pm.run(mod)
+    compile_trace.run_passes(pm, mod)
     return mod
 
 
@@ -918,7 +914,7 @@ def ttir_to_ttgir(mod, num_warps, num_stages, compute_capability):
     pm.add_cse_pass()
     pm.add_symbol_dce_pass()
     pm.add_tritongpu_reorder_instructions_pass()
-    pm.run(mod)
+    compile_trace.run_passes(pm, mod)
     return mod
 
 
@@ -1022,21 +1018,31 @@ def ptx_get_version(cuda_version) -> int:
     raise RuntimeError("Triton only support CUDA 10.0 or higher")
 
 
-def path_to_ptxas():
+def _ptxas_paths():
     base_dir = os.path.dirname(__file__)
-    paths = [
+    return [
         os.environ.get("TRITON_PTXAS_PATH", ""),
         os.path.join(base_dir, "third_party", "cuda", "bin", "ptxas")
     ]
 
-    for ptxas in paths:
+
+@probe(depends_on=_ptxas_paths)
+def _find_ptxas():
+    for ptxas in _ptxas_paths():
         if os.path.exists(ptxas):
             result = subprocess.check_output([ptxas, "--version"], stderr=subprocess.STDOUT)
             if result is not None:
                 version = re.search(r".*release (\d+\.\d+).*", result.decode("utf-8"), flags=re.MULTILINE)
                 if version is not None:
-                    return ptxas, version.group(1)
-    raise RuntimeError("Cannot find ptxas")
+                    return [ptxas, version.group(1)]
+    return None
+
+
+def path_to_ptxas():
+    ptxas = _find_ptxas()
+    if ptxas is None:
+        raise RuntimeError("Cannot find ptxas")
+    return tuple(ptxas)
 
 
 instance_descriptor = namedtuple("instance_descriptor", ["divisible_by_16", "equal_to_1"], defaults=[set(), set()])
@@ -1351,58 +1357,20 @@ def generate_launcher(constants, signature):
     return src
 
 
-def default_cache_dir():
-    return os.path.join(os.environ["HOME"], ".triton", "cache")
-
-
 def default_cuda_dir():
     default_dir = "/usr/local/cuda"
     return os.getenv("CUDA_HOME", default=default_dir)
 
 
-class CacheManager:
-
-    def __init__(self, key):
-        self.key = key
-        self.lock_path = None
-        # create cache directory if it doesn't exist
-        self.cache_dir = os.environ.get('TRITON_CACHE_DIR', default_cache_dir())
-        if self.cache_dir:
-            self.cache_dir = os.path.join(self.cache_dir, self.key)
-            self.lock_path = os.path.join(self.cache_dir, "lock")
-            os.makedirs(self.cache_dir, exist_ok=True)
-
-    def _make_path(self, filename):
-        return os.path.join(self.cache_dir, filename)
-
-    def has_file(self, filename):
-        if not self.cache_dir:
-            return False
-        return os.path.exists(self._make_path(filename))
-
-    def put(self, data, filename, binary=True):
-        if not self.cache_dir:
-            return
-        binary = isinstance(data, bytes)
-        if not binary:
-            data = str(data)
-        assert self.lock_path is not None
-        filepath = self._make_path(filename)
-        with FileLock(self.lock_path):
-            # use tempfile to be robust against program interruptions
-            mode = "wb" if binary else "w"
-            with open(filepath + ".tmp", mode) as f:
-                f.write(data)
-            os.rename(filepath + ".tmp", filepath)
-
-
 # Utilities for generating and compiling C wrappers
 
 
-@functools.lru_cache()
+@probe(depends_on=lambda: ["/etc/ld.so.cache"])
 def libcuda_dirs():
-    locs = subprocess.check_output(["whereis", "libcuda.so"]).decode().strip().split()[1:]
-    return [os.path.dirname(loc) for loc in locs]
+    # the libcuda.so known to the dynamic linker, i.e. listed in /etc/ld.so.cache
+    libs = subprocess.check_output(["/sbin/ldconfig", "-p"]).decode()
+    locs = [line.split()[-1] for line in libs.splitlines() if "libcuda.so" in line]
+    return sorted(set(os.path.dirname(loc) for loc in locs))
 
 
 @contextlib.contextmanager
@@ -1523,6 +1491,8 @@ def read_or_execute(cache_manager, force_compile, file_name, metadata,
 
 #
 
+# not persisted: the visible GPU may differ from one process to the next
+@probe(persist=False)
 def _get_amdgpu_arch():
     try:
         rocminfo = subprocess.check_output(rocm_path_dir() + '/bin/rocminfo').decode()
@@ -1549,6 +1519,45 @@ def make_stub(name, signature, constants):
     return so_cache_manager._make_path(so_name)
 
 
+# argument types of the generic launcher of `CudaUtils`
+_launcher_arg_type = {
+    "i1": "i",
+    "i32": "i",
+    "i64": "L",
+    "u32": "I",
+    "u64": "K",
+    "fp16": "f",
+    "bf16": "f",
+    "fp32": "f",
+    "f32": "f",
+    "fp64": "d",
+}
+
+
+def launcher_arg_types(signature, constants):
+    """
+    Descriptor of the kernel arguments for the generic launcher: one character
+    per argument of :code:`signature`, :code:`-` for those specialized into
+    :code:`constants` (which are not passed to the kernel).
+    """
+    types = ["-" if i in constants else "P" if ty[0] == "*" else _launcher_arg_type[ty]
+             for i, ty in signature.items()]
+    return "".join(types).encode("ascii")
+
+
+def make_launcher(name, signature, constants):
+    """Return the function launching a kernel with the given signature."""
+    if torch.version.hip is not None:
+        import importlib.util
+        spec = importlib.util.spec_from_file_location("launcher", make_stub(name, signature, constants))
+        mod = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(mod)
+        return mod.launch
+    # on CUDA, all kernels share the launcher built once into `cuda_utils`
+    init_cuda_utils()
+    return functools.partial(cuda_utils.launch, launcher_arg_types(signature, constants))
+
+
 def convert_type_repr(x):
     match = re.search(r'!tt\.ptr<(.*)>', x)
     if match is not None:
@@ -1556,22 +1565,41 @@ def convert_type_repr(x):
     return x
 
 
+def _frontend_key(fn, **kwargs):
+    configs = kwargs["configs"]
+    signature = kwargs["signature"]
+    constants = kwargs.get("constants", dict())
+    get_conf_key = lambda conf: (sorted(conf.divisible_by_16), sorted(conf.equal_to_1))
+    configs_key = [get_conf_key(conf) for conf in configs]
+    return f"{fn.cache_key}-{''.join(signature.values())}-{configs_key}-{constants}"
+
+
 def make_hash(fn, **kwargs):
     if isinstance(fn, triton.runtime.JITFunction):
-        configs = kwargs["configs"]
-        signature = kwargs["signature"]
-        constants = kwargs.get("constants", dict())
         num_warps = kwargs.get("num_warps", 4)
         num_stages = kwargs.get("num_stages", 3)
         # Get unique key for the compiled code
-        get_conf_key = lambda conf: (sorted(conf.divisible_by_16), sorted(conf.equal_to_1))
-        configs_key = [get_conf_key(conf) for conf in configs]
-        key = f"{fn.cache_key}-{''.join(signature.values())}-{configs_key}-{constants}-{num_warps}-{num_stages}"
+        key = f"{_frontend_key(fn, **kwargs)}-{num_warps}-{num_stages}"
         return hashlib.md5(key.encode("utf-8")).hexdigest()
     assert isinstance(fn, str)
     return hashlib.md5((Path(fn).read_text() + triton.runtime.jit.version_key()).encode("utf-8")).hexdigest()
 
 
+def make_ttir_hash(fn, **kwargs):
+    """
+    Key of the TTIR of a `JITFunction`, which -- unlike the later stages --
+    does not depend on `num_warps` and `num_stages`, and is therefore shared
+    by all the variants of a kernel explored by the autotuner.
+    """
+    key = f"{_frontend_key(fn, **kwargs)}-ttir"
+    return hashlib.md5(key.encode("utf-8")).hexdigest()
+
+
+def _file_md5(path):
+    with open(path, "rb") as f:
+        return hashlib.md5(f.read()).hexdigest()
+
+
 # - ^\s*func\s+ : match the start of the string, any leading whitespace, the keyword func,
 #    and any following whitespace
 # - (public\s+)? : optionally match the keyword public and any following whitespace
@@ -1597,7 +1625,6 @@ arg_type_pattern = {
 
 
 # def compile(fn, signature: str, device: int = -1, constants=dict(), num_warps: int = 4, num_stages: int = 3, extern_libs=None, configs=None):
-@static_vars(discovered_gfx_arch = _get_amdgpu_arch())
 def compile(fn, **kwargs):
     capability = kwargs.get("cc", None)
     if capability is None:
@@ -1623,7 +1650,9 @@ def compile(fn, **kwargs):
         for key in list(extern_libs):
             if extern_libs[key] == '' or extern_libs[key] is None:
                extern_libs.pop(key)
-        gfx_arch = os.environ.get('MI_GPU_ARCH', compile.discovered_gfx_arch)
+        gfx_arch = os.environ.get('MI_GPU_ARCH')
+        if gfx_arch is None:
+            gfx_arch = _get_amdgpu_arch()
         if gfx_arch is None:
             raise RuntimeError('gfx_arch is None (not specified)')
         stages = {
@@ -1677,23 +1706,27 @@ def compile(fn, **kwargs):
         signature = {k: v for k, v in enumerate(param_tys)}
         first_stage = list(stages.keys()).index(ir)
 
-    # cache manager
-    so_path = make_stub(name, signature, constants)
     # create cache manager
     fn_cache_manager = CacheManager(make_hash(fn, **kwargs))
     # determine name and extension type of provided function
     if isinstance(fn, triton.runtime.JITFunction):
         name, ext = fn.__name__, "ast"
+        ttir_cache_manager = CacheManager(make_ttir_hash(fn, **kwargs))
     else:
         name, ext = os.path.basename(fn).split(".")
+        ttir_cache_manager = fn_cache_manager
 
     # load metadata if any
     metadata = None
     if fn_cache_manager.has_file(f'{name}.json'):
         with open(fn_cache_manager._make_path(f"{name}.json")) as f:
             metadata = json.load(f)
+        # intermediate files are validated by content rather than by ctime,
+        # which is meaningless for files fetched from a remote cache
+        metadata.pop("ctime", None)
+        metadata.setdefault("md5", dict())
     else:
-        metadata = {"num_warps": num_warps, "num_stages": num_stages, "ctime": dict()}
+        metadata = {"num_warps": num_warps, "num_stages": num_stages, "md5": dict()}
         if ext == "ptx":
             assert "shared" in kwargs, "ptx compilation must provide shared memory size"
             metadata["shared"] = kwargs["shared"]
@@ -1703,31 +1736,42 @@ def compile(fn, **kwargs):
     module = fn
     # run compilation pipeline  and populate metadata
     for ir, (parse, compile_kernel) in list(stages.items())[first_stage:]:
-        path = fn_cache_manager._make_path(f"{name}.{ir}")
-        if ir == ext:
-            next_module = parse(fn)
-        elif os.path.exists(path) and\
-                ir in metadata["ctime"] and\
-                os.path.getctime(path) == metadata["ctime"][ir]:
-            if ir == "amdgcn":
-                next_module = (parse(path), parse(fn_cache_manager._make_path(f"{name}.hsaco_path")))
-            else:
+        # TTIR is stored under its own key, so that it is generated once for
+        # all num_warps / num_stages variants
+        cache_manager = ttir_cache_manager if ir == "ttir" else fn_cache_manager
+        path = cache_manager._make_path(f"{name}.{ir}")
+        cached = True
+        with compile_trace.stage(name, ir) as trace_event:
+            if ir == ext:
+                next_module = parse(fn)
+            elif ir == "ttir" and ttir_cache_manager is not fn_cache_manager and\
+                    ttir_cache_manager.has_file(f"{name}.{ir}"):
+                # the TTIR key covers everything the TTIR depends on
                 next_module = parse(path)
-        else:
-            next_module = compile_kernel(module)
-            if ir == "amdgcn":
-                fn_cache_manager.put(next_module[0], f"{name}.{ir}")
-                fn_cache_manager.put(next_module[1], f"{name}.hsaco_path")
+            elif ir in metadata["md5"] and\
+                    cache_manager.has_file(f"{name}.{ir}") and\
+                    _file_md5(path) == metadata["md5"][ir]:
+                if ir == "amdgcn":
+                    next_module = (parse(path), parse(fn_cache_manager._make_path(f"{name}.hsaco_path")))
+                else:
+                    next_module = parse(path)
             else:
-                fn_cache_manager.put(next_module, f"{name}.{ir}")
+                cached = False
+                next_module = compile_kernel(module)
+                if ir == "amdgcn":
+                    fn_cache_manager.put(next_module[0], f"{name}.{ir}")
+                    fn_cache_manager.put(next_module[1], f"{name}.hsaco_path")
+                else:
+                    cache_manager.put(next_module, f"{name}.{ir}")
         if os.path.exists(path):
-            metadata["ctime"][ir] = os.path.getctime(path)
+            metadata["md5"][ir] = _file_md5(path)
         if ir == "cubin":
             asm[ir] = next_module
         elif ir == "amdgcn":
             asm[ir] = str(next_module[0])
         else:
             asm[ir] = str(next_module)
+        trace_event.set_output(asm[ir], cached)
         if ir == "llir" and "shared" not in metadata:
             metadata["shared"] = _triton.get_shared_memory_size(module)
         if ir == "ptx":
@@ -1738,10 +1782,13 @@ def compile(fn, **kwargs):
         module = next_module
     # write-back metadata
     fn_cache_manager.put(json.dumps(metadata), f"{name}.json", binary=False)
+    # only populate the cache (e.g., from a compile worker process)
+    if kwargs.get("warm_cache_only", False):
+        return None
     # return handle to compiled kernel
-    return CompiledKernel(so_path, metadata, asm)
+    return CompiledKernel(make_launcher(name, signature, constants), metadata, asm)
 
-@static_vars(discovered_gfx_arch = _get_amdgpu_arch())
+@functools.lru_cache()
 def _get_amdgcn_bitcode_paths():
   if torch.version.hip is not None:
       gpu_arch_agnostic_bitcode_libraries = ["opencl.bc",
@@ -1752,7 +1799,7 @@ def _get_amdgcn_bitcode_paths():
                                              "oclc_correctly_rounded_sqrt_on.bc",
                                              "oclc_unsafe_math_off.bc",
                                              "oclc_wavefrontsize64_on.bc"]
-      gfx_arch_id = re.search('gfx(\\w+)', _get_amdgcn_bitcode_paths.discovered_gfx_arch).group(1).strip()
+      gfx_arch_id = re.search('gfx(\\w+)', _get_amdgpu_arch()).group(1).strip()
       gpu_arch_specific_bitcode_library = 'oclc_isa_version_' + gfx_arch_id + ".bc"
       bitcode_path_dir = os.path.join(Path(__file__).parent.resolve(), "third_party/rocm/lib/bitcode/")
 
@@ -1771,23 +1818,23 @@ def _get_amdgcn_bitcode_paths():
   else:
       return {}
 
-@static_vars(amdgcn_bitcode_paths = _get_amdgcn_bitcode_paths())
 def get_amdgcn_bitcode_paths():
-  return get_amdgcn_bitcode_paths.amdgcn_bitcode_paths
+    # callers modify the returned dict
+    return dict(_get_amdgcn_bitcode_paths())
 
 class CompiledKernel:
 
     # Hooks for external tools to monitor the execution of triton kernels
     launch_enter_hook = None
     launch_exit_hook = None
-
-    def __init__(self, so_path, metadata, asm):
-        # initialize launcher
-        import importlib.util
-        spec = importlib.util.spec_from_file_location("launcher", so_path)
-        mod = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(mod)
-        self.c_wrapper = getattr(mod, "launch")
+    # `LaunchPlan` recording the launches, see `triton.runtime.launch_plan`
+    launch_recorder = None
+    # live instances, so that a recorder can attach to them
+    instances = weakref.WeakSet()
+
+    def __init__(self, launcher, metadata, asm):
+        self._c_wrapper = launcher
+        CompiledKernel.instances.add(self)
         # initialize metadata
         self.shared = metadata["shared"]
         self.num_warps = metadata["num_warps"]
@@ -1800,6 +1847,9 @@ class CompiledKernel:
         self.metadata = metadata
         self.cu_module = None
         self.cu_function = None
+        # registers per thread, and spilled registers, once loaded
+        self.n_regs = None
+        self.n_spills = None
 
     def _init_handles(self):
         if self.cu_module is not None:
@@ -1812,6 +1862,7 @@ class CompiledKernel:
             mod, func, n_regs, n_spills = hip_utils.load_binary(self.metadata["name"], self.asm["hsaco_path"], self.shared, device)
             self.cu_module = mod
             self.cu_function = func
+            self.n_regs, self.n_spills = n_regs, n_spills
         else:
             init_cuda_utils()
             max_shared = cuda_utils.get_device_properties(device)["max_shared_mem"]
@@ -1820,11 +1871,19 @@ class CompiledKernel:
             mod, func, n_regs, n_spills = cuda_utils.load_binary(self.metadata["name"], self.asm["cubin"], self.shared, device)
             self.cu_module = mod
             self.cu_function = func
+            self.n_regs, self.n_spills = n_regs, n_spills
 
-    def __getattribute__(self, name):
+    def __getattr__(self, name):
+        # `c_wrapper` is only published once the driver handles are
+        # initialized, so that after the first launch it (like every other
+        # attribute read on the launch path) is a plain instance-dict lookup
         if name == 'c_wrapper':
             self._init_handles()
-        return super().__getattribute__(name)
+            self.c_wrapper = self._c_wrapper
+            if CompiledKernel.launch_recorder is not None:
+                CompiledKernel.launch_recorder.attach(self)
+            return self.c_wrapper
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
 
     def __getitem__(self, grid):
         self._init_handles()
@@ -1946,9 +2005,151 @@ class CudaUtils(object):
             return Py_BuildValue("(KKii)", (uint64_t)mod, (uint64_t)fun, n_regs, n_spills);
         }
 
+        static inline CUdeviceptr getPointer(PyObject *obj) {
+            if (PyLong_Check(obj)) {
+                return (CUdeviceptr)PyLong_AsUnsignedLongLong(obj);
+            }
+            if (obj == Py_None) {
+                return (CUdeviceptr)0;
+            }
+            PyObject *ptr = PyObject_GetAttrString(obj, "data_ptr");
+            if(ptr){
+                PyObject *empty_tuple = PyTuple_New(0);
+                PyObject *ret = PyObject_Call(ptr, empty_tuple, NULL);
+                Py_DECREF(empty_tuple);
+                Py_DECREF(ptr);
+                if (ret == NULL) {
+                    return (CUdeviceptr)0;
+                }
+                if (!PyLong_Check(ret)) {
+                    Py_DECREF(ret);
+                    PyErr_SetString(PyExc_TypeError, "data_ptr method of Pointer object must return 64-bit int");
+                    return (CUdeviceptr)0;
+                }
+                CUdeviceptr dev_ptr = (CUdeviceptr)PyLong_AsUnsignedLongLong(ret);
+                Py_DECREF(ret);
+                return dev_ptr;
+            }
+            PyErr_SetString(PyExc_TypeError, "Pointer argument must be either uint64 or have data_ptr method");
+            return (CUdeviceptr)0;
+        }
+
+        #define MAX_ARGS 256
+
+        // Launcher shared by all kernels: the first argument is a bytes object
+        // with one character per kernel argument, telling how to convert it
+        // (see `launcher_arg_types`); the following ones are the same as for
+        // the per-signature launchers.
+        static PyObject* launch(PyObject* self, PyObject* args) {
+            Py_ssize_t n = PyTuple_GET_SIZE(args);
+            if (n < 11 || !PyBytes_Check(PyTuple_GET_ITEM(args, 0))) {
+                PyErr_SetString(PyExc_TypeError, "launch expects an argument type descriptor and launch parameters");
+                return NULL;
+            }
+            PyObject *types_obj = PyTuple_GET_ITEM(args, 0);
+            const char *types = PyBytes_AS_STRING(types_obj);
+            Py_ssize_t n_args = PyBytes_GET_SIZE(types_obj);
+            if (n_args > MAX_ARGS || n != 11 + n_args) {
+                PyErr_Format(PyExc_TypeError, "launch expects %zd kernel arguments, got %zd", n_args, n - 11);
+                return NULL;
+            }
+            int gridX = (int)PyLong_AsLong(PyTuple_GET_ITEM(args, 1));
+            int gridY = (int)PyLong_AsLong(PyTuple_GET_ITEM(args, 2));
+            int gridZ = (int)PyLong_AsLong(PyTuple_GET_ITEM(args, 3));
+            int num_warps = (int)PyLong_AsLong(PyTuple_GET_ITEM(args, 4));
+            int shared_memory = (int)PyLong_AsLong(PyTuple_GET_ITEM(args, 5));
+            CUstream stream = (CUstream)PyLong_AsUnsignedLongLong(PyTuple_GET_ITEM(args, 6));
+            CUfunction function = (CUfunction)PyLong_AsUnsignedLongLong(PyTuple_GET_ITEM(args, 7));
+            PyObject *launch_enter_hook = PyTuple_GET_ITEM(args, 8);
+            PyObject *launch_exit_hook = PyTuple_GET_ITEM(args, 9);
+            PyObject *compiled_kernel = PyTuple_GET_ITEM(args, 10);
+            PyObject *hook_ret = NULL;
+            // every argument is stored in its own 8-byte slot
+            uint64_t storage[MAX_ARGS];
+            void *params[MAX_ARGS];
+            int n_params = 0;
+            for (Py_ssize_t i = 0; i < n_args; i++) {
+                PyObject *arg = PyTuple_GET_ITEM(args, 11 + i);
+                void *slot = &storage[n_params];
+                switch (types[i]) {
+                  case '-': continue;
+                  case 'P': *(CUdeviceptr*)slot = getPointer(arg); break;
+                  case 'i': *(int32_t*)slot = (int32_t)PyLong_AsLong(arg); break;
+                  case 'I': *(uint32_t*)slot = (uint32_t)PyLong_AsUnsignedLongMask(arg); break;
+                  case 'L': *(int64_t*)slot = (int64_t)PyLong_AsLongLong(arg); break;
+                  case 'K': *(uint64_t*)slot = (uint64_t)PyLong_AsUnsignedLongLongMask(arg); break;
+                  case 'f': *(float*)slot = (float)PyFloat_AsDouble(arg); break;
+                  case 'd': *(double*)slot = PyFloat_AsDouble(arg); break;
+                  default:
+                    PyErr_Format(PyExc_ValueError, "invalid argument type '%c'", types[i]);
+                    return NULL;
+                }
+                params[n_params++] = slot;
+            }
+            if(PyErr_Occurred()) {
+                return NULL;
+            }
+
+            if (launch_enter_hook != Py_None) {
+                PyObject *new_args = PyTuple_Pack(1, compiled_kernel);
+                hook_ret = PyObject_CallObject(launch_enter_hook, new_args);
+                Py_DECREF(new_args);
+            }
+
+            if(gridX*gridY*gridZ > 0){
+                CUresult code = cuLaunchKernel(function, gridX, gridY, gridZ, 32*num_warps, 1, 1, shared_memory, stream, params, 0);
+                gpuAssert(code, __FILE__, __LINE__);
+            }
+
+            if (launch_exit_hook != Py_None) {
+                PyObject *new_args = NULL;
+                if (hook_ret) {
+                    new_args = PyTuple_Pack(2, compiled_kernel, hook_ret);
+                } else {
+                    new_args = PyTuple_Pack(1, compiled_kernel);
+                }
+                hook_ret = PyObject_CallObject(launch_exit_hook, new_args);
+                Py_DECREF(new_args);
+            }
+
+            if (hook_ret) {
+                Py_DECREF(hook_ret);
+            }
+            if(PyErr_Occurred()) {
+                return NULL;
+            }
+            Py_INCREF(Py_None);
+            return Py_None;
+        }
+
+        // Replays a sequence of launches: `launches` is a tuple holding the
+        // argument tuple of each `launch` call.
+        static PyObject* launchMany(PyObject* self, PyObject* args) {
+            PyObject *launches;
+            if(!PyArg_ParseTuple(args, "O!", &PyTuple_Type, &launches)) {
+                return NULL;
+            }
+            for (Py_ssize_t i = 0; i < PyTuple_GET_SIZE(launches); i++) {
+                PyObject *launch_args = PyTuple_GET_ITEM(launches, i);
+                if (!PyTuple_Check(launch_args)) {
+                    PyErr_SetString(PyExc_TypeError, "launch_many expects a tuple of argument tuples");
+                    return NULL;
+                }
+                PyObject *ret = launch(self, launch_args);
+                if (ret == NULL) {
+                    return NULL;
+                }
+                Py_DECREF(ret);
+            }
+            Py_INCREF(Py_None);
+            return Py_None;
+        }
+
         static PyMethodDef ModuleMethods[] = {
           {"load_binary", loadBinary, METH_VARARGS, "Load provided cubin into CUDA driver"},
           {"get_device_properties", getDeviceProperties, METH_VARARGS, "Get the properties for a given device"},
+          {"launch", launch, METH_VARARGS, "Entry point for all kernels"},
+          {"launch_many", launchMany, METH_VARARGS, "Replay a sequence of launches"},
           {NULL, NULL, 0, NULL} // sentinel
         };
 
@@ -1988,7 +2189,10 @@ class CudaUtils(object):
         mod = importlib.util.module_from_spec(spec)
         spec.loader.exec_module(mod)
         self.load_binary = mod.load_binary
-        self.get_device_properties = mod.get_device_properties
+        # properties of a device don't change while the process runs
+        self.get_device_properties = functools.lru_cache(maxsize=None)(mod.get_device_properties)
+        self.launch = mod.launch
+        self.launch_many = mod.launch_many
 
 
 def init_cuda_utils():
@@ -15,7 +15,7 @@ import triton.language as tl
 
 @triton.heuristics({
     'EVEN_K': lambda nargs: nargs['K'] % nargs['TILE_K'] == 0,
-})
+}, depends_on=['K', 'TILE_K'])
 @triton.jit
 def _sdd_kernel(
     A, B, C,
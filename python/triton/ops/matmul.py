@@ -10,20 +10,12 @@ def init_to_zero(name):
 
 
 def get_configs_io_bound():
-    configs = []
-    for num_stages in [2, 3, 4, 5, 6]:
-        for block_m in [16, 32]:
-            for block_k in [32, 64]:
-                for block_n in [32, 64, 128, 256]:
-                    num_warps = 2 if block_n <= 64 else 4
-                    configs.append(
-                        triton.Config({'BLOCK_M': block_m, 'BLOCK_N': block_n, 'BLOCK_K': block_k, 'SPLIT_K': 1},
-                                      num_stages=num_stages, num_warps=num_warps))
-                    # split_k
-                    for split_k in [2, 4, 8, 16]:
-                        configs.append(triton.Config({'BLOCK_M': block_m, 'BLOCK_N': block_n, 'BLOCK_K': block_k, 'SPLIT_K': split_k},
-                                                     num_stages=num_stages, num_warps=num_warps, pre_hook=init_to_zero('C')))
-    return configs
+    # num_warps follows BLOCK_N
+    space = dict(BLOCK_M=[16, 32], BLOCK_N=[32, 64, 128, 256], BLOCK_K=[32, 64],
+                 num_stages=[2, 3, 4, 5, 6], num_warps=[2, 4],
+                 constraints=[lambda c: c['num_warps'] == (2 if c['BLOCK_N'] <= 64 else 4)])
+    return triton.ConfigSpace(**space, SPLIT_K=[1]).configs() + \
+        triton.ConfigSpace(**space, SPLIT_K=[2, 4, 8, 16], pre_hook=init_to_zero('C')).configs()
 
 
 @triton.autotune(
@@ -58,7 +50,7 @@ def get_configs_io_bound():
 )
 @triton.heuristics({
     'EVEN_K': lambda args: args['K'] % (args['BLOCK_K'] * args['SPLIT_K']) == 0,
-})
+}, depends_on=['K', 'BLOCK_K', 'SPLIT_K'])
 @triton.jit
 def _kernel(A, B, C, M, N, K,
             stride_am, stride_ak,
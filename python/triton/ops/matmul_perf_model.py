@@ -1,4 +1,8 @@
 import heapq
+import json
+import math
+import os
+import re
 
 import torch
 
@@ -32,6 +36,248 @@ def get_tflops(backend, device, num_ctas, num_warps, dtype):
     return get_tensorcore_tflops(backend, device, num_ctas, num_warps, dtype)
 
 
+# -----------------------------------------------------------------------------
+# Device models
+# -----------------------------------------------------------------------------
+#
+# `estimate_matmul_time` combines the peak throughputs of a device with a few
+# coefficients that depend on the device's memory hierarchy -- e.g. the L2 hit
+# rate of the loads of A and B, or the efficiency of stores. Their defaults
+# were measured on A100s; `calibrate` fits them to the (config, shape, time)
+# samples measured on another device, and the fitted `DeviceModel` is stored
+# per device name, in $TRITON_PERF_MODEL_DIR (default: ~/.triton/perf_models),
+# where `get_device_model` finds it.
+
+
+def _peak_tflops(device, dtype):
+    backend = _triton.runtime.backend.CUDA
+    capability = torch.cuda.get_device_capability(device)
+    if capability[0] < 8 and dtype == torch.float32:
+        return get_max_simd_tflops(dtype, backend, device)
+    return get_max_tensorcore_tflops(dtype, backend, device)
+
+
+def perf_model_dir():
+    return os.environ.get("TRITON_PERF_MODEL_DIR", os.path.join(os.environ["HOME"], ".triton", "perf_models"))
+
+
+def _dtype_name(dtype):
+    return str(dtype).split(".")[-1]
+
+
+def _dtype_size(dtype_name):
+    dtype = getattr(torch, dtype_name)
+    info = torch.finfo(dtype) if dtype.is_floating_point else torch.iinfo(dtype)
+    return info.bits // 8
+
+
+class DeviceModel:
+    """
+    Characteristics of a device used by :code:`estimate_matmul_time`.
+
+    :param num_sm: number of streaming multiprocessors (compute units)
+    :param dram_gbps: DRAM bandwidth in GB/s
+    :param peak_tflops: peak throughput of matmuls, by dtype name (e.g. :code:`"float16"`)
+    :param device: index of the device the model describes, to query the peak
+        throughput of the dtypes missing from :code:`peak_tflops`
+    """
+
+    # fitted coefficients: default (A100) value and range
+    COEFFICIENTS = {
+        # number of active CTAs saturating DRAM bandwidth
+        "saturating_ctas": (32.0, (1.0, 1024.0)),
+        # fraction of the DRAM bandwidth reached by the CTAs above `saturating_ctas`
+        "tail_bw_fraction": (0.05, (0.0, 0.5)),
+        # fraction of the repeated loads of A and B served by the L2 cache
+        "l2_hit_rate": (0.8, (0.0, 1.0)),
+        # L2 bandwidth, relative to DRAM bandwidth
+        "l2_bw_ratio": (4.0, (1.0, 16.0)),
+        # store bandwidth, relative to DRAM bandwidth
+        "store_efficiency": (0.6, (0.05, 1.0)),
+    }
+
+    def __init__(self, name, num_sm, dram_gbps, peak_tflops, device=None, **coefficients):
+        unknown = coefficients.keys() - DeviceModel.COEFFICIENTS.keys()
+        if unknown:
+            raise TypeError(f"unknown coefficients: {', '.join(sorted(unknown))}")
+        self.name = name
+        self.num_sm = num_sm
+        self.dram_gbps = dram_gbps
+        self.peak_tflops = dict(peak_tflops)
+        self.device = device
+        for coefficient, (default, _) in DeviceModel.COEFFICIENTS.items():
+            setattr(self, coefficient, coefficients.get(coefficient, default))
+
+    @staticmethod
+    def from_device(device=None):
+        """Return the default model of :code:`device` (default: the current device)."""
+        if device is None:
+            device = torch.cuda.current_device()
+        backend = _triton.runtime.backend.CUDA
+        triton.compiler.init_cuda_utils()
+        num_sm = triton.compiler.cuda_utils.get_device_properties(device)["multiprocessor_count"]
+        return DeviceModel(torch.cuda.get_device_name(device), num_sm, get_dram_gbps(backend, device), dict(),
+                           device=device)
+
+    def coefficients(self):
+        return {coefficient: getattr(self, coefficient) for coefficient in DeviceModel.COEFFICIENTS}
+
+    def replace(self, **coefficients):
+        """Return a copy of the model with other coefficients."""
+        return DeviceModel(self.name, self.num_sm, self.dram_gbps, self.peak_tflops, self.device,
+                           **dict(self.coefficients(), **coefficients))
+
+    def peak(self, dtype):
+        """Peak throughput in TOPS of matmuls of :code:`dtype`."""
+        dtype = _dtype_name(dtype)
+        if dtype not in self.peak_tflops:
+            if self.device is None:
+                raise KeyError(f"no peak throughput for {dtype} in the model of {self.name}")
+            self.peak_tflops[dtype] = _peak_tflops(self.device, getattr(torch, dtype))
+        return self.peak_tflops[dtype]
+
+    def _estimate(self, M, N, K, BLOCK_M, BLOCK_N, SPLIT_K, num_warps, dtype):
+        # every argument but `dtype` is a float64 tensor: configs are estimated elementwise
+        dtsize = _dtype_size(_dtype_name(dtype))
+
+        num_cta_m = torch.ceil(M / BLOCK_M)
+        num_cta_n = torch.ceil(N / BLOCK_N)
+        num_cta_k = SPLIT_K
+        num_ctas = num_cta_m * num_cta_n * num_cta_k
+
+        # If the input is smaller than the block size
+        M, N = torch.maximum(M, BLOCK_M), torch.maximum(N, BLOCK_N)
+
+        # time to compute
+        total_ops = 2 * M * N * K / (1024 * 1024 * 1024)  # GOPS
+        total_warps = num_ctas * torch.clamp(num_warps, max=4)
+        num_subcores = self.num_sm * 4  # on recent GPUs
+        tput = torch.clamp(total_warps, max=num_subcores) / num_subcores * self.peak(dtype)  # in TOPS
+        compute_ms = total_ops / tput
+
+        # time to load data
+        active_cta_ratio = torch.clamp(num_ctas / self.num_sm, max=1)
+        # `saturating_ctas` active ctas are enough to saturate
+        active_cta_ratio_bw1 = torch.clamp(num_ctas / self.saturating_ctas, max=1)
+        # up to one cta per SM, for the remaining bandwidth
+        if self.num_sm > self.saturating_ctas:
+            active_cta_ratio_bw2 = torch.clamp((num_ctas - self.saturating_ctas) / (self.num_sm - self.saturating_ctas),
+                                               min=0, max=1)
+        else:
+            active_cta_ratio_bw2 = torch.clamp(torch.floor(num_ctas / self.saturating_ctas), max=1)
+        bw_ratio = active_cta_ratio_bw1 * (1 - self.tail_bw_fraction) + active_cta_ratio_bw2 * self.tail_bw_fraction
+        dram_bw = self.dram_gbps * bw_ratio  # in GB/s
+        l2_bw = dram_bw * self.l2_bw_ratio
+        # assume `l2_hit_rate` of (following) loads are in L2 cache
+        l2_miss_rate = 1 - self.l2_hit_rate
+        load_a_dram = M * K * dtsize * (1 + l2_miss_rate * (num_cta_n - 1))
+        load_a_l2 = M * K * dtsize * self.l2_hit_rate * (num_cta_n - 1)
+        load_b_dram = N * K * dtsize * (1 + l2_miss_rate * (num_cta_m - 1))
+        load_b_l2 = N * K * dtsize * self.l2_hit_rate * (num_cta_m - 1)
+        # total
+        total_dram = (load_a_dram + load_b_dram) / (1024 * 1024)  # MB
+        total_l2 = (load_a_l2 + load_b_l2) / (1024 * 1024)
+        # loading time in ms
+        load_ms = total_dram / dram_bw + total_l2 / l2_bw
+
+        # estimate storing time
+        store_bw = dram_bw * self.store_efficiency
+        store_c_dram = M * N * dtsize * SPLIT_K / (1024 * 1024)  # MB
+        store_ms = store_c_dram / store_bw
+        # with SPLIT_K > 1, c.zero_()
+        zero_ms = M * N * 2 / (1024 * 1024) / store_bw
+        store_ms = store_ms + zero_ms * torch.clamp(SPLIT_K - 1, max=1)
+
+        total_ms = torch.maximum(compute_ms, load_ms) + store_ms
+        return total_ms, compute_ms, load_ms, store_ms, active_cta_ratio
+
+    def estimate_batch(self, M, N, K, BLOCK_M, BLOCK_N, BLOCK_K, SPLIT_K, num_warps, num_stages, dtype):
+        """
+        Return the estimated running times in ms of many matmuls, as a tensor: every argument
+        but :code:`dtype` is either a sequence, with one value per matmul, or a scalar.
+        """
+        def column(values):
+            if isinstance(values, torch.Tensor):
+                return values
+            return torch.tensor(values if isinstance(values, (list, tuple)) else [values], dtype=torch.float64)
+        return self._estimate(*map(column, [M, N, K, BLOCK_M, BLOCK_N, SPLIT_K, num_warps]), dtype)[0]
+
+    def estimate(self, M, N, K, BLOCK_M, BLOCK_N, BLOCK_K, SPLIT_K, num_warps, num_stages, dtype, debug=False):
+        ''' return estimated running time in ms
+              = max(compute, loading) + store '''
+        columns = [torch.tensor([value], dtype=torch.float64) for value in [M, N, K, BLOCK_M, BLOCK_N, SPLIT_K, num_warps]]
+        total_ms, compute_ms, load_ms, store_ms, active_cta_ratio = self._estimate(*columns, dtype)
+        if debug:
+            print(f'Total time: {total_ms.item()}ms, compute time: {compute_ms.item()}ms, '
+                  f'loading time: {load_ms.item()}ms, store time: {store_ms.item()}ms, '
+                  f'Activate CTAs: {active_cta_ratio.item()*100}%')
+        return total_ms.item()
+
+    def estimate_matmul_time(self, num_warps, num_stages, A, B, C, M, N, K, BLOCK_M, BLOCK_N, BLOCK_K, SPLIT_K,
+                             debug=False, **kwargs):
+        """:code:`estimate_matmul_time` with this model."""
+        return self.estimate(M, N, K, BLOCK_M, BLOCK_N, BLOCK_K, SPLIT_K, num_warps, num_stages, A.dtype, debug)
+
+    def estimate_configs(self, configs, A, M, N, K, **kwargs):
+        """Return the estimated running time in ms of each of the matmul :code:`configs`."""
+        def column(name):
+            return [config.kwargs[name] for config in configs]
+        return self.estimate_batch(M, N, K, column('BLOCK_M'), column('BLOCK_N'), column('BLOCK_K'), column('SPLIT_K'),
+                                   [config.num_warps for config in configs], [config.num_stages for config in configs],
+                                   A.dtype).tolist()
+
+    def perf_model(self):
+        """Return :code:`estimate_matmul_time` with this model, for the :code:`perf_model` of :code:`prune_configs_by`."""
+        def estimate_matmul_time(*args, **kwargs):
+            return self.estimate_matmul_time(*args, **kwargs)
+        estimate_matmul_time.batched = self.estimate_configs
+        return estimate_matmul_time
+
+    def to_json(self):
+        return {"name": self.name, "num_sm": self.num_sm, "dram_gbps": self.dram_gbps,
+                "peak_tflops": self.peak_tflops, "coefficients": self.coefficients()}
+
+    @staticmethod
+    def from_json(data, device=None):
+        return DeviceModel(data["name"], data["num_sm"], data["dram_gbps"], data["peak_tflops"], device,
+                           **data["coefficients"])
+
+    def path(self):
+        return os.path.join(perf_model_dir(), re.sub(r"[^\w.-]", "_", self.name) + ".json")
+
+    def save(self, path=None):
+        """Store the model, by default where :code:`get_device_model` finds it."""
+        path = path or self.path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.to_json(), f, indent=1)
+        os.replace(tmp_path, path)
+        _device_models.clear()
+
+
+_device_models = dict()
+
+
+def get_device_model(device=None):
+    """
+    Return the model of :code:`device` (default: the current device): the one stored
+    for its name by :code:`DeviceModel.save`, if any, and the default one otherwise.
+    """
+    if device is None:
+        device = torch.cuda.current_device()
+    if device not in _device_models:
+        model = DeviceModel.from_device(device)
+        if os.path.exists(model.path()):
+            with open(model.path()) as f:
+                stored = DeviceModel.from_json(json.load(f), device)
+            # the hardware characteristics are those of the actual device
+            model = model.replace(**stored.coefficients())
+            model.peak_tflops.update(stored.peak_tflops)
+        _device_models[device] = model
+    return _device_models[device]
+
+
 def estimate_matmul_time(
     # backend, device,
     num_warps, num_stages,
@@ -42,60 +288,102 @@ def estimate_matmul_time(
 ):
     ''' return estimated running time in ms
           = max(compute, loading) + store '''
-    backend = _triton.runtime.backend.CUDA
-    device = torch.cuda.current_device()
-    dtype = A.dtype
-    dtsize = A.element_size()
-
-    num_cta_m = triton.cdiv(M, BLOCK_M)
-    num_cta_n = triton.cdiv(N, BLOCK_N)
-    num_cta_k = SPLIT_K
-    num_ctas = num_cta_m * num_cta_n * num_cta_k
-
-    # If the input is smaller than the block size
-    M, N = max(M, BLOCK_M), max(N, BLOCK_N)
-
-    # time to compute
-    total_ops = 2 * M * N * K / (1024 * 1024 * 1024)  # GOPS
-    tput = get_tflops(backend, device, num_ctas, num_warps, dtype)
-    compute_ms = total_ops / tput
-
-    # time to load data
-    num_sm = triton.compiler.cuda_utils.get_device_properties(device)["multiprocessor_count"]
-    active_cta_ratio = min(1, num_ctas / num_sm)
-    active_cta_ratio_bw1 = min(1, num_ctas / 32)  # 32 active ctas are enough to saturate
-    active_cta_ratio_bw2 = max(min(1, (num_ctas - 32) / (108 - 32)), 0)  # 32-108, remaining 5%
-    dram_bw = get_dram_gbps(backend, device) * (active_cta_ratio_bw1 * 0.95 + active_cta_ratio_bw2 * 0.05)  # in GB/s
-    l2_bw = dram_bw * 4  # rough estimation (should be 4.7 for A100?)
-    # assume 80% of (following) loads are in L2 cache
-    load_a_dram = M * K * dtsize * (1 + 0.2 * (num_cta_n - 1))
-    load_a_l2 = M * K * dtsize * 0.8 * (num_cta_n - 1)
-    load_b_dram = N * K * dtsize * (1 + 0.2 * (num_cta_m - 1))
-    load_b_l2 = N * K * dtsize * 0.8 * (num_cta_m - 1)
-    # total
-    total_dram = (load_a_dram + load_b_dram) / (1024 * 1024)  # MB
-    total_l2 = (load_a_l2 + load_b_l2) / (1024 * 1024)
-    # loading time in ms
-    load_ms = total_dram / dram_bw + total_l2 / l2_bw
-
-    # estimate storing time
-    store_bw = dram_bw * 0.6  # :o
-    store_c_dram = M * N * dtsize * SPLIT_K / (1024 * 1024)  # MB
-    if SPLIT_K == 1:
-        store_ms = store_c_dram / store_bw
-    else:
-        reduce_bw = store_bw
-        store_ms = store_c_dram / reduce_bw
-        # c.zero_()
-        zero_ms = M * N * 2 / (1024 * 1024) / store_bw
-        store_ms += zero_ms
+    model = get_device_model()
+    return model.estimate(M, N, K, BLOCK_M, BLOCK_N, BLOCK_K, SPLIT_K, num_warps, num_stages, A.dtype, debug)
+
+
+def estimate_configs(configs, A, M, N, K, **kwargs):
+    ''' return the estimated running time in ms of each of the `configs` '''
+    return get_device_model().estimate_configs(configs, A, M, N, K, **kwargs)
 
-    total_time_ms = max(compute_ms, load_ms) + store_ms
-    if debug:
-        print(f'Total time: {total_time_ms}ms, compute time: {compute_ms}ms, '
-              f'loading time: {load_ms}ms, store time: {store_ms}ms, '
-              f'Activate CTAs: {active_cta_ratio*100}%')
-    return total_time_ms
+
+# estimate all the configs of `prune_configs_by` at once
+estimate_matmul_time.batched = estimate_configs
+
+
+# -----------------------------------------------------------------------------
+# Calibration
+# -----------------------------------------------------------------------------
+#
+# A sample is a dict of the shape (M, N, K), config (BLOCK_M, BLOCK_N,
+# BLOCK_K, SPLIT_K, num_warps, num_stages), dtype name and measured runtime
+# (time_ms) of a matmul. `calibrate` fits the coefficients of a model to
+# minimize the mean squared error of the logarithm of its estimates, with a
+# pattern search within the range of each coefficient: configs are pruned by
+# the ratios of their estimated runtimes, not by their absolute values.
+
+SAMPLE_FIELDS = ["M", "N", "K", "BLOCK_M", "BLOCK_N", "BLOCK_K", "SPLIT_K", "num_warps", "num_stages", "dtype"]
+
+
+def samples_from_timings(configs_timings, M, N, K, dtype):
+    """
+    Return the samples of the :code:`configs_timings` of a matmul :code:`Autotuner`
+    tuned for a given shape and dtype.
+    """
+    samples = []
+    for config, timing in configs_timings.items():
+        time_ms = timing[0]
+        if math.isinf(time_ms):
+            continue
+        samples.append(dict(M=M, N=N, K=K, num_warps=config.num_warps, num_stages=config.num_stages,
+                            dtype=_dtype_name(dtype), time_ms=time_ms, **config.kwargs))
+    return samples
+
+
+def _sample_columns(samples):
+    # samples as float64 tensors, by dtype
+    by_dtype = dict()
+    for sample in samples:
+        by_dtype.setdefault(sample["dtype"], []).append(sample)
+    return {dtype: [torch.tensor([sample[field] for sample in dtype_samples], dtype=torch.float64)
+                    for field in SAMPLE_FIELDS[:-1] + ["time_ms"]]
+            for dtype, dtype_samples in by_dtype.items()}
+
+
+def _loss(model, columns):
+    total, count = 0.0, 0
+    for dtype, (*fields, time_ms) in columns.items():
+        estimates = model.estimate_batch(*fields, dtype)
+        total += torch.sum(torch.log(estimates / time_ms) ** 2).item()
+        count += len(time_ms)
+    return total / count
+
+
+def calibration_loss(model, samples):
+    """Mean squared error of the logarithm of the runtimes estimated by :code:`model`."""
+    return _loss(model, _sample_columns(samples))
+
+
+def calibrate(model, samples, coefficients=None, max_steps=200):
+    """
+    Fit the :code:`coefficients` (default: all of them) of :code:`model` to :code:`samples`.
+
+    :return: the fitted model, and its loss (see :code:`calibration_loss`)
+    """
+    names = list(coefficients or DeviceModel.COEFFICIENTS)
+    values = model.coefficients()
+    columns = _sample_columns(samples)
+    best = _loss(model, columns)
+    steps = {name: (hi - lo) / 4 for name, (_, (lo, hi)) in DeviceModel.COEFFICIENTS.items()}
+    for _ in range(max_steps):
+        improved = False
+        for name in names:
+            lo, hi = DeviceModel.COEFFICIENTS[name][1]
+            for direction in [1, -1]:
+                value = min(hi, max(lo, values[name] + direction * steps[name]))
+                if value == values[name]:
+                    continue
+                candidate = dict(values, **{name: value})
+                loss = _loss(model.replace(**candidate), columns)
+                if loss < best:
+                    values, best, improved = candidate, loss, True
+                    break
+        if not improved:
+            steps = {name: step / 2 for name, step in steps.items()}
+            if all(steps[name] < 1e-4 * (DeviceModel.COEFFICIENTS[name][1][1] - DeviceModel.COEFFICIENTS[name][1][0])
+                   for name in names):
+                break
+    return model.replace(**values), best
 
 
 def early_config_prune(configs, named_args):
@@ -106,15 +394,15 @@ def early_config_prune(configs, named_args):
     dtype = named_args['A'].dtype
 
     # 1. make sure we have enough smem
+    # TODO: move to `cuda_utils` submodule
+    triton.compiler.init_cuda_utils()
+    max_shared_memory = triton.compiler.cuda_utils.get_device_properties(device)["max_shared_mem"]
     pruned_configs = []
     for config in configs:
         kw = config.kwargs
         BLOCK_M, BLOCK_N, BLOCK_K, num_stages = \
             kw['BLOCK_M'], kw['BLOCK_N'], kw['BLOCK_K'], config.num_stages
 
-        # TODO: move to `cuda_utils` submodule
-        triton.compiler.init_cuda_utils()
-        max_shared_memory = triton.compiler.cuda_utils.get_device_properties(device)["max_shared_mem"]
         required_shared_memory = (BLOCK_M + BLOCK_N) * BLOCK_K * num_stages * dtsize
         if required_shared_memory <= max_shared_memory:
             pruned_configs.append(config)
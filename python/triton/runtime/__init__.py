@@ -1,12 +1,27 @@
+from . import (bucketing, compile_farm, compile_trace, config_space, launch_plan,
+               manifest, probes, search, telemetry, tuning_cache, workload)
 from .autotuner import Config, Heuristics, autotune, heuristics
+from .config_space import ConfigSpace
 from .jit import JITFunction, KernelInterface, version_key
 
 __all__ = [
     "Config",
+    "config_space",
+    "ConfigSpace",
     "Heuristics",
     "autotune",
+    "bucketing",
+    "compile_farm",
+    "compile_trace",
     "heuristics",
     "JITFunction",
     "KernelInterface",
+    "launch_plan",
+    "manifest",
+    "probes",
+    "search",
+    "telemetry",
+    "tuning_cache",
     "version_key",
+    "workload",
 ]
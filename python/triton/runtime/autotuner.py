@@ -4,24 +4,51 @@ import builtins
 import time
 from typing import Dict
 
+import torch
+
 from ..compiler import OutOfResources
-from ..testing import do_bench
+from ..testing import bencher
+from . import search as searches
+from . import telemetry, tuning_cache, workload
+from .bucketing import BucketStats, describe
+from .compile_farm import compile_many, iter_compile
+from .config_space import ConfigSpace, ResourceLimits, prune_by_resources
 from .jit import KernelInterface
 
 
 class Autotuner(KernelInterface):
-    def __init__(self, fn, arg_names, configs, key, reset_to_zero, prune_configs_by: Dict = None):
+    def __init__(self, fn, arg_names, configs, key, reset_to_zero, prune_configs_by: Dict = None, persistent=None,
+                 bucket=None, precompile=False, search=None):
         '''
         :param prune_configs_by: a dict of functions that are used to prune configs, fields:
             'perf_model': performance model used to predicate running time with different configs, returns running time
             'top_k': number of configs to bench
             'prune_num_stages_by'(optional): a function used to prune num_stages. It take configs:List[Config] as its input, and returns pruned configs.
+            'resources'(optional): `True`, or a dict of `ResourceLimits` arguments, to drop the configs whose compiled
+            kernel doesn't fit on the device (see :code:`triton.runtime.config_space`)
+        :param persistent: whether to store tuning results on disk (see :code:`triton.runtime.tuning_cache`);
+            defaults to :code:`$TRITON_PERSISTENT_AUTOTUNE`
+        :param bucket: bucketing policy of the key arguments (see :code:`triton.runtime.bucketing`), either
+            a dict mapping argument names to policies or a single policy for all of them
+        :param precompile: whether to compile all configs concurrently (see :code:`triton.runtime.compile_farm`)
+            before benchmarking them, rather than each one lazily, on its first benchmarked call. Off by
+            default, since workers are forked from a process that may use CUDA and run other threads
+        :param search: search strategy deciding how long each config is benchmarked (see
+            :code:`triton.runtime.search`); defaults to benchmarking all of them fully
         '''
+        if isinstance(configs, ConfigSpace):
+            configs = configs.configs()
         if not configs:
             self.configs = [Config(dict(), num_warps=4, num_stages=2)]
         else:
             self.configs = configs
         self.key_idx = [arg_names.index(k) for k in key]
+        self.bucket = None
+        if bucket is not None:
+            if callable(bucket):
+                bucket = {k: bucket for k in key}
+            self.bucket = [bucket.get(k) for k in key]
+            self.bucket_stats = BucketStats()
         self.cache = dict()
         # hook to reset all required tensor to zeros before relaunching a kernel
         self.hook = lambda args: 0
@@ -35,16 +62,31 @@ class Autotuner(KernelInterface):
         self.arg_names = arg_names
         # prune configs
         if prune_configs_by:
-            perf_model, top_k = prune_configs_by['perf_model'], prune_configs_by['top_k']
-            if 'early_config_prune' in prune_configs_by:
-                early_config_prune = prune_configs_by['early_config_prune']
+            perf_model, top_k = prune_configs_by.get('perf_model'), prune_configs_by.get('top_k')
+            early_config_prune = prune_configs_by.get('early_config_prune')
+            resources = prune_configs_by.get('resources')
         else:
-            perf_model, top_k, early_config_prune = None, None, None
+            perf_model, top_k, early_config_prune, resources = None, None, None, None
         self.perf_model, self.configs_top_k = perf_model, top_k
         self.early_config_prune = early_config_prune
+        if resources is True:
+            resources = ResourceLimits()
+        elif isinstance(resources, dict):
+            resources = ResourceLimits(**resources)
+        self.resource_limits = resources or None
+        # why configs were dropped by `resources`, in the last pruning
+        self.resource_report = dict()
         self.fn = fn
+        self.persistent = tuning_cache.enabled() if persistent is None else persistent
+        # persistent tuning results, per device
+        self.tuning_tables = dict()
+        self.precompile = precompile
+        self.search = searches.Exhaustive() if search is None else search
+        self.tuning_report = None
+        self.stats = telemetry.TuningStats(workload.kernel_name(fn))
 
-    def _bench(self, *args, config, **meta):
+    def _bench(self, *args, config, rep=100, **meta):
+        # runtimes of the runs of `config`, in ms
         # check for conflicts, i.e. meta-parameters both provided
         # as kwargs and by the autotuner
         conflicts = meta.keys() & config.kwargs.keys()
@@ -62,25 +104,42 @@ class Autotuner(KernelInterface):
             self.hook(args)
             self.fn.run(*args, num_warps=config.num_warps, num_stages=config.num_stages, **current)
         try:
-            return do_bench(kernel_call)
+            return bencher().run(kernel_call, warmup=min(25, rep), rep=rep).samples
         except OutOfResources:
-            return float('inf')
+            return [float('inf')]
 
     def run(self, *args, **kwargs):
         self.nargs = dict(zip(self.arg_names, args))
         if len(self.configs) > 1:
             key = tuple([args[i] for i in self.key_idx])
+            if self.bucket is not None:
+                shape, key = key, self._bucket_key(key)
+            if workload.recorder is not None:
+                workload.recorder.record(self, key, args, kwargs)
+            if key not in self.cache and self.persistent:
+                index = self._tuning_table().get(key)
+                if index is not None:
+                    self.cache[key] = self.configs[index]
+                    self.stats.record_table_hit()
+            if self.bucket is not None:
+                self.bucket_stats.record(shape, key, key in self.cache)
             if key not in self.cache:
                 # prune configs
+                tune_start = time.time()
                 pruned_configs = self.prune_configs(kwargs)
                 bench_start = time.time()
-                timings = {config: self._bench(*args, config=config, **kwargs)
-                           for config in pruned_configs}
+                timings = self._tune(args, pruned_configs, kwargs)
                 bench_end = time.time()
                 self.bench_time = bench_end - bench_start
                 self.cache[key] = builtins.min(timings, key=timings.get)
                 self.hook(args)
                 self.configs_timings = timings
+                n_pruned = len(self.configs) - len(pruned_configs) - len(self.resource_report)
+                self.stats.record_tune(key, len(self.configs), n_pruned, bench_end - tune_start,
+                                       self.tuning_report, timings, dropped=self.resource_report)
+                if self.persistent:
+                    best = self.cache[key]
+                    self._tuning_table().put(key, self.configs.index(best), timings[best])
             config = self.cache[key]
         else:
             config = self.configs[0]
@@ -89,7 +148,109 @@ class Autotuner(KernelInterface):
             config.pre_hook(self.nargs)
         return self.fn.run(*args, num_warps=config.num_warps, num_stages=config.num_stages, **kwargs, **config.kwargs)
 
-    def prune_configs(self, kwargs):
+    def _tune(self, args, configs, kwargs):
+        # return the (median, 20-th percentile, 80-th percentile) runtime of every config
+        report = {"compile_wait_s": 0.0, "bench_s": 0.0, "configs": dict()}
+        for config in configs:
+            report["configs"][str(config)] = {"compile_s": 0.0, "bench_s": 0.0, "runs": 0, "error": None}
+
+        # configs pruned by resources are already compiled
+        compiled = set(configs) if self.resource_limits is not None else set()
+
+        def measure(config, rep):
+            entry = report["configs"][str(config)]
+            if config not in compiled:
+                # time the first, compiling, call apart from the benchmark
+                compiled.add(config)
+                compile_start = time.time()
+                self._compile(args, config, kwargs)
+                entry["compile_s"] = time.time() - compile_start
+                report["compile_wait_s"] += entry["compile_s"]
+            bench_start = time.time()
+            samples = self._bench(*args, config=config, rep=rep, **kwargs)
+            entry["bench_s"] += time.time() - bench_start
+            entry["runs"] += len(samples)
+            if samples == [float('inf')] and entry["error"] is None:
+                entry["error"] = "out of resources"
+            report["bench_s"] += time.time() - bench_start
+            return samples
+        failed = dict()
+        if self.precompile and self.resource_limits is None and len(configs) > 1:
+            configs = self._precompile(args, configs, kwargs, report, failed, compiled)
+        samples = self.search(configs, measure)
+        samples.update(failed)
+        self.tuning_report = report
+        return {config: searches.timing(config_samples) for config, config_samples in samples.items()}
+
+    def _compile(self, args, config, kwargs):
+        try:
+            self.fn.warmup(*args, num_warps=config.num_warps, num_stages=config.num_stages,
+                           **dict(kwargs, **config.kwargs))
+        except OutOfResources:
+            # reported by the benchmark
+            pass
+
+    def _precompile(self, args, configs, kwargs, report, failed, compiled):
+        # compile every config in the background, and yield each one as soon as
+        # its binary is in the cache; configs that fail to compile drop out
+        jobs = dict()
+        for config in configs:
+            job = self.fn.compile_job(*args, num_warps=config.num_warps, num_stages=config.num_stages,
+                                      **kwargs, **config.kwargs)
+            jobs[id(job)] = (job, config)
+        results = iter_compile([job for job, _ in jobs.values()])
+        while True:
+            wait_start = time.time()
+            result = next(results, None)
+            report["compile_wait_s"] += time.time() - wait_start
+            if result is None:
+                return
+            config = jobs[id(result.job)][1]
+            entry = report["configs"][str(config)]
+            entry["compile_s"], entry["error"] = result.wall_time, result.error
+            if result.ok:
+                compiled.add(config)
+                yield config
+            else:
+                failed[config] = [float('inf')]
+
+    def _bucket_key(self, key):
+        return tuple(value if policy is None else policy(value) for value, policy in zip(key, self.bucket))
+
+    def _tuning_table(self):
+        device = torch.cuda.current_device()
+        if device not in self.tuning_tables:
+            variant = "" if self.bucket is None else ",".join(describe(policy) for policy in self.bucket)
+            self.tuning_tables[device] = tuning_cache.TuningTable(self.fn, self.configs, device, variant)
+        return self.tuning_tables[device]
+
+    def measure_regret(self, *args, **kwargs):
+        """
+        Benchmark the configs for the exact key values of :code:`args`, and record
+        in :code:`bucket_stats` how much slower the config selected for their bucket
+        is than the best config for these values.
+
+        :return: the relative slowdown, e.g. :code:`0.1` for 10%
+        """
+        assert self.bucket is not None, "regret is only defined for bucketed keys"
+        key = self._bucket_key(tuple([args[i] for i in self.key_idx]))
+        if key not in self.cache:
+            self.run(*args, **kwargs)
+        self.nargs = dict(zip(self.arg_names, args))
+        configs = list(self.prune_configs(kwargs))
+        if self.cache[key] not in configs:
+            configs.append(self.cache[key])
+        timings = {config: searches.timing(self._bench(*args, config=config, **kwargs))[0] for config in configs}
+        self.hook(args)
+        self.nargs = None
+        regret = timings[self.cache[key]] / builtins.min(timings.values()) - 1
+        self.bucket_stats.regrets.append(regret)
+        return regret
+
+    def prune_configs(self, kwargs, resources=True):
+        # `resources=False` skips pruning by resources, which loads kernels on the device
+        limits = self.resource_limits if resources else None
+        self.resource_report = dict()
         pruned_configs = self.configs
         if self.early_config_prune:
             pruned_configs = self.early_config_prune(self.configs, self.nargs)
@@ -98,25 +259,65 @@ class Autotuner(KernelInterface):
             if isinstance(top_k, float) and top_k <= 1.0:
                 top_k = int(len(self.configs) * top_k)
             if len(pruned_configs) > top_k:
-                est_timing = {
-                    config: self.perf_model(**self.nargs, **kwargs, **config.kwargs, num_stages=config.num_stages,
-                                            num_warps=config.num_warps)
-                    for config in pruned_configs
-                }
-                pruned_configs = sorted(est_timing.keys(), key=lambda x: est_timing[x])[:top_k]
+                if hasattr(self.perf_model, "batched"):
+                    estimates = self.perf_model.batched(pruned_configs, **self.nargs, **kwargs)
+                    est_timing = dict(zip(pruned_configs, estimates))
+                else:
+                    est_timing = {
+                        config: self.perf_model(**self.nargs, **kwargs, **config.kwargs, num_stages=config.num_stages,
+                                                num_warps=config.num_warps)
+                        for config in pruned_configs
+                    }
+                pruned_configs = sorted(est_timing.keys(), key=lambda x: est_timing[x])
+                if limits is None:
+                    return pruned_configs[:top_k]
+                # compile configs by increasing estimated time, until `top_k` of them fit
+                ranked, pruned_configs = pruned_configs, []
+                while ranked and len(pruned_configs) < top_k:
+                    n = top_k - len(pruned_configs)
+                    pruned_configs += self._prune_by_resources(ranked[:n], kwargs)
+                    ranked = ranked[n:]
+                return pruned_configs
+        if limits is not None:
+            pruned_configs = self._prune_by_resources(pruned_configs, kwargs)
         return pruned_configs
 
-    def warmup(self, *args, **kwargs):
+    def _prune_by_resources(self, configs, kwargs):
+        kept, dropped = prune_by_resources(self.fn, configs, list(self.nargs.values()), kwargs, self.resource_limits)
+        self.resource_report.update({str(config): reason for config, reason in dropped.items()})
+        return kept
+
+    def warmup(self, *args, max_workers=None, cc=None, **kwargs):
+        """
+        Compile the kernel for every (pruned) config, concurrently in up to
+        :code:`max_workers` processes (see :code:`triton.runtime.compile_farm`),
+        then load the binaries into the kernel's cache. When a compute capability
+        :code:`cc` is given, kernels are only compiled into the on-disk cache,
+        which doesn't require a GPU. Otherwise, CUDA is in use and forked workers
+        may deadlock: kernels are compiled in this process, unless :code:`max_workers`
+        is given.
+
+        :return: the :code:`CompileResult` of each config
+        """
         self.nargs = dict(zip(self.arg_names, args))
-        for config in self.prune_configs(kwargs):
-            self.fn.warmup(
-                *args,
-                num_warps=config.num_warps,
-                num_stages=config.num_stages,
-                **kwargs,
-                **config.kwargs,
-            )
+        configs = self.prune_configs(kwargs, resources=cc is None)
+        if cc is None and max_workers is None:
+            max_workers = 0
+        jobs = [self.fn.compile_job(*args, num_warps=config.num_warps, num_stages=config.num_stages,
+                                    cc=cc, **kwargs, **config.kwargs)
+                for config in configs]
+        results = compile_many(jobs, max_workers)
+        if cc is None:
+            for config in configs:
+                self.fn.warmup(
+                    *args,
+                    num_warps=config.num_warps,
+                    num_stages=config.num_stages,
+                    **kwargs,
+                    **config.kwargs,
+                )
         self.nargs = None
+        return results
 
 
 class Config:
@@ -150,7 +351,8 @@ class Config:
         return ', '.join(res)
 
 
-def autotune(configs, key, prune_configs_by=None, reset_to_zero=None):
+def autotune(configs, key, prune_configs_by=None, reset_to_zero=None, persistent=None, bucket=None,
+             precompile=False, search=None):
     """
     Decorator for auto-tuning a :code:`triton.jit`'d function.
     .. highlight:: python
@@ -169,37 +371,92 @@ def autotune(configs, key, prune_configs_by=None, reset_to_zero=None):
            This means that whatever value the kernel updates will be updated multiple times.
            To avoid this undesired behavior, you can use the `reset_to_zero` argument, which
            reset the value of the provided tensor to `zero` before running any configuration.
-    :param configs: a list of :code:`triton.Config` objects
-    :type configs: list[triton.Config]
+    :param configs: a list of :code:`triton.Config` objects, or a :code:`triton.ConfigSpace`
+    :type configs: list[triton.Config] | triton.ConfigSpace
     :param key: a list of argument names whose change in value will trigger the evaluation of all provided configs.
     :type key: list[str]
     :param prune_configs_by: a dict of functions that are used to prune configs, fields:
-        'perf_model': performance model used to predicate running time with different configs, returns running time
+        'perf_model': performance model used to predicate running time with different configs, returns running time.
+            If it has a `batched` attribute, `perf_model.batched(configs, **args)` is called instead, once for all
+            configs, and returns the running time of each of them
         'top_k': number of configs to bench
         'early_config_prune'(optional): a function used to do early prune (eg, num_stages). It take configs:List[Config] as its input, and returns pruned configs.
+        'resources'(optional): :code:`True`, or a dict of :code:`triton.runtime.config_space.ResourceLimits` arguments:
+            compile the configs, and drop those whose kernel doesn't fit on the device (shared memory, registers)
+            or spills registers. With a 'perf_model', configs are compiled by increasing estimated time until
+            'top_k' of them fit. Reasons are reported by the :code:`resource_report` attribute of the autotuner.
     :param reset_to_zero: a list of argument names whose value will be reset to zero before evaluating any configs.
     :type reset_to_zero: list[str]
+    :param persistent: whether to store the tuning results in the kernel cache, so that other processes
+        reuse them instead of re-tuning (default: :code:`$TRITON_PERSISTENT_AUTOTUNE`, see
+        :code:`triton.runtime.tuning_cache`).
+    :type persistent: bool
+    :param bucket: how to bucket the values of the key arguments, so that nearby values share one tuning decision:
+        a policy of :code:`triton.runtime.bucketing` (or any function from values to buckets) for all key
+        arguments, or a dict mapping argument names to policies. Bucket hit rates are reported by the
+        :code:`bucket_stats` attribute of the autotuner.
+    :param precompile: whether to compile all configs concurrently in worker processes before benchmarking
+        them. Configs that fail to compile are skipped, and the :code:`tuning_report` attribute of the
+        autotuner splits the last tuning's time into waiting for compilation and benchmarking. Off by
+        default: workers are forked, which is only safe if no other thread of the process holds a lock
+        they need (e.g. the kernel cache's uploader, or allocator pools).
+    :type precompile: bool
+    :param search: how to split benchmarking time between configs: an :code:`Exhaustive` (default),
+        :code:`SuccessiveHalving` or :code:`Racing` strategy of :code:`triton.runtime.search`. The latter
+        two stop measuring clearly slower configs early, which makes tuning large config spaces much faster.
+    :note: Every tuning is recorded by the :code:`stats` attribute of the autotuner (see
+           :code:`triton.runtime.telemetry`), and appended to :code:`$TRITON_AUTOTUNE_LOG` if set.
     """
     def decorator(fn):
-        return Autotuner(fn, fn.arg_names, configs, key, reset_to_zero, prune_configs_by)
+        return Autotuner(fn, fn.arg_names, configs, key, reset_to_zero, prune_configs_by, persistent, bucket,
+                         precompile, search)
 
     return decorator
 
 
 class Heuristics(KernelInterface):
 
-    def __init__(self, fn, arg_names, values) -> None:
+    def __init__(self, fn, arg_names, values, depends_on=None) -> None:
         self.fn = fn
         self.values = values
         self.arg_names = arg_names
+        self.depends_on = None
+        if depends_on is not None:
+            unknown = [name for name in depends_on if name not in arg_names]
+            if unknown:
+                raise ValueError(f"heuristics depend on unknown arguments: {', '.join(unknown)}")
+            self.depends_on = [(arg_names.index(name), name) for name in depends_on]
+        # computed values, by values of the `depends_on` arguments
+        self.cache = dict()
 
-    def run(self, *args, **kwargs):
+    def _evaluate(self, args, kwargs):
+        values = dict()
         for v, heur in self.values.items():
-            kwargs[v] = heur({**dict(zip(self.arg_names, args)), **kwargs})
-        return self.fn.run(*args, **kwargs)
+            values[v] = heur({**dict(zip(self.arg_names, args)), **kwargs, **values})
+        return values
+
+    def _apply(self, args, kwargs):
+        if self.depends_on is None:
+            values = self._evaluate(args, kwargs)
+        else:
+            key = tuple([args[i] if i < len(args) else kwargs.get(name) for i, name in self.depends_on])
+            values = self.cache.get(key)
+            if values is None:
+                values = self.cache[key] = self._evaluate(args, kwargs)
+        kwargs.update(values)
+        return kwargs
+
+    def run(self, *args, **kwargs):
+        return self.fn.run(*args, **self._apply(args, kwargs))
+
+    def warmup(self, *args, **kwargs):
+        return self.fn.warmup(*args, **self._apply(args, kwargs))
+
+    def compile_job(self, *args, **kwargs):
+        return self.fn.compile_job(*args, **self._apply(args, kwargs))
 
 
-def heuristics(values):
+def heuristics(values, depends_on=None):
     """
     Decorator for specifying how the values of certain meta-parameters may be computed.
     This is useful for cases where auto-tuning is prohibitevely expensive, or just not applicable.
@@ -212,8 +469,11 @@ def heuristics(values):
     .param values: a dictionary of meta-parameter names and functions that compute the value of the meta-parameter.
                    each such function takes a list of positional arguments as input.
     .type values: dict[str, Callable[[list[Any]], Any]]
+    .param depends_on: names of the (hashable, e.g. integer) arguments that the functions read. When given,
+                       the values are only computed once per distinct values of these arguments, and cached.
+    .type depends_on: list[str]
     """
     def decorator(fn):
-        return Heuristics(fn, fn.arg_names, values)
+        return Heuristics(fn, fn.arg_names, values, depends_on)
 
     return decorator
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import bisect
+import collections
+
+# -----------------------------------------------------------------------------
+# Autotuning key bucketing
+# -----------------------------------------------------------------------------
+#
+# By default, an `Autotuner` benchmarks its configs for every distinct value
+# of its `key` arguments. Bucketing policies map these values to coarser
+# buckets, so that nearby shapes share one tuning decision:
+#
+#     @triton.autotune(configs, key=['M', 'N', 'K'],
+#                      bucket={'M': PowerOfTwo(), 'K': Edges([256, 1024, 4096])})
+#
+# A policy is any callable mapping an argument value to its bucket; the
+# classes below also have a stable `repr`, which identifies their buckets in
+# persistent tuning tables.
+
+
+class PowerOfTwo:
+    """Round up to the next power of two, and to at least :code:`min`."""
+
+    def __init__(self, min=1):
+        self.min = min
+
+    def __call__(self, value):
+        bucket = self.min
+        while bucket < value:
+            bucket *= 2
+        return bucket
+
+    def __repr__(self):
+        return f"PowerOfTwo(min={self.min})"
+
+
+class Edges:
+    """
+    Round up to the next of the given bucket upper bounds; values above the last
+    one form a single bucket, :code:`inf`.
+    """
+
+    def __init__(self, edges):
+        self.edges = sorted(edges)
+
+    def __call__(self, value):
+        i = bisect.bisect_left(self.edges, value)
+        return self.edges[i] if i < len(self.edges) else float("inf")
+
+    def __repr__(self):
+        return f"Edges({self.edges})"
+
+
+class Divisibility:
+    """
+    Classify a value by the largest of :code:`divisors` that divides it, since
+    divisibility (e.g. by 16) often decides which config is fastest.
+    """
+
+    def __init__(self, divisors=(16, 8, 4, 2)):
+        self.divisors = sorted(divisors, reverse=True)
+
+    def __call__(self, value):
+        for divisor in self.divisors:
+            if value % divisor == 0:
+                return divisor
+        return 1
+
+    def __repr__(self):
+        return f"Divisibility({self.divisors})"
+
+
+class Combine:
+    """Bucket a value by several policies at once, e.g. magnitude and divisibility."""
+
+    def __init__(self, *policies):
+        self.policies = policies
+
+    def __call__(self, value):
+        return tuple(policy(value) for policy in self.policies)
+
+    def __repr__(self):
+        return f"Combine({', '.join(describe(policy) for policy in self.policies)})"
+
+
+def describe(policy):
+    if policy is None:
+        return "None"
+    # the repr of functions contains their address
+    if hasattr(policy, "__qualname__"):
+        return f"{policy.__module__}.{policy.__qualname__}"
+    return repr(policy)
+
+
+class BucketStats:
+    """
+    Statistics of the bucketed keys of an :code:`Autotuner`.
+
+    :ivar lookups: number of tuning lookups
+    :ivar hits: number of lookups served by an already tuned bucket
+    :ivar shapes: distinct (unbucketed) keys seen per bucket, up to :code:`max_shapes` of them,
+        so that shape-polymorphic workloads don't grow them without bound
+    :ivar regrets: relative slowdowns of the bucket's config versus the best config
+        for the exact key, as measured by :code:`Autotuner.measure_regret`
+    """
+
+    def __init__(self, max_shapes=64):
+        self.lookups = 0
+        self.hits = 0
+        self.max_shapes = max_shapes
+        self.shapes = collections.defaultdict(set)
+        self.regrets = []
+
+    def record(self, key, bucket, hit):
+        self.lookups += 1
+        self.hits += hit
+        shapes = self.shapes[bucket]
+        if len(shapes) < self.max_shapes:
+            shapes.add(key)
+
+    @property
+    def hit_rate(self):
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    def summary(self):
+        return {
+            "lookups": self.lookups,
+            "hit_rate": self.hit_rate,
+            "buckets": len(self.shapes),
+            "shapes": sum(len(keys) for keys in self.shapes.values()),
+            # buckets with more shapes than counted
+            "full_buckets": sum(len(keys) == self.max_shapes for keys in self.shapes.values()),
+            "mean_regret": sum(self.regrets) / len(self.regrets) if self.regrets else None,
+            "max_regret": max(self.regrets) if self.regrets else None,
+        }
@@ -0,0 +1,452 @@
+from __future__ import annotations
+
+import atexit
+import collections
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from filelock import FileLock, Timeout
+
+# -----------------------------------------------------------------------------
+# Kernel cache
+# -----------------------------------------------------------------------------
+#
+# Every cache key (see `make_hash` / `make_so_cache_key` in triton.compiler)
+# owns one directory under the cache root. When a byte budget is set through
+# $TRITON_CACHE_MAX_BYTES, the least recently used key directories are
+# evicted once the cache outgrows it. Recency is tracked by bumping the mtime
+# of a key directory whenever one of its files is looked up, since atime is
+# unreliable (noatime/relatime mounts).
+#
+# A remote backend (see `CacheBackend`), configured through
+# $TRITON_REMOTE_CACHE or `set_remote_backend`, can be layered below the
+# local directory: lookups that miss locally are read through from the remote
+# store, and files written locally are uploaded to it in the background. An
+# HTTP server that can't be reached isn't contacted again for a while.
+
+
+def default_cache_dir():
+    return os.path.join(os.environ["HOME"], ".triton", "cache")
+
+
+def parse_size(size):
+    """Parse a byte count such as :code:`1048576`, :code:`512M` or :code:`10G`."""
+    if isinstance(size, int):
+        return size
+    size = size.strip().upper().rstrip("B")
+    units = {"K": 2**10, "M": 2**20, "G": 2**30, "T": 2**40}
+    if size and size[-1] in units:
+        return int(float(size[:-1]) * units[size[-1]])
+    return int(size)
+
+
+def max_cache_bytes():
+    size = os.environ.get("TRITON_CACHE_MAX_BYTES", "")
+    return parse_size(size) if size else None
+
+
+# process-wide cache statistics
+_stats = collections.Counter()
+_stats_lock = threading.Lock()
+# number of bytes written since the last eviction pass
+_written_since_eviction = 0
+
+
+def _count(name, value=1):
+    with _stats_lock:
+        _stats[name] += value
+
+
+def get_cache_stats():
+    """
+    Return the cache statistics of the current process: number of file lookups
+    that :code:`hits` or :code:`misses`, files and bytes written (:code:`puts`,
+    :code:`put_bytes`), key directories / bytes evicted (:code:`evictions`,
+    :code:`evicted_bytes`), and for the remote backend the number of lookups
+    served by it (:code:`remote_hits`), files uploaded to it (:code:`remote_puts`)
+    and failed requests (:code:`remote_errors`).
+    """
+    with _stats_lock:
+        stats = dict.fromkeys(["hits", "misses", "puts", "put_bytes", "evictions", "evicted_bytes",
+                               "remote_hits", "remote_puts", "remote_errors"], 0)
+        stats.update(_stats)
+        return stats
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+# -----------------------------------------------------------------------------
+# Backends
+# -----------------------------------------------------------------------------
+
+
+class CacheBackend:
+    """
+    Key-value store of cache files, addressed by cache key (a hash computed by
+    :code:`make_hash` or :code:`make_so_cache_key`) and file name.
+    """
+
+    def get(self, key, filename):
+        """Return the contents of the file, or :code:`None` if it isn't stored."""
+        raise NotImplementedError
+
+    def put(self, key, filename, data):
+        raise NotImplementedError
+
+
+class LocalCacheBackend(CacheBackend):
+    """Cache files stored in a directory, e.g. on a shared network filesystem."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def get(self, key, filename):
+        try:
+            with open(os.path.join(self.root, key, filename), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, filename, data):
+        path = os.path.join(self.root, key, filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write under a unique name and rename, so that readers never see partial files
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+
+class HTTPCacheBackend(CacheBackend):
+    """
+    Cache files stored on an HTTP server, as :code:`GET`/:code:`PUT` requests
+    to :code:`<url>/<key>/<filename>` (e.g. a WebDAV share or an object store).
+
+    :param retry_after: seconds during which the server isn't contacted after it
+        couldn't be reached, so that local misses don't each wait for :code:`timeout`
+    """
+
+    def __init__(self, url, timeout=5, retry_after=60):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.retry_at = 0.0
+
+    def _url(self, key, filename):
+        return f"{self.url}/{key}/{urllib.parse.quote(filename)}"
+
+    def _open(self, request):
+        if time.monotonic() < self.retry_at:
+            raise ConnectionError(f"{self.url} is unreachable, retrying in {self.retry_at - time.monotonic():.0f}s")
+        try:
+            return urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError:
+            raise
+        except OSError:
+            # refused connections, timeouts, unknown hosts...
+            self.retry_at = time.monotonic() + self.retry_after
+            raise
+
+    def get(self, key, filename):
+        try:
+            with self._open(self._url(key, filename)) as response:
+                return response.read()
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return None
+            raise
+
+    def put(self, key, filename, data):
+        request = urllib.request.Request(self._url(key, filename), data=data, method="PUT")
+        self._open(request).close()
+
+
+class RedisCacheBackend(CacheBackend):
+    """Cache files stored in Redis (requires the :code:`redis` package)."""
+
+    def __init__(self, url, prefix="triton", ttl=None):
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("RedisCacheBackend requires the `redis` package")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def get(self, key, filename):
+        return self.client.get(f"{self.prefix}:{key}/{filename}")
+
+    def put(self, key, filename, data):
+        self.client.set(f"{self.prefix}:{key}/{filename}", data, ex=self.ttl)
+
+
+def backend_from_url(url):
+    scheme = urllib.parse.urlparse(url).scheme
+    if scheme in ["http", "https"]:
+        return HTTPCacheBackend(url)
+    if scheme in ["redis", "rediss"]:
+        return RedisCacheBackend(url)
+    if scheme == "file":
+        return LocalCacheBackend(urllib.parse.urlparse(url).path)
+    raise ValueError(f"unsupported remote cache URL: {url}")
+
+
+class _Uploader:
+    """Uploads files to the remote backend from a background thread."""
+
+    def __init__(self):
+        self.pid = None
+        self.lock = threading.Lock()
+
+    def submit(self, backend, key, filename, data):
+        # (re-)start the upload thread lazily, and in forked children
+        if self.pid != os.getpid():
+            with self.lock:
+                if self.pid != os.getpid():
+                    self.queue = queue.Queue()
+                    threading.Thread(target=self._run, args=(self.queue,), daemon=True).start()
+                    self.pid = os.getpid()
+        self.queue.put((backend, key, filename, data))
+
+    def _run(self, uploads):
+        while True:
+            backend, key, filename, data = uploads.get()
+            try:
+                backend.put(key, filename, data)
+                _count("remote_puts")
+            except Exception:
+                _count("remote_errors")
+            finally:
+                uploads.task_done()
+
+    def _after_fork(self):
+        # the lock may have been held by another thread of the parent
+        self.lock = threading.Lock()
+
+    def flush(self):
+        if self.pid == os.getpid():
+            self.queue.join()
+
+
+_uploader = _Uploader()
+atexit.register(_uploader.flush)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_uploader._after_fork)
+_remote_backend = None
+
+
+def set_remote_backend(backend):
+    """
+    Use :code:`backend` (a :code:`CacheBackend`, a URL, or :code:`None` to disable)
+    as the remote cache below the local cache directory.
+    """
+    global _remote_backend
+    if isinstance(backend, str):
+        backend = backend_from_url(backend)
+    _remote_backend = backend
+
+
+def get_remote_backend():
+    return _remote_backend
+
+
+def flush():
+    """Wait until all files written so far are uploaded to the remote backend."""
+    _uploader.flush()
+
+
+if os.environ.get("TRITON_REMOTE_CACHE"):
+    set_remote_backend(os.environ["TRITON_REMOTE_CACHE"])
+
+
+class CacheManager:
+
+    def __init__(self, key):
+        self.key = key
+        self.lock_path = None
+        self.file_lock = None
+        self.touched = False
+        # create cache directory if it doesn't exist
+        self.cache_root = os.environ.get('TRITON_CACHE_DIR', default_cache_dir())
+        self.cache_dir = self.cache_root
+        if self.cache_dir:
+            self.cache_dir = os.path.join(self.cache_dir, self.key)
+            self.lock_path = os.path.join(self.cache_dir, "lock")
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _make_path(self, filename):
+        return os.path.join(self.cache_dir, filename)
+
+    def lock(self):
+        """Return the lock of this key, held while writing its files; it is reentrant."""
+        assert self.lock_path is not None
+        if self.file_lock is None:
+            self.file_lock = FileLock(self.lock_path)
+        return self.file_lock
+
+    def _touch(self):
+        # mark this key as recently used, once per manager
+        if not self.touched:
+            self.touched = True
+            try:
+                os.utime(self.cache_dir)
+            except OSError:
+                pass
+
+    def has_file(self, filename):
+        if not self.cache_dir:
+            return False
+        if os.path.exists(self._make_path(filename)):
+            _count("hits")
+            self._touch()
+            return True
+        # read-through from the remote backend
+        if _remote_backend is not None:
+            try:
+                data = _remote_backend.get(self.key, filename)
+            except Exception:
+                data = None
+                _count("remote_errors")
+            if data is not None:
+                _count("remote_hits")
+                self._write(data, filename)
+                return True
+        _count("misses")
+        return False
+
+    def _write(self, data, filename):
+        filepath = self._make_path(filename)
+        try:
+            self._write_locked(data, filepath)
+        except FileNotFoundError:
+            # the key was evicted by another process since we created it
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._write_locked(data, filepath)
+
+    def _write_locked(self, data, filepath):
+        with self.lock():
+            # use tempfile to be robust against program interruptions
+            with open(filepath + ".tmp", "wb") as f:
+                f.write(data)
+            os.rename(filepath + ".tmp", filepath)
+
+    def put(self, data, filename, binary=True):
+        global _written_since_eviction
+        if not self.cache_dir:
+            return
+        if not isinstance(data, bytes):
+            data = str(data).encode("utf-8")
+        self._write(data, filename)
+        # write-behind to the remote backend
+        if _remote_backend is not None:
+            _uploader.submit(_remote_backend, self.key, filename, data)
+        _count("puts")
+        _count("put_bytes", len(data))
+        self.touched = True
+        # amortize the cost of scanning the cache directory: only look for
+        # entries to evict once a tenth of the budget has been written
+        max_bytes = max_cache_bytes()
+        if max_bytes is not None:
+            _written_since_eviction += len(data)
+            if _written_since_eviction >= max_bytes // 10:
+                _written_since_eviction = 0
+                evict(max_bytes, self.cache_root, keep=[self.key])
+
+
+# -----------------------------------------------------------------------------
+# Maintenance
+# -----------------------------------------------------------------------------
+
+
+class CacheEntry:
+    """A key directory of the cache."""
+
+    def __init__(self, root, key):
+        self.key = key
+        self.path = os.path.join(root, key)
+        self.files = os.listdir(self.path)
+        self.size = sum(os.path.getsize(os.path.join(self.path, f)) for f in self.files)
+        self.mtime = os.path.getmtime(self.path)
+
+    def verify(self):
+        """Return a list of problems with this entry (empty if it is sane)."""
+        problems = []
+        for f in self.files:
+            path = os.path.join(self.path, f)
+            if f.endswith(".tmp"):
+                problems.append(f"{f}: interrupted write")
+            elif f != "lock" and os.path.getsize(path) == 0:
+                problems.append(f"{f}: empty file")
+            elif f.endswith(".json"):
+                try:
+                    with open(path) as fp:
+                        json.load(fp)
+                except ValueError:
+                    problems.append(f"{f}: invalid JSON")
+        return problems
+
+
+def list_entries(cache_dir=None):
+    """Return the :code:`CacheEntry` of every key of the cache, least recently used first."""
+    cache_dir = cache_dir or os.environ.get('TRITON_CACHE_DIR', default_cache_dir())
+    if not os.path.isdir(cache_dir):
+        return []
+    entries = []
+    for key in os.listdir(cache_dir):
+        try:
+            entries.append(CacheEntry(cache_dir, key))
+        except OSError:
+            # concurrently removed, or not a directory
+            continue
+    return sorted(entries, key=lambda entry: entry.mtime)
+
+
+def remove_entry(entry):
+    """
+    Remove :code:`entry`, unless another process is writing to it.
+
+    :return: whether the entry was removed
+    """
+    trash = f"{entry.path}.{os.getpid()}.removed"
+    try:
+        # moved away under its lock: writers either finish before, or find
+        # the key gone and recreate it, but never write into a directory
+        # being deleted
+        with FileLock(os.path.join(entry.path, "lock"), timeout=0):
+            os.rename(entry.path, trash)
+    except (Timeout, OSError):
+        return False
+    shutil.rmtree(trash, ignore_errors=True)
+    return True
+
+
+def evict(max_bytes, cache_dir=None, keep=()):
+    """
+    Remove the least recently used keys of the cache until it holds at most
+    :code:`max_bytes`, never evicting the keys in :code:`keep` or being written.
+
+    :return: the evicted :code:`CacheEntry` objects
+    """
+    entries = list_entries(cache_dir)
+    total = sum(entry.size for entry in entries)
+    evicted = []
+    for entry in entries:
+        if total <= max_bytes:
+            break
+        if entry.key in keep or not remove_entry(entry):
+            continue
+        total -= entry.size
+        evicted.append(entry)
+        _count("evictions")
+        _count("evicted_bytes", entry.size)
+    return evicted
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import collections
+import multiprocessing
+import os
+import time
+import traceback
+from multiprocessing.connection import wait
+
+import torch
+
+import triton
+from . import cache
+
+# -----------------------------------------------------------------------------
+# Compile farm
+# -----------------------------------------------------------------------------
+#
+# Compiles many kernels concurrently, each job in its own forked process, so
+# that a crash in one of them (e.g. in LLVM or ptxas) only fails that job.
+# Workers only populate the on-disk kernel cache; the parent process then
+# loads the binaries from there. Processes that already use CUDA, or run
+# other threads, must not fork: they compile in-process, with `max_workers=0`.
+
+
+class CompileJob:
+    """
+    The arguments of one :code:`triton.compile` call.
+    """
+
+    def __init__(self, fn, signature, constants=None, configs=None, num_warps=4, num_stages=3,
+                 extern_libs=None, cc=None):
+        self.fn = fn
+        self.signature = signature
+        self.constants = dict() if constants is None else constants
+        self.configs = configs
+        self.num_warps = num_warps
+        self.num_stages = num_stages
+        self.extern_libs = extern_libs
+        self.cc = cc
+
+    def run(self):
+        triton.compile(self.fn, signature=self.signature, constants=self.constants, configs=self.configs,
+                       num_warps=self.num_warps, num_stages=self.num_stages, extern_libs=self.extern_libs,
+                       cc=self.cc, warm_cache_only=True)
+
+    def __repr__(self):
+        return f"CompileJob({self.fn}, constants={self.constants}, num_warps={self.num_warps}, num_stages={self.num_stages})"
+
+
+class CompileResult:
+    """
+    Outcome of a :code:`CompileJob`.
+
+    :ivar error: :code:`None` on success, the worker's traceback otherwise
+    :ivar wall_time: wall time of the job in seconds, including process start-up
+    """
+
+    def __init__(self, job, error, wall_time):
+        self.job = job
+        self.error = error
+        self.wall_time = wall_time
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        status = "ok" if self.ok else "failed"
+        return f"CompileResult({self.job}, {status}, wall_time={self.wall_time:.3f}s)"
+
+
+def _run_job(job, conn):
+    try:
+        job.run()
+        # the worker exits right after, without running atexit handlers
+        cache.flush()
+        conn.send(None)
+    except BaseException:
+        conn.send(traceback.format_exc())
+    finally:
+        conn.close()
+
+
+def _default_capability():
+    major, minor = torch.cuda.get_device_capability()
+    return major * 10 + minor
+
+
+def iter_compile(jobs, max_workers=None):
+    """
+    Run :code:`jobs` concurrently in up to :code:`max_workers` (default: number of CPUs)
+    worker processes, and yield a :code:`CompileResult` for each of them as soon as it
+    completes. With :code:`max_workers=0`, jobs run one after the other in this process.
+    """
+    jobs = collections.deque(jobs)
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    # everything that workers would otherwise re-compute -- or, for the target
+    # capability, query from a driver that must not be used after fork() -- is
+    # resolved once in the parent
+    capability = None
+    for job in jobs:
+        if job.cc is None:
+            capability = _default_capability() if capability is None else capability
+            job.cc = capability
+        job.fn.cache_key
+    if max_workers == 0:
+        for job in jobs:
+            start = time.time()
+            try:
+                job.run()
+                error = None
+            except Exception:
+                error = traceback.format_exc()
+            yield CompileResult(job, error, time.time() - start)
+        return
+    ctx = multiprocessing.get_context("fork")
+    running = dict()
+    while jobs or running:
+        while jobs and len(running) < max_workers:
+            job = jobs.popleft()
+            recv_conn, send_conn = ctx.Pipe(duplex=False)
+            proc = ctx.Process(target=_run_job, args=(job, send_conn), daemon=True)
+            start = time.time()
+            proc.start()
+            send_conn.close()
+            running[recv_conn] = (job, proc, start)
+        for conn in wait(list(running)):
+            job, proc, start = running.pop(conn)
+            try:
+                error = conn.recv()
+            except EOFError:
+                error = None
+            conn.close()
+            proc.join()
+            if error is None and proc.exitcode != 0:
+                error = f"compile worker exited with code {proc.exitcode}"
+            yield CompileResult(job, error, time.time() - start)
+
+
+def compile_many(jobs, max_workers=None):
+    """
+    Run :code:`jobs` concurrently (see :code:`iter_compile`) and return their
+    :code:`CompileResult` in the same order.
+    """
+    jobs = list(jobs)
+    results = {id(result.job): result for result in iter_compile(jobs, max_workers)}
+    return [results[id(job)] for job in jobs]
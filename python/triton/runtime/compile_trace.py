@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import atexit
+import collections
+import contextlib
+import json
+import os
+import re
+import resource
+import threading
+import time
+
+# -----------------------------------------------------------------------------
+# Compile trace
+# -----------------------------------------------------------------------------
+#
+# When enabled, `triton.compile` records one event per compilation stage
+# (ast -> ttir -> ttgir -> llir -> ptx -> cubin / amdgcn) with its wall time,
+# the peak RSS of the process, and the size and approximate number of
+# operations of the IR it produced, plus one event per MLIR pass run by the
+# TTIR and TTGIR pass managers. Events are collected process-wide, and can be
+# exported as a Chrome trace (chrome://tracing, Perfetto) or aggregated with
+# `summary`.
+#
+# Setting $TRITON_COMPILE_TRACE=<path> enables tracing at startup and writes
+# the Chrome trace to <path> when the process exits.
+
+_lock = threading.Lock()
+_enabled = False
+_events = []
+# per-thread stack of the (kernel, stage) being compiled, for pass events
+_local = threading.local()
+# all timestamps are relative to the import of this module
+_origin = time.perf_counter()
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def enabled():
+    return _enabled
+
+
+def reset():
+    with _lock:
+        del _events[:]
+
+
+def events():
+    """Return the events recorded so far, in Chrome trace format."""
+    with _lock:
+        return list(_events)
+
+
+def _add_event(event):
+    with _lock:
+        _events.append(event)
+
+
+def _peak_rss():
+    # kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+# regular expressions matching one operation of a textual IR
+_op_patterns = {
+    "ttir": re.compile(r"^\s*(%\S+ = )?\"?[a-z_]+\.[a-z_.]+", re.MULTILINE),
+    "ttgir": re.compile(r"^\s*(%\S+ = )?\"?[a-z_]+\.[a-z_.]+", re.MULTILINE),
+    "llir": re.compile(r"^\s+(%\S+ = )?[a-z]+\b", re.MULTILINE),
+    "ptx": re.compile(r"^\s*[@a-z].*;\s*$", re.MULTILINE),
+    "amdgcn": re.compile(r"^\s+[a-z_]+\d*_[a-z0-9_]+\b", re.MULTILINE),
+}
+
+
+def count_ops(ir, text):
+    """Approximate number of operations in :code:`text`, the textual form of an :code:`ir` module."""
+    if ir not in _op_patterns:
+        return None
+    return len(_op_patterns[ir].findall(text))
+
+
+class StageEvent:
+    """
+    A compilation stage being traced; :code:`set_output` attaches the size and
+    op count of the IR it produced.
+    """
+
+    def __init__(self, kernel, stage):
+        self.event = {"name": stage, "cat": "stage", "ph": "X", "pid": os.getpid(),
+                      "tid": threading.get_ident(), "args": {"kernel": kernel}}
+        self.stage = stage
+
+    def set_output(self, output, cached=False):
+        args = self.event["args"]
+        args["cached"] = cached
+        if isinstance(output, bytes):
+            args["size"] = len(output)
+        else:
+            text = str(output)
+            args["size"] = len(text)
+            args["ops"] = count_ops(self.stage, text)
+
+
+class _NullStageEvent:
+
+    def set_output(self, output, cached=False):
+        pass
+
+
+@contextlib.contextmanager
+def stage(kernel, name):
+    """Trace the compilation of stage :code:`name` of :code:`kernel` (a no-op when tracing is disabled)."""
+    if not _enabled:
+        yield _NullStageEvent()
+        return
+    event = StageEvent(kernel, name)
+    stack = _local.__dict__.setdefault("stack", [])
+    stack.append((kernel, name))
+    start = time.perf_counter()
+    try:
+        yield event
+    finally:
+        end = time.perf_counter()
+        stack.pop()
+        event.event["ts"] = (start - _origin) * 1e6
+        event.event["dur"] = (end - start) * 1e6
+        event.event["args"]["peak_rss_kb"] = _peak_rss()
+        _add_event(event.event)
+
+
+def run_passes(pm, mod):
+    """Run the pass manager :code:`pm` on :code:`mod`, timing each pass if tracing is enabled."""
+    if not _enabled:
+        pm.run(mod)
+        return
+    timings = pm.enable_timing()
+    start = time.perf_counter()
+    try:
+        pm.run(mod)
+    finally:
+        stack = getattr(_local, "stack", None)
+        kernel, stage = stack[-1] if stack else (None, None)
+        tid = threading.get_ident()
+        for name, offset, duration in timings.records():
+            _add_event({"name": name, "cat": "pass", "ph": "X", "pid": os.getpid(), "tid": tid,
+                        "ts": (start - _origin + offset) * 1e6, "dur": duration * 1e6,
+                        "args": {"kernel": kernel, "stage": stage}})
+
+
+def dump(path):
+    """Write the events recorded so far to :code:`path` as a Chrome trace."""
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events(), "displayTimeUnit": "ms"}, f)
+
+
+def summary():
+    """
+    Aggregate the events recorded so far.
+
+    :return: a dict mapping :code:`"stages"`, :code:`"passes"` and :code:`"kernels"`
+        to dicts of :code:`{"count", "total_s", "max_s"}`, keyed by stage, pass and
+        kernel name respectively. Kernel totals only include stage events.
+    """
+    groups = {"stages": collections.defaultdict(list), "passes": collections.defaultdict(list),
+              "kernels": collections.defaultdict(list)}
+    for event in events():
+        duration = event["dur"] * 1e-6
+        if event["cat"] == "stage":
+            groups["stages"][event["name"]].append(duration)
+            groups["kernels"][event["args"]["kernel"]].append(duration)
+        else:
+            groups["passes"][event["name"]].append(duration)
+    return {group: {name: {"count": len(durations), "total_s": sum(durations), "max_s": max(durations)}
+                    for name, durations in items.items()}
+            for group, items in groups.items()}
+
+
+if os.environ.get("TRITON_COMPILE_TRACE"):
+    enable()
+    atexit.register(dump, os.environ["TRITON_COMPILE_TRACE"])
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import itertools
+
+from ..compiler import OutOfResources
+from .compile_farm import compile_many
+
+# -----------------------------------------------------------------------------
+# Config spaces
+# -----------------------------------------------------------------------------
+#
+# A `ConfigSpace` declares the configs of an `Autotuner` as ranges of values
+# of meta-parameters (and of num_warps and num_stages), restricted by
+# constraints, instead of enumerating them:
+#
+#     ConfigSpace(BLOCK_M=[16, 32], BLOCK_N=[32, 64, 128], num_warps=[2, 4],
+#                 constraints=[lambda c: c['BLOCK_M'] <= c['BLOCK_N']])
+#
+# Whether a config fits on the device (in shared memory and registers) is
+# best known from the compiled kernel: `prune_by_resources` compiles the
+# configs, loads them, and drops those that exceed the limits of the device,
+# or spill registers. Autotuners apply it for each new key with
+# `prune_configs_by={'resources': True}` (or a dict of `ResourceLimits`
+# arguments).
+
+
+class ConfigSpace:
+    """
+    The configs combining every value of each meta-parameter in :code:`params`, and of
+    :code:`num_warps` and :code:`num_stages`, for which every constraint holds.
+
+    :param constraints: functions of a dict of the meta-parameters, :code:`num_warps` and
+        :code:`num_stages` of a config, returning whether to keep it
+    :param pre_hook: :code:`pre_hook` of the configs
+    """
+
+    def __init__(self, num_warps=(4,), num_stages=(2,), constraints=(), pre_hook=None, **params):
+        self.params = params
+        self.num_warps = list(num_warps)
+        self.num_stages = list(num_stages)
+        self.constraints = list(constraints)
+        self.pre_hook = pre_hook
+
+    def configs(self):
+        from .autotuner import Config
+        names = list(self.params)
+        configs = []
+        for values in itertools.product(*self.params.values(), self.num_stages, self.num_warps):
+            kwargs = dict(zip(names, values))
+            num_stages, num_warps = values[len(names):]
+            point = dict(kwargs, num_warps=num_warps, num_stages=num_stages)
+            if all(constraint(point) for constraint in self.constraints):
+                configs.append(Config(kwargs, num_warps=num_warps, num_stages=num_stages, pre_hook=self.pre_hook))
+        return configs
+
+    def __iter__(self):
+        return iter(self.configs())
+
+    def __len__(self):
+        return len(self.configs())
+
+
+class ResourceLimits:
+    """
+    Limits on the resources used by the compiled kernel of a config.
+
+    :param max_registers: registers available to a CTA (default: 64K, as on every NVIDIA GPU since sm_50)
+    :param max_spills: number of spilled registers allowed per thread
+    """
+
+    def __init__(self, max_registers=65536, max_spills=0):
+        self.max_registers = max_registers
+        self.max_spills = max_spills
+
+    def check(self, kernel):
+        """Return why :code:`kernel` exceeds the limits, or :code:`None`."""
+        # loading checks the shared memory of the device
+        try:
+            kernel._init_handles()
+        except OutOfResources as e:
+            return str(e)
+        if kernel.n_regs is None:
+            return None
+        registers = kernel.n_regs * kernel.num_warps * 32
+        if registers > self.max_registers:
+            return f"out of resources: registers, required: {registers}, hardware limit: {self.max_registers}"
+        if kernel.n_spills > self.max_spills:
+            return f"out of resources: spilled registers, required: {kernel.n_spills}, limit: {self.max_spills}"
+        return None
+
+
+def prune_by_resources(fn, configs, args, kwargs, limits=None, max_workers=0):
+    """
+    Compile :code:`fn` for each config, load the kernels, and drop the configs that fail
+    to compile or exceed :code:`limits`. Kernels are compiled in this process, which
+    uses CUDA, unless :code:`max_workers` compile workers are forked
+    (see :code:`triton.runtime.compile_farm`).
+
+    :return: the remaining configs, and the reason each other config was dropped
+    """
+    limits = ResourceLimits() if limits is None else limits
+    jobs = [fn.compile_job(*args, num_warps=config.num_warps, num_stages=config.num_stages, **kwargs, **config.kwargs)
+            for config in configs]
+    kept, dropped = [], dict()
+    for config, result in zip(configs, compile_many(jobs, max_workers)):
+        if not result.ok:
+            dropped[config] = result.error
+            continue
+        kernel = fn.warmup(*args, num_warps=config.num_warps, num_stages=config.num_stages, **kwargs, **config.kwargs)
+        reason = limits.check(kernel)
+        if reason is None:
+            kept.append(config)
+        else:
+            dropped[config] = reason
+    return kept, dropped
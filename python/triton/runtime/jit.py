@@ -5,6 +5,7 @@ import functools
 import hashlib
 import inspect
 import os
+import shutil
 import subprocess
 import textwrap
 from collections import defaultdict, namedtuple
@@ -13,6 +14,7 @@ from typing import Callable, Generic, Iterable, Optional, TypeVar, Union, cast,
 import torch
 
 import triton
+from .probes import probe
 from triton.utils import MockTensor
 
 try:
@@ -20,6 +22,16 @@ try:
 except ImportError:
     get_cuda_stream = lambda dev_idx: torch.cuda.current_stream(dev_idx).cuda_stream
 
+try:
+    from torch._C import _cuda_getDevice as get_current_device
+except ImportError:
+    get_current_device = torch.cuda.current_device
+
+try:
+    from torch._C import _cuda_setDevice as set_current_device
+except ImportError:
+    set_current_device = torch.cuda.set_device
+
 
 T = TypeVar('T')
 
@@ -73,6 +85,14 @@ class DependenciesFinder(ast.NodeVisitor):
 # -----------------------------------------------------------------------------
 
 
+@probe(depends_on=lambda: [shutil.which("ptxas")])
+def ptxas_version():
+    try:
+        return hashlib.md5(subprocess.check_output(["ptxas", "--version"])).hexdigest()
+    except Exception:
+        return ''
+
+
 @functools.lru_cache()
 def version_key():
     import pkgutil
@@ -90,12 +110,7 @@ def version_key():
     for lib in pkgutil.iter_modules([language_path]):
         with open(lib.module_finder.find_spec(lib.name).origin, "rb") as f:
             contents += [hashlib.md5(f.read()).hexdigest()]
-    # ptxas version
-    try:
-        ptxas_version = hashlib.md5(subprocess.check_output(["ptxas", "--version"])).hexdigest()
-    except Exception:
-        ptxas_version = ''
-    return '-'.join(triton.__version__) + '-' + ptxas_version + '-' + '-'.join(contents)
+    return '-'.join(triton.__version__) + '-' + ptxas_version() + '-' + '-'.join(contents)
 
 
 class KernelInterface(Generic[T]):
@@ -114,6 +129,8 @@ class JITFunction(KernelInterface[T]):
 
     # Hook for inspecting compiled functions and modules
     cache_hook = None
+    # Manifest of compiled specializations (see triton.runtime.manifest)
+    manifest = None
     divisibility = 16
 
     @staticmethod
@@ -198,6 +215,20 @@ class JITFunction(KernelInterface[T]):
         constants = {i: k for i, k in zip(self.constexprs, constexpr_key)}
         return constants
 
+    def _compile_kwargs(self, all_args, constexpr_key, num_warps, num_stages, extern_libs):
+        # build dict of constant values
+        configs = self._get_config(*all_args),
+        constants = self._make_constants(constexpr_key)
+        constants.update({i: None for i, arg in enumerate(all_args) if arg is None})
+        constants.update({i: 1 for i in configs[0].equal_to_1})
+        for i, arg in constants.items():
+            if callable(arg):
+                raise TypeError(f"Callable constexpr at index {i} is not supported")
+        # build kernel signature -- doesn't include specialized arguments
+        signature = {i: self._type_of(self._key_of(arg)) for i, arg in enumerate(all_args) if i not in self.constexprs}
+        return dict(signature=signature, constants=constants, configs=configs,
+                    num_warps=num_warps, num_stages=num_stages, extern_libs=extern_libs)
+
     def _call_hook(self, key, signature, device, constants, num_warps, num_stages, extern_libs, configs):
         if JITFunction.cache_hook is None:
             return False
@@ -243,51 +274,46 @@ def {self.fn.__name__}({', '.join(self.arg_names)}, grid, num_warps=4, num_stage
     sig_key =  {sig_keys},
     constexpr_key = {f'{constexpr_keys},' if len(constexpr_keys) > 0 else tuple()}
     spec_key = {f'{spec_keys},' if len(spec_keys) > 0 else tuple()}
-    key = (version_key, sig_key, constexpr_key, spec_key)
-    if not extern_libs is None:
+    key = (sig_key, constexpr_key, spec_key, num_warps, num_stages)
+    if extern_libs is not None:
       key = (key, tuple(extern_libs.items()))
-    assert num_warps > 0 and (num_warps & (num_warps - 1)) == 0, "num_warps must be a power of 2"
     if callable(grid):
         grid = grid({{{grid_args}}})
     grid_size = len(grid)
     grid_0 = grid[0]
     grid_1 = grid[1] if grid_size > 1 else 1
     grid_2 = grid[2] if grid_size > 2 else 1
-    device = torch.cuda.current_device()
-    torch.cuda.set_device(device)
+    device = get_current_device()
+    # initializes CUDA and makes the device's context current on this thread
+    set_current_device(device)
     if stream is None and not warmup:
       stream = get_cuda_stream(device)
-    try:
-      bin = cache[device][key]
+    bin = cache[device].get(key)
+    if bin is not None:
       if not warmup:
-          bin.c_wrapper(grid_0, grid_1, grid_2, bin.num_warps, bin.shared, stream, bin.cu_function, triton.compiler.CompiledKernel.launch_enter_hook, triton.compiler.CompiledKernel.launch_exit_hook, bin, {args})
+          bin.c_wrapper(grid_0, grid_1, grid_2, bin.num_warps, bin.shared, stream, bin.cu_function, CompiledKernel.launch_enter_hook, CompiledKernel.launch_exit_hook, bin, {args})
       return bin
     # kernel not cached -- compile
-    except KeyError:
-      # build dict of constant values
-      args = [{args}]
-      all_args = {', '.join([f'{arg}' for arg in self.arg_names])},
-      configs = self._get_config(*all_args),
-      constants = self._make_constants(constexpr_key)
-      constants.update({{i: None for i, arg in enumerate(all_args) if arg is None}})
-      constants.update({{i: 1 for i in configs[0].equal_to_1}})
-      # build kernel signature -- doesn't include specialized arguments
-      signature = {{ i: self._type_of(_key_of(arg)) for i, arg in enumerate(all_args) if i not in self.constexprs }}
-      # build stub signature -- includes arguments that are specialized
-      for i, arg in constants.items():
-        if callable(arg):
-          raise TypeError(f"Callable constexpr at index {{i}} is not supported")
-      if not self._call_hook(key, signature, device, constants, num_warps, num_stages, extern_libs, configs):
-        bin = triton.compile(self, signature=signature, device=device, constants=constants, num_warps=num_warps, num_stages=num_stages, extern_libs=extern_libs, configs=configs)
-        if not warmup:
-            bin.c_wrapper(grid_0, grid_1, grid_2, bin.num_warps, bin.shared, stream, bin.cu_function, triton.compiler.CompiledKernel.launch_enter_hook, triton.compiler.CompiledKernel.launch_exit_hook, bin, *args)
-        self.cache[device][key] = bin
-        return bin
-      return None
+    assert num_warps > 0 and (num_warps & (num_warps - 1)) == 0, "num_warps must be a power of 2"
+    args = [{args}]
+    all_args = {', '.join([f'{arg}' for arg in self.arg_names])},
+    compile_kwargs = self._compile_kwargs(all_args, constexpr_key, num_warps, num_stages, extern_libs)
+    if not self._call_hook(key, compile_kwargs["signature"], device, compile_kwargs["constants"], num_warps, num_stages, extern_libs, compile_kwargs["configs"]):
+      bin = triton.compile(self, device=device, **compile_kwargs)
+      if not warmup:
+          bin.c_wrapper(grid_0, grid_1, grid_2, bin.num_warps, bin.shared, stream, bin.cu_function, CompiledKernel.launch_enter_hook, CompiledKernel.launch_exit_hook, bin, *args)
+      self.cache[device][key] = bin
+      if self.manifest is not None:
+        self.manifest.record(self, key, **compile_kwargs)
+      return bin
+    return None
 """
-        scope = {"version_key": version_key(), "get_cuda_stream": get_cuda_stream,
+        scope = {"get_cuda_stream": get_cuda_stream,
+                 "get_current_device": get_current_device,
+                 "set_current_device": set_current_device,
                  "self": self, "_spec_of": self._spec_of, "_key_of": self._key_of,
-                 "cache": self.cache, "triton": triton, "torch": torch}
+                 "cache": self.cache, "triton": triton, "torch": torch,
+                 "CompiledKernel": triton.compiler.CompiledKernel}
         exec(src, scope)
         return scope[self.fn.__name__]
 
@@ -337,6 +363,21 @@ def {self.fn.__name__}({', '.join(self.arg_names)}, grid, num_warps=4, num_stage
     def warmup(self, *args, **kwargs):
         return self.run(*map(MockTensor.wrap_dtype, args), **kwargs, warmup=True)
 
+    def compile_job(self, *args, num_warps=4, num_stages=3, extern_libs=None, cc=None, **kwargs):
+        """
+        Return the :code:`CompileJob` that :code:`warmup(*args, **kwargs)` would run,
+        without compiling anything. See :code:`triton.runtime.compile_farm`.
+        """
+        for name in ["grid", "stream", "warmup"]:
+            kwargs.pop(name, None)
+        bound = inspect.signature(self.fn).bind(*map(MockTensor.wrap_dtype, args),
+                                                **{k: MockTensor.wrap_dtype(v) for k, v in kwargs.items()})
+        bound.apply_defaults()
+        all_args = tuple(bound.arguments[name] for name in self.arg_names)
+        constexpr_key = tuple(arg for i, arg in enumerate(all_args) if i in self.constexprs)
+        kwargs = self._compile_kwargs(all_args, constexpr_key, num_warps, num_stages, extern_libs)
+        return triton.runtime.compile_farm.CompileJob(self, cc=cc, **kwargs)
+
     # we do not parse `src` in the constructor because
     # the user might want to monkey-patch self.src dynamically.
     # Our unit tests do this, for example.
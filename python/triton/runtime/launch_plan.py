@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import contextlib
+import functools
+
+import triton
+
+# -----------------------------------------------------------------------------
+# Launch plans
+# -----------------------------------------------------------------------------
+#
+# A launch plan is a sequence of `CompiledKernel` launches recorded with their
+# packed arguments (grid, launch parameters, and buffer addresses instead of
+# tensors), which can be replayed without going through the `JITFunction`
+# launchers again. On CUDA, a plan is replayed with a single call into the
+# driver utilities (`launch_many`).
+#
+# While capturing, the `c_wrapper` of every live `CompiledKernel` (and of every
+# kernel that publishes its `c_wrapper` during the capture) is replaced by a
+# recording wrapper; launches still execute as usual.
+
+
+def _address(buffer):
+    return buffer.data_ptr() if hasattr(buffer, "data_ptr") else int(buffer)
+
+
+class LaunchPlan:
+    """
+    A recorded sequence of kernel launches; see :code:`capture`.
+    """
+
+    def __init__(self):
+        # (launch function, arguments, index of the stream argument)
+        self.launches = []
+        # (launch index, argument index) of the buffer addresses
+        self.pointers = []
+        # buffers whose address is used by the plan, kept alive by it
+        self.buffers = dict()
+        # kernels attached to while capturing, with their original c_wrapper
+        self.patched = dict()
+        self._packed = None
+
+    def __len__(self):
+        return len(self.launches)
+
+    def attach(self, kernel):
+        if kernel in self.patched:
+            return
+        c_wrapper = kernel.c_wrapper
+
+        def recording_c_wrapper(*args):
+            self.record(c_wrapper, args)
+            c_wrapper(*args)
+        self.patched[kernel] = c_wrapper
+        kernel.c_wrapper = recording_c_wrapper
+
+    def detach(self):
+        for kernel, c_wrapper in self.patched.items():
+            kernel.c_wrapper = c_wrapper
+        self.patched.clear()
+
+    def record(self, c_wrapper, args):
+        """Append the launch :code:`c_wrapper(*args)` to the plan."""
+        func, prefix = c_wrapper, ()
+        # the generic launcher is bound to the argument types of the kernel
+        if isinstance(c_wrapper, functools.partial):
+            func, prefix = c_wrapper.func, c_wrapper.args
+        args = list(prefix + tuple(args))
+        index = len(self.launches)
+        for i, arg in enumerate(args):
+            if hasattr(arg, "data_ptr"):
+                args[i] = arg.data_ptr()
+                self.buffers[args[i]] = arg
+                self.pointers.append((index, i))
+        # launchers take (grid_0, grid_1, grid_2, num_warps, shared, stream, ...)
+        self.launches.append((func, args, len(prefix) + 5))
+        self._packed = None
+
+    def rebind(self, buffers):
+        """
+        Point the launches of the plan to other buffers.
+
+        :param buffers: dict mapping the buffers (tensors or addresses) used when
+            capturing, or by a previous :code:`rebind`, to the ones to use instead.
+            Addresses are matched exactly, so views at an offset of a buffer are
+            not rebound with it.
+        """
+        new_buffers = {_address(old): new for old, new in buffers.items()}
+        for index, i in self.pointers:
+            args = self.launches[index][1]
+            if args[i] in new_buffers:
+                new = new_buffers[args[i]]
+                args[i] = _address(new)
+                self.buffers[args[i]] = new
+        used = {self.launches[index][1][i] for index, i in self.pointers}
+        self.buffers = {address: buffer for address, buffer in self.buffers.items() if address in used}
+        self._packed = None
+
+    def set_stream(self, stream):
+        for _, args, i in self.launches:
+            args[i] = stream
+        self._packed = None
+
+    def _pack(self):
+        launches = tuple((func, tuple(args)) for func, args, _ in self.launches)
+        launch_many = None
+        cuda_utils = triton.compiler.cuda_utils
+        if cuda_utils is not None and all(func is cuda_utils.launch for func, _ in launches):
+            launch_many = cuda_utils.launch_many
+            launches = tuple(args for _, args in launches)
+        self._packed = (launch_many, launches)
+
+    def replay(self, stream=None):
+        """Launch the kernels of the plan again, on :code:`stream` if given."""
+        if stream is not None:
+            self.set_stream(stream)
+        if self._packed is None:
+            self._pack()
+        launch_many, launches = self._packed
+        if launch_many is not None:
+            launch_many(launches)
+            return
+        for func, args in launches:
+            func(*args)
+
+
+@contextlib.contextmanager
+def capture():
+    """
+    Record the kernel launches of the enclosed block, in every thread, into a
+    :code:`LaunchPlan`::
+
+        with triton.runtime.launch_plan.capture() as plan:
+            step(inputs)
+        for _ in range(n):
+            plan.replay()
+    """
+    CompiledKernel = triton.compiler.CompiledKernel
+    if CompiledKernel.launch_recorder is not None:
+        raise RuntimeError("a launch plan is already being captured")
+    plan = LaunchPlan()
+    CompiledKernel.launch_recorder = plan
+    try:
+        for kernel in list(CompiledKernel.instances):
+            # other kernels attach when their `c_wrapper` is first published
+            if "c_wrapper" in kernel.__dict__:
+                plan.attach(kernel)
+        yield plan
+    finally:
+        CompiledKernel.launch_recorder = None
+        plan.detach()
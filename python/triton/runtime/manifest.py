@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import importlib
+import json
+import os
+import threading
+
+import torch
+
+import triton
+from .jit import JITFunction, version_key
+
+# -----------------------------------------------------------------------------
+# Kernel manifest
+# -----------------------------------------------------------------------------
+#
+# A manifest is a JSON-lines file with one entry per specialization compiled
+# by a `JITFunction` launcher, i.e. (kernel, signature, constants,
+# specialization, num_warps, num_stages). Replaying it with `warm_load` at
+# process startup populates `JITFunction.cache` from the on-disk kernel cache
+# before the first launch, so that no launch pays for hashing, metadata loads
+# or launcher imports.
+
+
+def _encode(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, tuple):
+        return {"tuple": [_encode(v) for v in value]}
+    if isinstance(value, torch.dtype):
+        return {"torch.dtype": str(value).split('.')[-1]}
+    if type(value) is triton.language.dtype:
+        return {"tl.dtype": value.name}
+    raise TypeError(f"cannot record value {value!r} of type {type(value)} in a kernel manifest")
+
+
+def _decode(value):
+    if not isinstance(value, dict):
+        return value
+    if "tuple" in value:
+        return tuple(_decode(v) for v in value["tuple"])
+    if "torch.dtype" in value:
+        return getattr(torch, value["torch.dtype"])
+    if "tl.dtype" in value:
+        return triton.language.dtype(value["tl.dtype"])
+    raise ValueError(f"invalid kernel manifest value {value}")
+
+
+def _kernel_name(fn):
+    return f"{fn.fn.__module__}:{fn.fn.__qualname__}"
+
+
+def _resolve_kernel(name):
+    module, qualname = name.split(":")
+    obj = importlib.import_module(module)
+    for attr in qualname.split("."):
+        obj = getattr(obj, attr)
+    # kernels are often wrapped by `triton.autotune` / `triton.heuristics`
+    while not isinstance(obj, JITFunction):
+        obj = obj.fn
+    return obj
+
+
+class Manifest:
+    """
+    Records every specialization compiled by `JITFunction` launchers into
+    the JSON-lines file at :code:`path`. Entries are appended as they are
+    compiled, so that several processes can share one manifest.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.seen = set()
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as f:
+                self.seen.update(line.strip() for line in f)
+
+    def record(self, fn, key, signature, constants, configs, num_warps, num_stages, extern_libs):
+        try:
+            entry = {
+                "kernel": _kernel_name(fn),
+                "version_key": version_key(),
+                "cache_key": fn.cache_key,
+                "key": _encode(key),
+                "signature": signature,
+                "constants": {i: _encode(v) for i, v in constants.items()},
+                "configs": [{"divisible_by_16": list(c.divisible_by_16),
+                             "equal_to_1": list(c.equal_to_1)} for c in configs],
+                "num_warps": num_warps,
+                "num_stages": num_stages,
+                "extern_libs": extern_libs,
+            }
+        except TypeError:
+            # specializations on values that cannot be serialized
+            # are simply not recorded
+            return
+        line = json.dumps(entry, sort_keys=True)
+        with self.lock:
+            if line in self.seen:
+                return
+            self.seen.add(line)
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+
+
+def record(path=None):
+    """
+    Start recording compiled specializations into the manifest at :code:`path`
+    (default: :code:`$TRITON_KERNEL_MANIFEST`).
+    """
+    path = path or os.environ["TRITON_KERNEL_MANIFEST"]
+    JITFunction.manifest = Manifest(path)
+    return JITFunction.manifest
+
+
+def warm_load(path=None, device=None, compile_missing=False):
+    """
+    Replay the manifest at :code:`path` (default: :code:`$TRITON_KERNEL_MANIFEST`)
+    and load every matching binary into the in-memory cache of its `JITFunction`.
+
+    Entries recorded by a different Triton build, or for a kernel whose source
+    has changed since, are skipped.
+
+    :param device: device to load the kernels on (default: current device)
+    :param compile_missing: compile the entries that are not in the kernel cache
+        instead of skipping them
+    :return: a dict with the number of :code:`loaded`, :code:`skipped` and :code:`failed` entries
+    """
+    from ..compiler import CacheManager, instance_descriptor, make_hash
+    path = path or os.environ["TRITON_KERNEL_MANIFEST"]
+    if device is None:
+        device = torch.cuda.current_device()
+    stats = {"loaded": 0, "skipped": 0, "failed": 0}
+    with open(path) as f:
+        entries = [json.loads(line) for line in set(f) if line.strip()]
+    for entry in entries:
+        try:
+            fn = _resolve_kernel(entry["kernel"])
+        except (ImportError, AttributeError):
+            stats["failed"] += 1
+            continue
+        key = _decode(entry["key"])
+        if entry["version_key"] != version_key() or entry["cache_key"] != fn.cache_key or key in fn.cache[device]:
+            stats["skipped"] += 1
+            continue
+        kwargs = dict(
+            signature={int(i): ty for i, ty in entry["signature"].items()},
+            device=device,
+            constants={int(i): _decode(v) for i, v in entry["constants"].items()},
+            configs=[instance_descriptor(tuple(c["divisible_by_16"]), tuple(c["equal_to_1"]))
+                     for c in entry["configs"]],
+            num_warps=entry["num_warps"],
+            num_stages=entry["num_stages"],
+            extern_libs=entry["extern_libs"],
+        )
+        if not compile_missing and not CacheManager(make_hash(fn, **kwargs)).has_file(f"{fn.__name__}.json"):
+            stats["skipped"] += 1
+            continue
+        try:
+            bin = triton.compile(fn, **kwargs)
+            # also load the binary into the driver ahead of the first launch
+            with torch.cuda.device(device):
+                bin._init_handles()
+        except Exception:
+            stats["failed"] += 1
+            continue
+        fn.cache[device][key] = bin
+        stats["loaded"] += 1
+    return stats
+
+
+if os.environ.get("TRITON_KERNEL_MANIFEST"):
+    record()
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import json
+import os
+import socket
+import threading
+
+from filelock import FileLock
+
+# -----------------------------------------------------------------------------
+# Toolchain and device probes
+# -----------------------------------------------------------------------------
+#
+# A probe is an expensive query of the host environment -- typically running
+# a tool such as `ptxas --version` or `rocminfo` in a subprocess. Probes are
+# only evaluated the first time their value is needed, and their results are
+# memoized on disk, per host, along with the mtimes of the files they depend
+# on (e.g. the tool binary): a memoized result is reused by later processes
+# until one of these files changes. Probes of things that may change without
+# any file changing -- e.g. which GPU the process sees -- are not persisted:
+# they are evaluated once per process.
+#
+# Values must be JSON-serializable.
+
+
+def memo_path():
+    return os.path.join(os.environ["HOME"], ".triton", "probes", f"{socket.gethostname()}.json")
+
+
+class Probe:
+    """
+    A lazily evaluated, memoized query of the host environment.
+
+    :param fn: function computing the value of the probe
+    :param depends_on: function returning the paths whose mtimes invalidate
+        the memoized value; it must be cheap (no subprocesses)
+    :param persist: whether to memoize the value on disk, for other processes
+    """
+
+    def __init__(self, name, fn, depends_on=None, persist=True):
+        self.name = name
+        self.fn = fn
+        self.depends_on = depends_on
+        self.persist = persist
+        self.lock = threading.Lock()
+        self.evaluated = False
+        self.value = None
+
+    def stamp(self):
+        paths = self.depends_on() if self.depends_on is not None else []
+        stamp = []
+        for path in paths:
+            try:
+                stamp.append([path, os.path.getmtime(path)])
+            except (OSError, TypeError):
+                stamp.append([path, None])
+        return stamp
+
+    def __call__(self):
+        if self.evaluated:
+            return self.value
+        with self.lock:
+            if not self.evaluated:
+                self.value = self._evaluate()
+                self.evaluated = True
+        return self.value
+
+    def _evaluate(self):
+        if not self.persist:
+            return self.fn()
+        stamp = self.stamp()
+        memo = _load_memo()
+        entry = memo.get(self.name)
+        if entry is not None and entry["stamp"] == stamp:
+            return entry["value"]
+        value = self.fn()
+        _store_memo(self.name, {"stamp": stamp, "value": value})
+        return value
+
+    def invalidate(self):
+        with self.lock:
+            self.evaluated = False
+            self.value = None
+
+
+_probes = dict()
+
+
+def probe(name=None, depends_on=None, persist=True):
+    """
+    Decorator registering a function without arguments as a :code:`Probe`.
+    """
+    def decorator(fn):
+        _probes[name or fn.__name__] = Probe(name or fn.__name__, fn, depends_on, persist)
+        return _probes[name or fn.__name__]
+    return decorator
+
+
+def get_probe(name):
+    return _probes[name]
+
+
+def clear(memo=True):
+    """Forget the value of every probe, in this process and, if :code:`memo`, on disk."""
+    for p in _probes.values():
+        p.invalidate()
+    if memo:
+        try:
+            os.remove(memo_path())
+        except FileNotFoundError:
+            pass
+
+
+def _load_memo():
+    try:
+        with open(memo_path()) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return dict()
+
+
+def _store_memo(name, entry):
+    path = memo_path()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with FileLock(path + ".lock"):
+            memo = _load_memo()
+            memo[name] = entry
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(memo, f)
+            os.replace(tmp_path, path)
+    except OSError:
+        # e.g. read-only home directory: the probe is simply not memoized
+        pass
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import math
+import statistics
+
+from ..testing import _quantile
+
+# -----------------------------------------------------------------------------
+# Autotuning search strategies
+# -----------------------------------------------------------------------------
+#
+# A search strategy decides how much benchmarking time each config of an
+# `Autotuner` gets. It is called with the (pruned) configs and a
+# `measure(config, rep)` function, which benchmarks a config for about `rep`
+# milliseconds and returns the runtime of each run, in milliseconds (`[inf]`
+# if the config can't run). It returns the runtimes measured for every
+# config; the autotuner selects the config with the smallest median.
+#
+# `Exhaustive` measures every config for the full `do_bench` time. The other
+# strategies first measure every config briefly, then only keep measuring the
+# configs that may still be the fastest one, which is much cheaper for large
+# config spaces where most configs are clearly slower than the best one.
+#
+# `configs` may be an iterator yielding configs as they finish compiling:
+# `Exhaustive` measures each of them as soon as it is available.
+
+
+def timing(samples):
+    """Summarize runtimes like :code:`do_bench`: (median, 20-th percentile, 80-th percentile)."""
+    return tuple(_quantile(sorted(samples), q) for q in (0.5, 0.2, 0.8))
+
+
+def _median(samples):
+    return _quantile(sorted(samples), 0.5)
+
+
+def _failed(samples):
+    return any(math.isinf(sample) for sample in samples)
+
+
+class Exhaustive:
+    """Measure every config for :code:`rep` ms."""
+
+    def __init__(self, rep=100):
+        self.rep = rep
+
+    def __call__(self, configs, measure):
+        return {config: measure(config, self.rep) for config in configs}
+
+    def __repr__(self):
+        return f"Exhaustive(rep={self.rep})"
+
+
+class SuccessiveHalving:
+    """
+    Measure every config for :code:`rep` ms, then repeatedly keep the fastest
+    :code:`1 / eta` of the configs and measure them :code:`eta` times longer,
+    until one config is left.
+    """
+
+    def __init__(self, rep=1, eta=3):
+        assert eta > 1
+        self.rep = rep
+        self.eta = eta
+
+    def __call__(self, configs, measure):
+        samples = {config: [] for config in configs}
+        alive = list(samples)
+        rep = self.rep
+        while True:
+            for config in alive:
+                samples[config] += measure(config, rep)
+            alive = [config for config in alive if not _failed(samples[config])]
+            if len(alive) <= 1:
+                return samples
+            alive = sorted(alive, key=lambda config: _median(samples[config]))
+            alive = alive[:math.ceil(len(alive) / self.eta)]
+            rep *= self.eta
+
+    def __repr__(self):
+        return f"SuccessiveHalving(rep={self.rep}, eta={self.eta})"
+
+
+class Racing:
+    """
+    Measure all remaining configs for :code:`rep` ms per round, and stop measuring
+    a config as soon as the :code:`confidence` interval of its mean runtime lies
+    entirely above that of another config. Stops after :code:`max_rounds` rounds
+    even if several configs are left.
+    """
+
+    def __init__(self, rep=5, confidence=0.95, max_rounds=20):
+        self.rep = rep
+        self.confidence = confidence
+        self.max_rounds = max_rounds
+
+    def _interval(self, samples):
+        if len(samples) < 2:
+            return -math.inf, math.inf
+        mean = statistics.mean(samples)
+        z = statistics.NormalDist().inv_cdf(0.5 + self.confidence / 2)
+        half_width = z * statistics.stdev(samples) / math.sqrt(len(samples))
+        return mean - half_width, mean + half_width
+
+    def __call__(self, configs, measure):
+        samples = {config: [] for config in configs}
+        alive = list(samples)
+        for _ in range(self.max_rounds):
+            for config in alive:
+                samples[config] += measure(config, self.rep)
+            alive = [config for config in alive if not _failed(samples[config])]
+            if len(alive) <= 1:
+                break
+            intervals = {config: self._interval(samples[config]) for config in alive}
+            best_upper = min(upper for _, upper in intervals.values())
+            alive = [config for config in alive if intervals[config][0] <= best_upper]
+            if len(alive) <= 1:
+                break
+        return samples
+
+    def __repr__(self):
+        return f"Racing(rep={self.rep}, confidence={self.confidence}, max_rounds={self.max_rounds})"
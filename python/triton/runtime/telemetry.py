@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import collections
+import contextlib
+import json
+import math
+import os
+import threading
+import time
+import weakref
+
+# -----------------------------------------------------------------------------
+# Autotuning telemetry
+# -----------------------------------------------------------------------------
+#
+# Every `Autotuner` keeps `TuningStats`: counters summing up its tuning
+# events, and the last few events themselves. A tuning event is emitted each
+# time a key is tuned, and records which key triggered it, how long tuning
+# took (waiting for compilation vs. benchmarking), how many configs were
+# pruned, failed to compile or ran out of resources, the winning config, and
+# by how much it beat the runner-up. Keys served by persistent tuning tables
+# (see `tuning_cache`) are only counted.
+#
+# `summary()` reports the counters of all live autotuners. Events can also be
+# appended, as JSON lines, to a log: enabled by `log(path)` or with
+# $TRITON_AUTOTUNE_LOG=path.
+
+sink = None
+
+# stats of every live autotuner
+_all_stats = weakref.WeakSet()
+
+
+def _json_value(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+class TuningStats:
+    """
+    Counters of the tuning events of one :code:`Autotuner`.
+
+    :ivar tunes: number of keys tuned
+    :ivar table_hits: number of keys loaded from persistent tuning tables
+    :ivar tune_s: time spent tuning, in s, including pruning
+    :ivar compile_wait_s: time spent waiting for configs to compile
+    :ivar bench_s: time spent benchmarking configs
+    :ivar pruned: number of configs pruned before benchmarking
+    :ivar failed: number of configs that failed to compile
+    :ivar out_of_resources: number of configs that didn't fit on the device
+    :ivar winner_changes: number of tunings whose winner differs from the previous one of the same key
+    :ivar events: the last :code:`max_events` tuning events
+    """
+
+    def __init__(self, kernel, max_events=100):
+        self.kernel = kernel
+        self.tunes = 0
+        self.table_hits = 0
+        self.tune_s = 0.0
+        self.compile_wait_s = 0.0
+        self.bench_s = 0.0
+        self.pruned = 0
+        self.failed = 0
+        self.out_of_resources = 0
+        self.winner_changes = 0
+        self.events = collections.deque(maxlen=max_events)
+        # the last winner of each key tuned
+        self.winners = dict()
+        self.lock = threading.Lock()
+        _all_stats.add(self)
+
+    def record_tune(self, key, n_configs, n_pruned, tune_s, report, timings, dropped=None):
+        """
+        Record the tuning of :code:`key`.
+
+        :param n_pruned: number of configs pruned before benchmarking, other than :code:`dropped`
+        :param report: the :code:`tuning_report` of the tuning
+        :param timings: (median, 20-th percentile, 80-th percentile) runtime of each benchmarked config
+        :param dropped: why configs were dropped by pruning by resources, by config
+            (see :code:`Autotuner.resource_report`)
+        """
+        errors = [entry["error"] for entry in report["configs"].values() if entry["error"] is not None]
+        errors += list((dropped or dict()).values())
+        # configs that compiled, but whose kernel doesn't fit on the device
+        n_oor = sum(error.startswith("out of resource") for error in errors)
+        ranked = sorted(timings, key=timings.get)
+        best = ranked[0]
+        best_ms = timings[best][0]
+        runner_up_ms = timings[ranked[1]][0] if len(ranked) > 1 else None
+        margin = None
+        if runner_up_ms is not None and math.isfinite(runner_up_ms) and best_ms > 0:
+            margin = runner_up_ms / best_ms - 1
+        previous = self.winners.get(key)
+        event = {
+            "time": time.time(),
+            "kernel": self.kernel,
+            "key": [_json_value(value) for value in key],
+            "tune_s": tune_s,
+            "compile_wait_s": report["compile_wait_s"],
+            "bench_s": report["bench_s"],
+            "configs": n_configs,
+            "pruned": n_pruned,
+            "failed": len(errors) - n_oor,
+            "out_of_resources": n_oor,
+            "best": str(best),
+            "best_ms": best_ms,
+            "runner_up_ms": runner_up_ms,
+            "margin": margin,
+            "changed": previous is not None and previous != str(best),
+        }
+        with self.lock:
+            self.tunes += 1
+            self.tune_s += tune_s
+            self.compile_wait_s += event["compile_wait_s"]
+            self.bench_s += event["bench_s"]
+            self.pruned += n_pruned
+            self.failed += event["failed"]
+            self.out_of_resources += event["out_of_resources"]
+            self.winner_changes += event["changed"]
+            self.winners[key] = str(best)
+            self.events.append(event)
+        if sink is not None:
+            sink.write(event)
+        return event
+
+    def record_table_hit(self):
+        with self.lock:
+            self.table_hits += 1
+
+    def summary(self):
+        margins = [event["margin"] for event in self.events if event["margin"] is not None]
+        return {
+            "kernel": self.kernel,
+            "tunes": self.tunes,
+            "table_hits": self.table_hits,
+            "tune_s": self.tune_s,
+            "compile_wait_s": self.compile_wait_s,
+            "bench_s": self.bench_s,
+            "pruned": self.pruned,
+            "failed": self.failed,
+            "out_of_resources": self.out_of_resources,
+            "winner_changes": self.winner_changes,
+            "mean_margin": sum(margins) / len(margins) if margins else None,
+        }
+
+
+def summary():
+    """Return the :code:`TuningStats.summary()` of every live autotuner that tuned at least one key."""
+    return [stats.summary() for stats in list(_all_stats) if stats.tunes or stats.table_hits]
+
+
+class Sink:
+    """
+    Appends tuning events to the JSON-lines log at :code:`path`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def write(self, event):
+        with self.lock:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(event) + "\n")
+
+
+def start(path):
+    global sink
+    sink = Sink(path)
+
+
+def stop():
+    global sink
+    sink = None
+
+
+@contextlib.contextmanager
+def log(path):
+    """Append the tuning events emitted within this context to the JSON-lines log at :code:`path`."""
+    start(path)
+    try:
+        yield
+    finally:
+        stop()
+
+
+if os.environ.get("TRITON_AUTOTUNE_LOG"):
+    start(os.environ["TRITON_AUTOTUNE_LOG"])
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+
+import torch
+
+from .cache import CacheManager, list_entries
+from .jit import JITFunction, version_key
+
+# -----------------------------------------------------------------------------
+# Persistent autotuning results
+# -----------------------------------------------------------------------------
+#
+# The configs selected by an `Autotuner` are stored in a `TuningTable`, one
+# per (kernel, device, list of configs), in the kernel cache (and therefore
+# also in its remote backend, if any). A table maps the values of the
+# autotuner's `key` arguments to the index of the best config, so that a
+# process only benchmarks the keys that no earlier process has tuned.
+#
+# Persistence is enabled per autotuner (`triton.autotune(..., persistent=True)`)
+# or for all of them with $TRITON_PERSISTENT_AUTOTUNE=1. Tables can be
+# exported to, and imported from, a single JSON file, e.g. to seed a new
+# deployment with the results of a tuning run.
+
+TABLE_FILE = "autotune.json"
+
+
+def enabled():
+    return os.environ.get("TRITON_PERSISTENT_AUTOTUNE", "0") == "1"
+
+
+def device_descriptor(device=None):
+    if device is None:
+        device = torch.cuda.current_device()
+    major, minor = torch.cuda.get_device_capability(device)
+    return f"{torch.cuda.get_device_name(device)}-sm{major}{minor}"
+
+
+def configs_hash(configs):
+    key = "|".join(str(config) for config in configs)
+    return hashlib.md5(key.encode("utf-8")).hexdigest()
+
+
+def _jit_function(fn):
+    # autotuned kernels may also be wrapped by `triton.heuristics`
+    while not isinstance(fn, JITFunction):
+        fn = getattr(fn, "fn", None)
+        if fn is None:
+            return None
+    return fn
+
+
+class TuningTable:
+    """
+    Tuning results of a kernel, for a list of configs, on one kind of device.
+    Entries are loaded lazily, on the first lookup. Autotuners whose keys have
+    a different meaning (e.g. another bucketing) use a different :code:`variant`.
+    """
+
+    def __init__(self, fn, configs, device=None, variant=""):
+        jit_fn = _jit_function(fn)
+        if jit_fn is None:
+            raise TypeError(f"cannot persist tuning results of {fn}, which isn't a JITFunction")
+        self.kernel = jit_fn.__name__
+        self.device = device_descriptor(device)
+        self.configs = [str(config) for config in configs]
+        key = f"{jit_fn.cache_key}-{self.device}-{configs_hash(configs)}-autotune"
+        # e.g. the bucketing of the keys
+        if variant:
+            key += f"-{variant}"
+        self.key = hashlib.md5(key.encode("utf-8")).hexdigest()
+        self.entries = None
+
+    def _cache_manager(self):
+        return CacheManager(self.key)
+
+    def load(self, cache_manager=None):
+        self.entries = dict()
+        if cache_manager is None:
+            cache_manager = self._cache_manager()
+        if cache_manager.has_file(TABLE_FILE):
+            with open(cache_manager._make_path(TABLE_FILE)) as f:
+                self.entries.update(json.load(f)["entries"])
+
+    def get(self, key):
+        """Return the index of the best config for the :code:`key` values, or :code:`None`."""
+        if self.entries is None:
+            self.load()
+        entry = self.entries.get(repr(key))
+        return None if entry is None else entry["config"]
+
+    def put(self, key, config, timing):
+        """Record :code:`config`, the index of the best config, and its (median, 20-th, 80-th percentile) timing."""
+        cache_manager = self._cache_manager()
+        if not cache_manager.cache_dir:
+            self.load(cache_manager)
+            self.entries[repr(key)] = {"config": config, "timing": timing}
+            return
+        # merge with the entries stored by other processes since our load,
+        # without any being stored between our load and write
+        with cache_manager.lock():
+            self.load(cache_manager)
+            self.entries[repr(key)] = {"config": config, "timing": timing}
+            cache_manager.put(json.dumps(self.to_json()), TABLE_FILE, binary=False)
+
+    def to_json(self):
+        return {"key": self.key, "kernel": self.kernel, "device": self.device, "version_key": version_key(),
+                "configs": self.configs, "entries": self.entries}
+
+
+def export_results(path, cache_dir=None):
+    """
+    Write every tuning table of the kernel cache to the JSON file at :code:`path`.
+
+    :return: the number of exported tables
+    """
+    tables = []
+    for entry in list_entries(cache_dir):
+        if TABLE_FILE in entry.files:
+            try:
+                with open(os.path.join(entry.path, TABLE_FILE)) as f:
+                    tables.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+    with open(path, "w") as f:
+        json.dump({"tables": tables}, f, indent=1)
+    return len(tables)
+
+
+def import_results(path):
+    """
+    Merge the tuning tables exported to :code:`path` into the kernel cache;
+    entries already in the cache take precedence.
+
+    :return: the number of imported tables
+    """
+    with open(path) as f:
+        tables = json.load(f)["tables"]
+    for table in tables:
+        cache_manager = CacheManager(table["key"])
+        if not cache_manager.cache_dir:
+            continue
+        # as in `TuningTable.put`, no entry may be stored between our load and write
+        with cache_manager.lock():
+            if cache_manager.has_file(TABLE_FILE):
+                with open(cache_manager._make_path(TABLE_FILE)) as f:
+                    table["entries"].update(json.load(f)["entries"])
+            cache_manager.put(json.dumps(table), TABLE_FILE, binary=False)
+    return len(tables)
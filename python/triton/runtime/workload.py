@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import contextlib
+import importlib
+import json
+import os
+import threading
+import warnings
+
+import torch
+
+from .tuning_cache import _jit_function, configs_hash
+
+# -----------------------------------------------------------------------------
+# Workload traces
+# -----------------------------------------------------------------------------
+#
+# A workload trace records the calls of autotuned kernels -- the kernel, and
+# the shapes, strides and dtypes of its tensor arguments and the values of its
+# other arguments -- as JSON lines. Only the first call for each autotuning
+# key is recorded, so that recording can stay enabled in production.
+#
+# A trace is replayed offline, e.g. by `python -m triton.tools.tune`, with
+# synthetic tensors, to tune every recorded key ahead of time. Since grids are
+# often functions of the config's meta-parameters, the recorder evaluates the
+# grid for every config of the autotuner at recording time.
+#
+# The launch hooks of `CompiledKernel` only see the compiled kernel and not
+# its arguments, so calls are recorded by `Autotuner.run` instead.
+# Recording is enabled by `record(path)` or with $TRITON_RECORD_WORKLOAD=path.
+
+recorder = None
+
+_LAUNCH_KWARGS = ["grid", "stream", "warmup", "num_warps", "num_stages", "extern_libs"]
+
+
+def kernel_name(fn):
+    """Return the :code:`module:name` of the jitted function that :code:`fn` wraps."""
+    jit_fn = _jit_function(fn)
+    if jit_fn is None:
+        return repr(fn)
+    return f"{jit_fn.module}:{jit_fn.__name__}"
+
+
+def _autotuner(fn):
+    # e.g. heuristics applied on top of the autotuner
+    from .autotuner import Autotuner
+    while not isinstance(fn, Autotuner):
+        fn = getattr(fn, "fn", None)
+        if fn is None:
+            return None
+    return fn
+
+
+def resolve_kernel(name, configs):
+    """
+    Return the :code:`Autotuner` of the jitted function :code:`name` whose list of
+    configs hashes to :code:`configs`, from the module of the function.
+    """
+    module_name, fn_name = name.split(":")
+    module = importlib.import_module(module_name)
+    for obj in vars(module).values():
+        autotuner = _autotuner(obj)
+        if autotuner is not None and _jit_function(autotuner).__name__ == fn_name \
+                and configs_hash(autotuner.configs) == configs:
+            return autotuner
+    raise LookupError(f"no autotuner of {name} with the recorded configs in {module_name}")
+
+
+def describe_arg(arg):
+    if isinstance(arg, torch.Tensor):
+        return {"shape": list(arg.shape), "stride": list(arg.stride()), "dtype": str(arg.dtype).split(".")[-1]}
+    if arg is None or isinstance(arg, (bool, int, float, str)):
+        return {"value": arg}
+    raise TypeError(f"cannot record argument of type {type(arg).__name__}")
+
+
+def make_arg(desc, device="cuda"):
+    if "value" in desc:
+        return desc["value"]
+    dtype = getattr(torch, desc["dtype"])
+    tensor = torch.empty_strided(desc["shape"], desc["stride"], dtype=dtype, device=device)
+    # random data for floats; zeros for integers, which may be indices
+    return tensor.normal_() if tensor.is_floating_point() else tensor.zero_()
+
+
+class Recorder:
+    """
+    Appends the calls of autotuned kernels to the trace at :code:`path`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.seen = set()
+        self.lock = threading.Lock()
+
+    def record(self, autotuner, key, args, kwargs):
+        if (id(autotuner), key) in self.seen:
+            return
+        with self.lock:
+            self.seen.add((id(autotuner), key))
+            try:
+                entry = self._entry(autotuner, args, kwargs)
+            except Exception as e:
+                warnings.warn(f"not recording a call of {autotuner.fn}: {e}")
+                return
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def _entry(self, autotuner, args, kwargs):
+        name = kernel_name(autotuner.fn)
+        if name.startswith("__main__:"):
+            raise ValueError("kernels defined in __main__ can't be resolved when replaying")
+        meta = {k: v for k, v in kwargs.items() if k not in _LAUNCH_KWARGS}
+        entry = {"kernel": name,
+                 "configs": configs_hash(autotuner.configs),
+                 "args": [describe_arg(arg) for arg in args],
+                 "kwargs": {k: describe_arg(v) for k, v in meta.items()}}
+        grid = kwargs["grid"]
+        if callable(grid):
+            grids = []
+            for config in autotuner.configs:
+                config_meta = dict(zip(autotuner.arg_names, args), **meta, **config.kwargs)
+                grids.append({"config": config.kwargs, "grid": list(grid(config_meta))})
+            entry["grids"] = grids
+        else:
+            entry["grid"] = list(grid)
+        return entry
+
+
+def start(path):
+    global recorder
+    recorder = Recorder(path)
+
+
+def stop():
+    global recorder
+    recorder = None
+
+
+@contextlib.contextmanager
+def record(path):
+    """Record the calls of autotuned kernels to the trace at :code:`path` within this context."""
+    start(path)
+    try:
+        yield
+    finally:
+        stop()
+
+
+def load(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class _RecordedGrid:
+    # the grid recorded for the config whose meta-parameters are in `meta`
+
+    def __init__(self, grids):
+        self.grids = grids
+
+    def __call__(self, meta):
+        for entry in self.grids:
+            if all(meta.get(k) == v for k, v in entry["config"].items()):
+                return tuple(entry["grid"])
+        raise KeyError(f"no grid recorded for {meta}")
+
+
+def replay(entries, device="cuda", persistent=True, search=None):
+    """
+    Call the autotuner of every entry of a trace, with synthetic tensors, so
+    that it tunes the recorded keys.
+
+    :param persistent: whether to store the tuning results in the kernel cache
+        (see :code:`triton.runtime.tuning_cache`)
+    :param search: search strategy overriding the autotuners' own
+    :return: the autotuners, by (kernel name, configs hash)
+    """
+    autotuners = dict()
+    for entry in entries:
+        autotuner = autotuners.get((entry["kernel"], entry["configs"]))
+        if autotuner is None:
+            autotuner = resolve_kernel(entry["kernel"], entry["configs"])
+            autotuners[(entry["kernel"], entry["configs"])] = autotuner
+            autotuner.persistent = persistent
+            if search is not None:
+                autotuner.search = search
+        args = [make_arg(desc, device) for desc in entry["args"]]
+        kwargs = {k: make_arg(desc, device) for k, desc in entry["kwargs"].items()}
+        grid = _RecordedGrid(entry["grids"]) if "grids" in entry else tuple(entry["grid"])
+        autotuner.run(*args, grid=grid, **kwargs)
+    return autotuners
+
+
+if os.environ.get("TRITON_RECORD_WORKLOAD"):
+    start(os.environ["TRITON_RECORD_WORKLOAD"])
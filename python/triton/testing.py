@@ -1,7 +1,12 @@
 import functools
+import glob
+import json
+import math
 import os
+import statistics
 import subprocess
 import sys
+import threading
 from contextlib import contextmanager
 
 import torch
@@ -118,12 +123,174 @@ def nvsmi(attrs):
     return ret
 
 
+def _quantile(samples, q):
+    # quantile of sorted samples, interpolated linearly like `torch.quantile`
+    pos = q * (len(samples) - 1)
+    lo = math.floor(pos)
+    hi = min(lo + 1, len(samples) - 1)
+    if samples[lo] == samples[hi]:
+        return samples[lo]
+    return samples[lo] + (samples[hi] - samples[lo]) * (pos - lo)
+
+
+class BenchResult:
+    """
+    Runtimes measured by :code:`Bencher.run`, in ms.
+
+    :ivar samples: runtime of every timed run
+    :ivar median: median runtime
+    :ivar iqr: interquartile range of the runtimes
+    :ivar ci: confidence interval of the median, from the order statistics of the samples
+    """
+
+    def __init__(self, samples, confidence=0.95):
+        self.samples = list(samples)
+        ordered = sorted(self.samples)
+        self.median = _quantile(ordered, 0.5)
+        self.iqr = _quantile(ordered, 0.75) - _quantile(ordered, 0.25)
+        # the ranks bounding the median with probability `confidence`, by the
+        # normal approximation of the binomial distribution
+        n = len(ordered)
+        half_width = statistics.NormalDist().inv_cdf(0.5 + confidence / 2) * math.sqrt(n) / 2
+        lo = max(0, math.floor(n / 2 - half_width))
+        hi = min(n - 1, math.ceil(n / 2 + half_width))
+        self.ci = (ordered[lo], ordered[hi])
+
+    def quantiles(self, qs):
+        ordered = sorted(self.samples)
+        return tuple(_quantile(ordered, q) for q in qs)
+
+    @property
+    def rel_ci(self):
+        """Half-width of :code:`ci`, relative to the median."""
+        half_width = (self.ci[1] - self.ci[0]) / 2
+        if half_width == 0:
+            return 0.0
+        return half_width / self.median if self.median > 0 else math.inf
+
+
+class CudaEventTimer:
+    """
+    Times calls with CUDA events, on the current stream. Events are pooled across measurements.
+    """
+
+    def __init__(self):
+        self.events = []
+
+    def measure(self, fn, n, before=None):
+        while len(self.events) < n:
+            self.events.append((torch.cuda.Event(enable_timing=True), torch.cuda.Event(enable_timing=True)))
+        events = self.events[:n]
+        for start, end in events:
+            if before is not None:
+                before()
+            start.record()
+            fn()
+            end.record()
+        torch.cuda.synchronize()
+        return [start.elapsed_time(end) for start, end in events]
+
+
+def _l2_flush_size(device):
+    # twice the L2 cache, so that clearing the buffer evicts all of it
+    l2_size = getattr(torch.cuda.get_device_properties(device), "L2_cache_size", 0)
+    return 2 * l2_size if l2_size else int(256e6)
+
+
+class Bencher:
+    """
+    Benchmarks functions like :code:`do_bench`, but keeps its L2-flush buffer and its
+    timing events from one call to the next, e.g. across the configs of an autotuner.
+    Threads benchmark one at a time, since they share these events, and since
+    kernels running concurrently on the device would skew each other's timings.
+
+    :param device: device whose L2 cache is flushed (default: the current device)
+    :param timer: object whose :code:`measure(fn, n, before)` calls :code:`before` then :code:`fn`,
+        :code:`n` times, and returns the runtime of each call of :code:`fn`, in ms (default:
+        a :code:`CudaEventTimer`)
+    :param flush: whether to flush the L2 cache before each timed call
+    :param confidence: confidence level of the interval of the median runtime
+    """
+
+    def __init__(self, device=None, timer=None, flush=True, confidence=0.95):
+        self.device = device
+        self.timer = CudaEventTimer() if timer is None else timer
+        self.flush = flush
+        self.confidence = confidence
+        self.cache = None
+        self.lock = threading.RLock()
+
+    def _flush_buffer(self):
+        if self.cache is None:
+            device = torch.cuda.current_device() if self.device is None else self.device
+            self.cache = torch.empty(_l2_flush_size(device) // 4, dtype=torch.int, device=device)
+        return self.cache
+
+    def run(self, fn, warmup=25, rep=100, grad_to_none=None, rel_ci=None, max_rep=None):
+        """
+        Benchmark :code:`fn` for about :code:`rep` ms, after :code:`warmup` ms of warm-up.
+
+        :param grad_to_none: tensors whose gradient is reset to None before each run
+        :param rel_ci: if set, keep benchmarking, in rounds of :code:`rep` ms, until the
+            confidence interval of the median is within :code:`rel_ci` of it
+        :param max_rep: time after which to stop benchmarking even if :code:`rel_ci` isn't
+            reached, in ms (default: 10 times :code:`rep`)
+        :rtype: BenchResult
+        """
+        with self.lock:
+            return self._run(fn, warmup, rep, grad_to_none, rel_ci, max_rep)
+
+    def _run(self, fn, warmup, rep, grad_to_none, rel_ci, max_rep):
+        # Estimate the runtime of the function
+        fn()
+        estimate_ms = sum(self.timer.measure(fn, 5)) / 5
+        # compute number of warmup and repeat
+        n_warmup = max(1, int(warmup / estimate_ms))
+        n_repeat = max(1, int(rep / estimate_ms))
+        cache = self._flush_buffer() if self.flush else None
+
+        def before():
+            # we don't want `fn` to accumulate gradient values
+            # if it contains a backward pass. So we clear the
+            # provided gradients
+            if grad_to_none is not None:
+                for x in grad_to_none:
+                    x.grad = None
+            # we clear the L2 cache before each run
+            if cache is not None:
+                cache.zero_()
+        # Warm-up
+        for _ in range(n_warmup):
+            fn()
+        # Benchmark
+        samples = self.timer.measure(fn, n_repeat, before)
+        result = BenchResult(samples, self.confidence)
+        max_rep = 10 * rep if max_rep is None else max_rep
+        while rel_ci is not None and result.rel_ci > rel_ci and sum(samples) < max_rep:
+            samples += self.timer.measure(fn, n_repeat, before)
+            result = BenchResult(samples, self.confidence)
+        return result
+
+
+_benchers = dict()
+_benchers_lock = threading.Lock()
+
+
+def bencher(device=None):
+    """Return the :code:`Bencher` shared by :code:`do_bench` and autotuners on :code:`device` (default: current)."""
+    device = torch.cuda.current_device() if device is None else device
+    with _benchers_lock:
+        if device not in _benchers:
+            _benchers[device] = Bencher(device)
+        return _benchers[device]
+
+
 def do_bench(fn, warmup=25, rep=100, grad_to_none=None,
              percentiles=(0.5, 0.2, 0.8),
-             record_clocks=False, fast_flush=False):
+             record_clocks=False, fast_flush=False, return_times=False):
     """
     Benchmark the runtime of the provided function. By default, return the median runtime of :code:`fn` along with
-    the 20-th and 80-th performance percentile.
+    the 20-th and 80-th performance percentile. See :code:`Bencher` for more detailed statistics.
 
     :param fn: Function to benchmark
     :type fn: Callable
@@ -135,58 +302,18 @@ def do_bench(fn, warmup=25, rep=100, grad_to_none=None,
     :type grad_to_none: torch.tensor, optional
     :param percentiles: Performance percentile to return in addition to the median.
     :type percentiles: list[float]
-    :param fast_flush: Use faster kernel to flush L2 between measurements
+    :param fast_flush: Unused: the L2 cache is always flushed with the faster kernel
     :type fast_flush: bool
+    :param return_times: Return the runtime of every repetition instead of percentiles
+    :type return_times: bool
     """
-
-    # Estimate the runtime of the function
-    fn()
-    torch.cuda.synchronize()
-    start_event = torch.cuda.Event(enable_timing=True)
-    end_event = torch.cuda.Event(enable_timing=True)
-    start_event.record()
-    for _ in range(5):
-        fn()
-    end_event.record()
-    torch.cuda.synchronize()
-    estimate_ms = start_event.elapsed_time(end_event) / 5
-    # compute number of warmup and repeat
-    n_warmup = max(1, int(warmup / estimate_ms))
-    n_repeat = max(1, int(rep / estimate_ms))
-    # We maintain a buffer of 256 MB that we clear
-    # before each kernel call to make sure that the L2
-    # doesn't contain any input data before the run
-    start_event = [torch.cuda.Event(enable_timing=True) for i in range(n_repeat)]
-    end_event = [torch.cuda.Event(enable_timing=True) for i in range(n_repeat)]
-    if fast_flush:
-        cache = torch.empty(int(256e6 // 4), dtype=torch.int, device='cuda')
-    else:
-        cache = torch.empty(int(256e6), dtype=torch.int8, device='cuda')
-    # Warm-up
-    for _ in range(n_warmup):
-        fn()
-    # Benchmark
-    for i in range(n_repeat):
-        # we don't want `fn` to accumulate gradient values
-        # if it contains a backward pass. So we clear the
-        # provided gradients
-        if grad_to_none is not None:
-            for x in grad_to_none:
-                x.grad = None
-        # we clear the L2 cache before each run
-        cache.zero_()
-        # record time of `fn`
-        start_event[i].record()
-        fn()
-        end_event[i].record()
-    # Record clocks
-    torch.cuda.synchronize()
-    times = torch.tensor([s.elapsed_time(e) for s, e in zip(start_event, end_event)])
+    result = bencher().run(fn, warmup=warmup, rep=rep, grad_to_none=grad_to_none)
+    if return_times:
+        return result.samples
     if percentiles:
-        percentiles = torch.quantile(times, torch.tensor(percentiles)).tolist()
-        return tuple(percentiles)
+        return result.quantiles(percentiles)
     else:
-        return torch.mean(times).item()
+        return sum(result.samples) / len(result.samples)
 
 
 class Benchmark:
@@ -251,33 +378,180 @@ class Benchmark:
         self.args = args
 
 
+# marks created while collecting (see `collect_marks`)
+_collected_marks = None
+
+
+@contextmanager
+def collect_marks():
+    """
+    Within this context, :code:`perf_report` marks are collected into the returned list,
+    and running them does nothing, e.g. to discover the benchmarks of a script.
+    """
+    global _collected_marks
+    _collected_marks = []
+    try:
+        yield _collected_marks
+    finally:
+        _collected_marks = None
+
+
+# -----------------------------------------------------------------------------
+# Benchmark sweeps
+# -----------------------------------------------------------------------------
+#
+# `Mark.run` measures each point of a `Benchmark`'s x_vals x line_vals grid
+# and, given a results directory, appends it right away to a JSON-lines file
+# in it, named after the plot: an interrupted sweep resumes from that file
+# instead of starting over. The grid can be split into shards -- point i goes
+# to shard i % count -- each run by its own process, e.g. one per GPU:
+#
+#     CUDA_VISIBLE_DEVICES=0 TRITON_BENCH_SHARD=0/2 TRITON_BENCH_RESULTS=out python bench.py &
+#     CUDA_VISIBLE_DEVICES=1 TRITON_BENCH_SHARD=1/2 TRITON_BENCH_RESULTS=out python bench.py
+#
+# Shards write separate files; the plots and CSVs are made from all of them,
+# by whichever shard completes the sweep, or later by `Mark.report`.
+
+
+class SweepResults:
+    """
+    The points of a :code:`Benchmark` measured so far, appended as JSON lines to :code:`path`
+    (or only kept in memory if :code:`path` is None). The first line identifies the benchmark.
+    """
+
+    def __init__(self, bench, path=None):
+        self.header = {"plot_name": bench.plot_name, "x_names": list(bench.x_names),
+                       "line_arg": bench.line_arg, "args": repr(bench.args)}
+        self.path = path
+        self.points = dict()
+        if path is None:
+            return
+        if os.path.exists(path):
+            self.load(path, repair=True)
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            with open(path, "w") as f:
+                f.write(json.dumps(self.header) + "\n")
+
+    @staticmethod
+    def key(x, y):
+        return repr(x), repr(y)
+
+    def load(self, path, repair=False):
+        """
+        Load the points stored at :code:`path`. A last line cut short by an interruption is
+        ignored and, if :code:`repair`, truncated, so that points can be appended again.
+        """
+        with open(path, "rb") as f:
+            chunks = f.read().splitlines(keepends=True)
+        lines = []
+        for i, chunk in enumerate(chunks):
+            try:
+                if not chunk.endswith(b"\n"):
+                    raise ValueError("line cut short")
+                lines.append(json.loads(chunk))
+            except ValueError:
+                if i < len(chunks) - 1:
+                    raise RuntimeError(f"{path}:{i + 1}: invalid line")
+                if repair:
+                    with open(path, "r+b") as f:
+                        f.truncate(sum(len(chunk) for chunk in chunks[:i]))
+        if not lines:
+            return
+        if lines[0] != self.header:
+            raise RuntimeError(f"{path} holds the results of another benchmark; remove it to rerun")
+        for point in lines[1:]:
+            self.points[point["x"], point["line"]] = (point["mean"], point["min"], point["max"])
+
+    def add(self, x, y, ret):
+        try:
+            y_mean, y_min, y_max = ret
+        except TypeError:
+            y_mean, y_min, y_max = ret, None, None
+        values = tuple(None if value is None else float(value) for value in (y_mean, y_min, y_max))
+        key = self.key(x, y)
+        self.points[key] = values
+        if self.path is not None:
+            point = {"x": key[0], "line": key[1], "mean": values[0], "min": values[1], "max": values[2]}
+            with open(self.path, "a") as f:
+                f.write(json.dumps(point) + "\n")
+
+    def get(self, x, y):
+        return self.points.get(self.key(x, y), (None, None, None))
+
+    def __contains__(self, xy):
+        return self.key(*xy) in self.points
+
+    def __len__(self):
+        return len(self.points)
+
+
+def _sweep_path(results_dir, bench, shard):
+    index, count = shard
+    suffix = f".{index}-of-{count}" if count > 1 else ""
+    return os.path.join(results_dir, f"{bench.plot_name}{suffix}.jsonl")
+
+
+def _load_sweep(results_dir, bench):
+    # merges the files of all shards
+    results = SweepResults(bench)
+    pattern = glob.escape(os.path.join(results_dir, bench.plot_name))
+    for path in sorted(glob.glob(pattern + ".jsonl") + glob.glob(pattern + ".*-of-*.jsonl")):
+        results.load(path)
+    return results
+
+
+def _parse_shard(shard):
+    if shard is None:
+        shard = os.environ.get("TRITON_BENCH_SHARD")
+    if shard is None:
+        return 0, 1
+    if isinstance(shard, str):
+        shard = tuple(int(v) for v in shard.split("/"))
+    index, count = shard
+    if not 0 <= index < count:
+        raise ValueError(f"invalid shard {index}/{count}")
+    return index, count
+
+
 class Mark:
     def __init__(self, fn, benchmarks):
         self.fn = fn
         self.benchmarks = benchmarks
-
-    def _run(self, bench, save_path, show_plots, print_data):
-        import os
-
+        if _collected_marks is not None:
+            _collected_marks.append(self)
+
+    def _run(self, bench, save_path, show_plots, print_data, results_dir=None, shard=(0, 1)):
+        index, count = shard
+        if count > 1 and not (results_dir and bench.plot_name):
+            raise ValueError("sharded sweeps need a results directory and a plot name")
+        path = _sweep_path(results_dir, bench, shard) if results_dir and bench.plot_name else None
+        results = SweepResults(bench, path)
+        points = [(x, y) for x in bench.x_vals for y in bench.line_vals]
+        for i, (x, y) in enumerate(points):
+            if i % count != index or (x, y) in results:
+                continue
+            x_args = {x_name: x for x_name in bench.x_names}
+            results.add(x, y, self.fn(**x_args, **{bench.line_arg: y}, **bench.args))
+        if count > 1:
+            results = _load_sweep(results_dir, bench)
+            if len(results) < len(points):
+                print(f"{bench.plot_name}: shard {index}/{count} done, {len(results)}/{len(points)} points measured")
+                return False
+        self._report(bench, results, save_path, show_plots, print_data)
+        return True
+
+    def _report(self, bench, results, save_path, show_plots, print_data):
         import matplotlib.pyplot as plt
         import pandas as pd
         y_mean = bench.line_names
         y_min = [f'{x}-min' for x in bench.line_names]
         y_max = [f'{x}-max' for x in bench.line_names]
-        df = pd.DataFrame(columns=[bench.x_names[0]] + y_mean + y_min + y_max)
+        rows = []
         for x in bench.x_vals:
-            x_args = {x_name: x for x_name in bench.x_names}
-            row_mean, row_min, row_max = [], [], []
-            for y in bench.line_vals:
-                ret = self.fn(**x_args, **{bench.line_arg: y}, **bench.args)
-                try:
-                    y_mean, y_min, y_max = ret
-                except TypeError:
-                    y_mean, y_min, y_max = ret, None, None
-                row_mean += [y_mean]
-                row_min += [y_min]
-                row_max += [y_max]
-            df.loc[len(df)] = [x] + row_mean + row_min + row_max
+            values = [results.get(x, y) for y in bench.line_vals]
+            rows.append([x] + [v[0] for v in values] + [v[1] for v in values] + [v[2] for v in values])
+        df = pd.DataFrame(rows, columns=[bench.x_names[0]] + y_mean + y_min + y_max)
         if bench.plot_name:
             plt.figure()
             ax = plt.subplot()
@@ -307,19 +581,44 @@ class Mark:
         if save_path:
             df.to_csv(os.path.join(save_path, f"{bench.plot_name}.csv"), float_format='%.1f', index=False)
 
-    def run(self, show_plots=False, print_data=False, save_path=''):
-        has_single_bench = isinstance(self.benchmarks, Benchmark)
-        benchmarks = [self.benchmarks] if has_single_bench else self.benchmarks
-        if save_path:
-            html = open(os.path.join(save_path, "results.html"), "w")
+    def _benchmarks(self):
+        return [self.benchmarks] if isinstance(self.benchmarks, Benchmark) else self.benchmarks
+
+    def _write_html(self, save_path, benchmarks):
+        with open(os.path.join(save_path, "results.html"), "w") as html:
             html.write("<html><body>\n")
-        for bench in benchmarks:
-            self._run(bench, save_path, show_plots, print_data)
-            if save_path:
+            for bench in benchmarks:
                 html.write(f"<image src=\"{bench.plot_name}.png\"/>\n")
-        if save_path:
             html.write("</body></html>\n")
 
+    def run(self, show_plots=False, print_data=False, save_path='', results_dir=None, shard=None):
+        """
+        Measure the benchmarks, then plot and print them.
+
+        :param results_dir: directory the measured points are streamed to, and resumed from
+            (default: $TRITON_BENCH_RESULTS; if unset, points are kept in memory only)
+        :param shard: :code:`(index, count)` or :code:`"index/count"`: only measure this shard of
+            each benchmark's points (default: $TRITON_BENCH_SHARD). The plots are made once all
+            shards are measured.
+        """
+        if _collected_marks is not None:
+            return
+        shard = _parse_shard(shard)
+        if results_dir is None:
+            results_dir = os.environ.get("TRITON_BENCH_RESULTS") or None
+        benchmarks = self._benchmarks()
+        complete = [self._run(bench, save_path, show_plots, print_data, results_dir, shard) for bench in benchmarks]
+        if save_path and all(complete):
+            self._write_html(save_path, benchmarks)
+
+    def report(self, results_dir, show_plots=False, print_data=False, save_path=''):
+        """Plot and print the benchmarks from the points stored in :code:`results_dir`, without measuring."""
+        benchmarks = self._benchmarks()
+        for bench in benchmarks:
+            self._report(bench, _load_sweep(results_dir, bench), save_path, show_plots, print_data)
+        if save_path:
+            self._write_html(save_path, benchmarks)
+
 
 def perf_report(benchmarks):
     """
@@ -0,0 +1,78 @@
+import argparse
+import os
+import sys
+
+from triton.runtime import tuning_cache
+from triton.runtime.cache import (default_cache_dir, evict, list_entries, parse_size,
+                                  remove_entry)
+
+
+def _format_size(size):
+    for unit in ["B", "KB", "MB", "GB"]:
+        if size < 1024:
+            return f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}TB"
+
+
+def stats(args):
+    entries = list_entries(args.dir)
+    total = sum(entry.size for entry in entries)
+    print(f"cache directory: {args.dir}")
+    print(f"entries: {len(entries)}")
+    print(f"size: {_format_size(total)}")
+    if entries:
+        largest = max(entries, key=lambda entry: entry.size)
+        print(f"largest entry: {largest.key} ({_format_size(largest.size)})")
+
+
+def prune(args):
+    evicted = evict(parse_size(args.max_bytes), args.dir)
+    print(f"evicted {len(evicted)} entries ({_format_size(sum(entry.size for entry in evicted))})")
+
+
+def verify(args):
+    n_bad = n_removed = 0
+    for entry in list_entries(args.dir):
+        problems = entry.verify()
+        if not problems:
+            continue
+        n_bad += 1
+        print(f"{entry.key}: {'; '.join(problems)}")
+        if args.fix and remove_entry(entry):
+            n_removed += 1
+    print(f"{n_bad} corrupt entries" + (f", {n_removed} removed" if args.fix else ""))
+    # entries being written can't be removed
+    return 1 if n_bad > n_removed else 0
+
+
+def export_tuning(args):
+    n_tables = tuning_cache.export_results(args.path, args.dir)
+    print(f"exported {n_tables} tuning tables to {args.path}")
+
+
+def import_tuning(args):
+    os.environ['TRITON_CACHE_DIR'] = args.dir
+    n_tables = tuning_cache.import_results(args.path)
+    print(f"imported {n_tables} tuning tables from {args.path}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Inspect and maintain the Triton kernel cache")
+    parser.add_argument('--dir', default=os.environ.get('TRITON_CACHE_DIR', default_cache_dir()),
+                        help="Cache directory (default: $TRITON_CACHE_DIR or ~/.triton/cache)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('stats', help="Print the number of entries and size of the cache")
+    prune_parser = subparsers.add_parser('prune', help="Evict least recently used entries")
+    prune_parser.add_argument('--max-bytes', required=True, help="Size to prune the cache to, e.g. 10G")
+    verify_parser = subparsers.add_parser('verify', help="Check cache entries for corruption")
+    verify_parser.add_argument('--fix', action='store_true', help="Remove corrupt entries")
+    export_parser = subparsers.add_parser('export-tuning', help="Export persistent autotuning results to a JSON file")
+    export_parser.add_argument('path')
+    import_parser = subparsers.add_parser('import-tuning', help="Import autotuning results from a JSON file")
+    import_parser.add_argument('path')
+    args = parser.parse_args()
+    commands = {'stats': stats, 'prune': prune, 'verify': verify,
+                'export-tuning': export_tuning, 'import-tuning': import_tuning}
+    ret = commands[args.command](args)
+    sys.exit(ret or 0)
@@ -0,0 +1,314 @@
+import argparse
+import ast
+import collections
+import fnmatch
+import functools
+import importlib
+import json
+import os
+import re
+import resource
+import statistics
+import sys
+
+import triton
+from triton import compiler
+from triton.runtime import compile_trace
+from triton.runtime.tuning_cache import _jit_function
+
+# -----------------------------------------------------------------------------
+# Compiler throughput benchmark
+# -----------------------------------------------------------------------------
+#
+# Compiles the kernels of the tutorials and of `triton.ops` stage by stage --
+# ast -> ttir -> ttgir -> llir -> ptx (-> cubin with ptxas), or -> amdgcn --
+# for explicit targets, so that no GPU is needed, and reports the time of
+# each stage, the size of the IR it produced, and the peak RSS of the
+# compilation. Kernels are compiled from scratch, bypassing the kernel cache.
+#
+#     python -m triton.tools.compile_bench --target sm80 --repeat 5 -o compile.json
+#     python -m triton.tools.regression compare --results compile.json --baselines <dir> --device <host>
+#
+# Results use the format of `triton.tools.regression`, so that they can be
+# recorded and compared as baselines. Stage timings come from
+# `triton.runtime.compile_trace`; `--passes` also reports each MLIR pass.
+
+TUTORIALS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(triton.__file__))), "tutorials")
+
+
+_KERNEL_DECORATORS = {"triton.jit", "triton.autotune", "triton.heuristics"}
+
+
+def _dotted_name(node):
+    # e.g. "triton.autotune" for `@triton.autotune(configs=...)`, or None if not a (called) name
+    if isinstance(node, ast.Call):
+        return _dotted_name(node.func)
+    if isinstance(node, ast.Attribute):
+        value = _dotted_name(node.value)
+        return None if value is None else f"{value}.{node.attr}"
+    if isinstance(node, ast.Name):
+        return node.id
+    return None
+
+
+@functools.lru_cache()
+def load_tutorial(path):
+    """
+    Return the namespace of the imports and kernels of the tutorial at :code:`path`,
+    without running the rest of the script (which needs a GPU).
+    """
+    with open(path) as f:
+        tree = ast.parse(f.read(), path)
+
+    def keep(node):
+        # kernels only refer to triton, but tutorials also import e.g. tabulate for printing
+        if isinstance(node, ast.Import):
+            return all(alias.name.split(".")[0] == "triton" for alias in node.names)
+        if isinstance(node, ast.ImportFrom):
+            return (node.module or "").split(".")[0] == "triton"
+        return isinstance(node, ast.FunctionDef) and \
+            any(_dotted_name(decorator) in _KERNEL_DECORATORS for decorator in node.decorator_list)
+    tree.body = [node for node in tree.body if keep(node)]
+    name = "tutorial_" + re.sub(r"\W", "_", os.path.splitext(os.path.basename(path))[0])
+    namespace = {"__name__": name, "__file__": path}
+    # compiled with the tutorial's path and line numbers, for `inspect.getsource`
+    exec(compile(tree, path, "exec"), namespace)
+    return namespace
+
+
+def _tutorial(file, name):
+    return lambda: load_tutorial(os.path.join(TUTORIALS_DIR, file))[name]
+
+
+def _ops(module, name):
+    return lambda: getattr(importlib.import_module(module), name)
+
+
+class CompileCase:
+    """
+    A kernel of the suite, specialized for one set of arguments.
+
+    :param load: function returning the kernel, possibly wrapped by :code:`autotune` or :code:`heuristics`
+    :param signature: types of the arguments that are neither constexprs nor in :code:`constants`,
+        e.g. :code:`"*fp16,*fp16,i32"`
+    :param constants: values of the constexpr (and :code:`None`) arguments, by name
+    """
+
+    def __init__(self, name, load, signature, constants, num_warps=4, num_stages=3):
+        self.name = name
+        self.load = load
+        self.signature = signature
+        self.constants = constants
+        self.num_warps = num_warps
+        self.num_stages = num_stages
+
+    def compile_args(self):
+        """Return the kernel, and the signature, constants and specialization to compile it with."""
+        fn = _jit_function(self.load())
+        missing = [fn.arg_names[i] for i in fn.constexprs if fn.arg_names[i] not in self.constants]
+        if missing:
+            raise ValueError(f"{self.name}: no value for constexprs {', '.join(missing)}")
+        indices = [i for i, name in enumerate(fn.arg_names) if i not in fn.constexprs and name not in self.constants]
+        types = [ty.strip() for ty in self.signature.split(",")]
+        if len(types) != len(indices):
+            raise ValueError(f"{self.name}: {len(indices)} argument types expected, got {len(types)}")
+        signature = dict(zip(indices, types))
+        constants = {fn.arg_names.index(name): value for name, value in self.constants.items()}
+        # tensors are 16-byte aligned, as with the caching allocator
+        config = compiler.instance_descriptor(divisible_by_16={i for i, ty in signature.items() if ty.startswith("*")})
+        return fn, signature, constants, config
+
+
+_gemm = "*fp16,*fp16,*fp16," + ",".join(["i32"] * 9)
+_attention = "*fp16,*fp16,*fp16,fp32,*fp32,*fp32,*fp32,*fp16," + ",".join(["i32"] * 19)
+
+SUITE = [
+    CompileCase("tutorials/vector-add", _tutorial("01-vector-add.py", "add_kernel"),
+                "*fp32,*fp32,*fp32,i32", {"BLOCK_SIZE": 1024}),
+    CompileCase("tutorials/fused-softmax", _tutorial("02-fused-softmax.py", "softmax_kernel"),
+                "*fp32,*fp32,i32,i32,i32", {"BLOCK_SIZE": 1024}),
+    CompileCase("tutorials/matmul", _tutorial("03-matrix-multiplication.py", "matmul_kernel"), _gemm,
+                {"BLOCK_SIZE_M": 128, "BLOCK_SIZE_N": 256, "BLOCK_SIZE_K": 64, "GROUP_SIZE_M": 8, "ACTIVATION": None},
+                num_warps=8, num_stages=3),
+    CompileCase("tutorials/seeded-dropout", _tutorial("04-low-memory-dropout.py", "_seeded_dropout"),
+                "*fp32,*fp32,i32,fp32,i32", {"BLOCK_SIZE": 1024}),
+    CompileCase("tutorials/layer-norm-fwd", _tutorial("05-layer-norm.py", "_layer_norm_fwd_fused"),
+                "*fp16,*fp16,*fp16,*fp16,*fp32,*fp32,i32,i32,fp32", {"BLOCK_SIZE": 4096}, num_warps=8),
+    CompileCase("tutorials/layer-norm-bwd", _tutorial("05-layer-norm.py", "_layer_norm_bwd_dx_fused"),
+                "*fp16,*fp16,*fp16,*fp16,*fp16,*fp16,*fp16,*fp32,*fp32,*i32,i32,i32,fp32",
+                {"GROUP_SIZE_M": 96, "BLOCK_SIZE_N": 4096}, num_warps=8),
+    CompileCase("tutorials/fused-attention-fwd", _tutorial("06-fused-attention.py", "_fwd_kernel"), _attention,
+                {"BLOCK_M": 128, "BLOCK_N": 128, "BLOCK_DMODEL": 64}, num_warps=4, num_stages=2),
+    CompileCase("ops/matmul", _ops("triton.ops.matmul", "_kernel"), _gemm,
+                {"BLOCK_M": 128, "BLOCK_N": 128, "BLOCK_K": 32, "GROUP_M": 8, "SPLIT_K": 1, "EVEN_K": True,
+                 "ACC_TYPE": triton.language.float32}, num_warps=4, num_stages=4),
+    CompileCase("ops/cross-entropy-fwd", _ops("triton.ops.cross_entropy", "_forward"),
+                "*fp32,*fp32,*i64,*fp32,i32", {"BLOCK": 1024}),
+    CompileCase("ops/cross-entropy-bwd", _ops("triton.ops.cross_entropy", "_backward"),
+                "*fp32,*i64,*fp32,i32", {"BLOCK": 1024}),
+    CompileCase("ops/blocksparse-sdd", _ops("triton.ops.blocksparse.matmul", "_sdd_kernel"),
+                "*fp16,*fp16,*fp16," + ",".join(["i32"] * 14) + ",*i32",
+                {"TILE_M": 32, "TILE_N": 32, "TILE_K": 32, "BLOCK": 32, "EVEN_K": True}, num_stages=4),
+    CompileCase("ops/blocksparse-softmax-fwd", _ops("triton.ops.blocksparse.softmax", "_blocksparse_softmax_fwd"),
+                "*fp16,*fp16,i32,*i32,i32,i32,i32,fp32,i1",
+                {"R": None, "ROW_SIZE": 512, "BLOCK_SIZE": 32, "IS_DENSE": False}),
+]
+
+
+class Target:
+    """
+    A compilation target: :code:`sm<cc>` for CUDA (e.g. :code:`sm80`), or an AMD GPU
+    architecture (e.g. :code:`gfx90a`).
+    """
+
+    def __init__(self, name, cubin=False):
+        self.name = name
+        match = re.fullmatch(r"sm_?(\d+)", name)
+        if match:
+            self.backend, self.capability = "cuda", int(match.group(1))
+        elif re.fullmatch(r"gfx\w+", name):
+            # the capability torch reports on ROCm, e.g. 90 for gfx90a
+            self.backend, self.capability = "hip", int(re.match(r"gfx(\d\d)", name).group(1))
+        else:
+            raise ValueError(f"unknown target {name}: expected e.g. sm80 or gfx90a")
+        self.cubin = cubin
+
+    def available(self):
+        if self.backend == "hip":
+            return hasattr(compiler._triton, "translate_llvmir_to_hsaco")
+        return True
+
+    def stages(self, case, signature, constants, config):
+        cc = self.capability
+        stages = [("ttir", lambda fn: compiler.ast_to_ttir(fn, signature, config, constants)),
+                  ("ttgir", lambda mod: compiler.ttir_to_ttgir(mod, case.num_warps, case.num_stages, cc)),
+                  ("llir", lambda mod: compiler.ttgir_to_llir(mod, None, cc))]
+        if self.backend == "hip":
+            stages.append(("amdgcn", lambda llir: compiler.llir_to_amdgcn_and_hsaco(llir, self.name)[0]))
+        else:
+            stages.append(("ptx", lambda llir: compiler.llir_to_ptx(llir, cc)))
+            if self.cubin:
+                stages.append(("cubin", lambda ptx: compiler.ptx_to_cubin(ptx, cc)))
+        return stages
+
+
+def _reset_peak_rss():
+    # resets VmHWM (Linux >= 4.0); elsewhere, the peak RSS is the process' peak
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _peak_rss_kb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def compile_case(case, target):
+    """
+    Compile :code:`case` for :code:`target`, stage by stage.
+
+    :return: a dict with, per stage, its time (:code:`"time_s"`), the size and op count of
+        its output, the time of each pass (:code:`"passes"`), and the peak RSS (:code:`"peak_rss_kb"`)
+    """
+    fn, signature, constants, config = case.compile_args()
+    was_enabled = compile_trace.enabled()
+    compile_trace.enable()
+    n_events = len(compile_trace.events())
+    _reset_peak_rss()
+    module = fn
+    try:
+        for ir, run in target.stages(case, signature, constants, config):
+            with compile_trace.stage(case.name, ir) as event:
+                module = run(module)
+            event.set_output(module)
+    finally:
+        if not was_enabled:
+            compile_trace.disable()
+    result = {"stages": dict(), "passes": collections.defaultdict(float), "peak_rss_kb": _peak_rss_kb()}
+    for event in compile_trace.events()[n_events:]:
+        if event["cat"] == "stage":
+            args = event["args"]
+            result["stages"][event["name"]] = {"time_s": event["dur"] * 1e-6, "size": args["size"],
+                                               "ops": args.get("ops")}
+        else:
+            result["passes"][event["name"]] += event["dur"] * 1e-6
+    return result
+
+
+def measure(cases, targets, repeat=3, passes=False):
+    """
+    Compile every case for every target :code:`repeat` times.
+
+    :return: the results, in the format of :code:`triton.tools.regression`
+    """
+    results = collections.OrderedDict()
+
+    def add(name, value, unit):
+        results.setdefault(name, {"samples": [], "unit": unit, "higher_is_better": False})["samples"].append(value)
+    for case in cases:
+        for target in targets:
+            for _ in range(repeat):
+                result = compile_case(case, target)
+                prefix = f"{case.name}/{target.name}"
+                for stage, stats in result["stages"].items():
+                    add(f"{prefix}/{stage}", stats["time_s"], "s")
+                    add(f"{prefix}/{stage}.size", stats["size"], "B")
+                if passes:
+                    for name, time_s in result["passes"].items():
+                        add(f"{prefix}/pass/{name}", time_s, "s")
+                add(f"{prefix}/total", sum(stats["time_s"] for stats in result["stages"].values()), "s")
+                add(f"{prefix}/peak_rss", result["peak_rss_kb"], "KB")
+    return results
+
+
+def _print_results(results):
+    rows = collections.OrderedDict()
+    for name, result in results.items():
+        if "/pass/" not in name:
+            prefix, metric = name.rsplit("/", 1)
+            rows.setdefault(prefix, collections.OrderedDict())[metric] = statistics.median(result["samples"])
+    for prefix, row in rows.items():
+        stages = ", ".join(f"{metric} {value * 1e3:.1f}ms" for metric, value in row.items()
+                           if metric not in ("total", "peak_rss") and not metric.endswith(".size"))
+        print(f"{prefix}: {row['total'] * 1e3:.1f}ms ({stages}); peak RSS {row['peak_rss'] / 1024:.0f}MB")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the compilation of the tutorials' and triton.ops' kernels, "
+                                                 "without a GPU")
+    parser.add_argument('--target', action='append', help="Target, e.g. sm80 or gfx90a (default: sm80); repeatable")
+    parser.add_argument('--cubin', action='store_true', help="Also assemble PTX into cubins (requires ptxas)")
+    parser.add_argument('-k', '--filter', help="Only compile the kernels whose name matches this glob pattern")
+    parser.add_argument('--repeat', type=int, default=3, help="Compilations per kernel and target (default: 3)")
+    parser.add_argument('--passes', action='store_true', help="Also report the time of each MLIR pass")
+    parser.add_argument('--tutorials', default=TUTORIALS_DIR, help="Directory of the tutorials")
+    parser.add_argument('-o', '--output', help="Write the results to this JSON file (see triton.tools.regression)")
+    args = parser.parse_args()
+    TUTORIALS_DIR = args.tutorials
+    targets = [Target(name, cubin=args.cubin) for name in args.target or ["sm80"]]
+    for target in targets:
+        if not target.available():
+            print(f"skipping {target.name}: this build of triton has no {target.backend} backend")
+    targets = [target for target in targets if target.available()]
+    if not targets:
+        sys.exit("no available target")
+    cases = [case for case in SUITE if not args.filter or fnmatch.fnmatch(case.name, args.filter)]
+    if not cases:
+        sys.exit(f"no kernel matches {args.filter}")
+    # initialize LLVM and MLIR before measuring
+    compile_case(cases[0], targets[0])
+    results = measure(cases, targets, args.repeat, args.passes)
+    _print_results(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=1)
+    sys.exit(0)
@@ -0,0 +1,366 @@
+import argparse
+import fnmatch
+import importlib.util
+import itertools
+import json
+import math
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+import triton
+
+# -----------------------------------------------------------------------------
+# Performance regression suite
+# -----------------------------------------------------------------------------
+#
+# Benchmarks are discovered in Python files: functions registered with
+# `@benchmark(...)`, and the `perf_report` marks of e.g. the tutorials. Each
+# point of a benchmark (one set of arguments) is a `Case`, measured `repeat`
+# times to get a sample of its values.
+#
+# `record` stores the samples of every case in a JSON baseline per device;
+# `compare` measures them again, and flags the cases whose median got worse
+# by more than `threshold`, if the difference is significant according to a
+# one-sided Mann-Whitney U test. Cases with too few samples for the test to
+# ever be significant are only compared against `threshold` -- or, if their
+# baseline has one, against its absolute `tolerance`. Baselines measured on
+# this host also store the GPU clocks (MHz) they were recorded at, so that
+# benchmarks can require the same clocks to be locked before comparing.
+#
+#     python -m triton.tools.regression record test/regression --baselines test/regression/baselines
+#     python -m triton.tools.regression compare test/regression --baselines test/regression/baselines
+#
+# `compare --results` compares results saved by `measure -o`, or synthetic
+# ones, without running any benchmark.
+
+SCHEMA_VERSION = 1
+
+# benchmarks registered by `@benchmark`, while importing a file in `discover`
+_registry = None
+
+
+class Case:
+    """
+    One point of a benchmark.
+
+    :param fn: function returning one measured value
+    :param unit: unit of the values
+    :param higher_is_better: whether higher values are better (e.g. TFLOPS), or worse (e.g. ms)
+    """
+
+    def __init__(self, name, fn, unit, higher_is_better):
+        self.name = name
+        self.fn = fn
+        self.unit = unit
+        self.higher_is_better = higher_is_better
+
+
+def _case_name(prefix, args):
+    return prefix + "/" + ",".join(f"{k}={v}" for k, v in args.items())
+
+
+def benchmark(params, unit, higher_is_better=True):
+    """
+    Register the decorated function as a benchmark of the regression suite, called
+    with each dict of arguments in :code:`params` and returning one measured value.
+    Its cases are also listed by the :code:`cases` attribute of the function.
+    """
+    def decorator(fn):
+        fn.cases = [Case(_case_name(fn.__name__, args), _bind(fn, args), unit, higher_is_better) for args in params]
+        if _registry is not None:
+            _registry.extend(fn.cases)
+        return fn
+    return decorator
+
+
+def _bind(fn, kwargs):
+    return lambda: fn(**kwargs)
+
+
+def _mark_cases(mark):
+    benchmarks = mark._benchmarks()
+    cases = []
+    for bench in benchmarks:
+        # perf_report benchmarks return either a value, or a (value, min, max) tuple
+        lower_is_better = bench.ylabel.strip().lower() in ["ms", "us", "s"] or "time" in bench.ylabel.lower()
+        for x, y in itertools.product(bench.x_vals, bench.line_vals):
+            args = dict({x_name: x for x_name in bench.x_names}, **{bench.line_arg: y})
+            fn = _bind(mark.fn, dict(args, **bench.args))
+            cases.append(Case(_case_name(bench.plot_name or mark.fn.__name__, args),
+                              lambda fn=fn: _first(fn()), bench.ylabel, not lower_is_better))
+    return cases
+
+
+def _first(ret):
+    return ret[0] if isinstance(ret, (tuple, list)) else ret
+
+
+def _python_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.endswith(".py") and not name.startswith("_"):
+                    yield os.path.join(path, name)
+        else:
+            yield path
+
+
+def discover(paths):
+    """
+    Import the Python files at :code:`paths` (files, or directories of files) and return
+    the cases of the benchmarks they define. :code:`perf_report` marks are collected, not run.
+    """
+    global _registry
+    cases = []
+    for path in _python_files(paths):
+        _registry = []
+        try:
+            with triton.testing.collect_marks() as marks:
+                name = "_regression_" + re.sub(r"\W", "_", os.path.splitext(os.path.basename(path))[0])
+                spec = importlib.util.spec_from_file_location(name, path)
+                module = importlib.util.module_from_spec(spec)
+                spec.loader.exec_module(module)
+            cases += _registry
+            for mark in marks:
+                cases += _mark_cases(mark)
+        finally:
+            _registry = None
+    return cases
+
+
+def measure(cases, repeat=5, pattern=None):
+    """Run every case matching the glob :code:`pattern` :code:`repeat` times, and return their results."""
+    results = dict()
+    for case in cases:
+        if pattern and not fnmatch.fnmatch(case.name, pattern):
+            continue
+        samples = [float(case.fn()) for _ in range(repeat)]
+        results[case.name] = {"samples": samples, "unit": case.unit, "higher_is_better": case.higher_is_better}
+    return results
+
+
+# -----------------------------------------------------------------------------
+# Baselines
+# -----------------------------------------------------------------------------
+
+
+def device_name():
+    import torch
+    return re.sub(r"[^a-z0-9]+", "-", torch.cuda.get_device_name().lower()).strip("-")
+
+
+def baseline_path(directory, device):
+    """
+    Return the path of the baseline of :code:`device` in :code:`directory`: the file named
+    after the device if it exists, otherwise the one with the longest name contained in the
+    device's (e.g. :code:`a100.json` for :code:`nvidia-a100-sxm4-40gb`).
+    """
+    exact = os.path.join(directory, f"{device}.json")
+    if os.path.exists(exact) or not os.path.isdir(directory):
+        return exact
+    candidates = [name[:-len(".json")] for name in os.listdir(directory) if name.endswith(".json")]
+    candidates = [name for name in candidates if name in device]
+    if not candidates:
+        return exact
+    return os.path.join(directory, max(candidates, key=len) + ".json")
+
+
+def load_baseline(path):
+    with open(path) as f:
+        baseline = json.load(f)
+    if baseline.get("schema") != SCHEMA_VERSION:
+        raise ValueError(f"{path}: unsupported baseline schema {baseline.get('schema')}")
+    return baseline
+
+
+def current_clocks():
+    """Return the current SM and memory clocks of the GPU, in MHz, or None if :code:`nvidia-smi` can't tell."""
+    try:
+        sm, memory = triton.testing.nvsmi_attr(["clocks.current.sm", "clocks.current.memory"])
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        return None
+    return {"sm": sm, "memory": memory}
+
+
+def save_baseline(path, results, device, update=True, clocks=None):
+    """
+    Store :code:`results` in the baseline at :code:`path`. With :code:`update`, the other
+    cases of an existing baseline are kept.
+
+    :param clocks: the GPU clocks the results were measured at (see :code:`current_clocks`)
+    """
+    previous = load_baseline(path) if update and os.path.exists(path) else {"results": dict()}
+    baseline = {
+        "schema": SCHEMA_VERSION,
+        "device": device,
+        "triton": triton.__version__,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": dict(previous["results"], **results),
+    }
+    clocks = clocks or previous.get("clocks")
+    if clocks:
+        baseline["clocks"] = clocks
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=1, sort_keys=True)
+        f.write("\n")
+
+
+# -----------------------------------------------------------------------------
+# Comparison
+# -----------------------------------------------------------------------------
+
+
+def mann_whitney_u(xs, ys):
+    """
+    One-sided p-value of the Mann-Whitney U test that values of :code:`xs` tend to be
+    greater than values of :code:`ys`, with the normal approximation (corrected for ties).
+    """
+    n_x, n_y = len(xs), len(ys)
+    u = sum(1.0 if x > y else 0.5 if x == y else 0.0 for x in xs for y in ys)
+    n = n_x + n_y
+    ties = [len(list(group)) for _, group in itertools.groupby(sorted(xs + ys))]
+    variance = n_x * n_y / 12 * (n + 1 - sum(t ** 3 - t for t in ties) / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (u - n_x * n_y / 2 - 0.5) / math.sqrt(variance)
+    return 1 - statistics.NormalDist().cdf(z)
+
+
+def _min_p_value(n_x, n_y):
+    # the smallest p-value `mann_whitney_u` can return for these sample sizes
+    return mann_whitney_u([1.0] * n_x, [0.0] * n_y)
+
+
+class Comparison:
+    """
+    The comparison of a case with its baseline.
+
+    :ivar change: relative change of the median, positive when it got worse
+    :ivar p_value: one-sided p-value that it got worse, or :code:`None` if the samples are too small to tell
+    :ivar status: "regression", "improvement", "unchanged", "new" (no baseline) or "missing" (not measured)
+
+    Baselines whose samples are too few to be tested may have an absolute :code:`"tolerance"`, used
+    instead of :code:`threshold`.
+    """
+
+    def __init__(self, name, baseline, current, threshold=0.05, alpha=0.01):
+        self.name = name
+        self.baseline = None if baseline is None else statistics.median(baseline["samples"])
+        self.current = None if current is None else statistics.median(current["samples"])
+        self.change = None
+        self.p_value = None
+        if baseline is None or current is None:
+            self.status = "new" if baseline is None else "missing"
+            return
+        # `worse` are the samples that would be worse in case of a regression
+        worse, better = current["samples"], baseline["samples"]
+        if baseline["higher_is_better"]:
+            worse, better = better, worse
+        reference = statistics.median(better)
+        self.change = (statistics.median(worse) - reference) / reference if reference else 0.0
+        p_worse, p_better = mann_whitney_u(worse, better), mann_whitney_u(better, worse)
+        testable = _min_p_value(len(worse), len(better)) < alpha
+        if testable:
+            self.p_value = p_worse
+        tolerance = baseline.get("tolerance")
+        if not testable and tolerance is not None:
+            # e.g. single measurements, whose relative noise is large for small values
+            delta = statistics.median(worse) - reference
+            self.status = "regression" if delta > tolerance else "improvement" if delta < -tolerance else "unchanged"
+        elif self.change > threshold and (not testable or p_worse < alpha):
+            self.status = "regression"
+        elif self.change < -threshold and (not testable or p_better < alpha):
+            self.status = "improvement"
+        else:
+            self.status = "unchanged"
+
+    def __str__(self):
+        def fmt(value):
+            return "-" if value is None else f"{value:.4g}"
+        change = "-" if self.change is None else f"{self.change:+.1%}"
+        p_value = "-" if self.p_value is None else f"{self.p_value:.3f}"
+        return f"{self.status:<12} {self.name}: {fmt(self.baseline)} -> {fmt(self.current)} ({change}, p={p_value})"
+
+
+def compare(baseline, results, threshold=0.05, alpha=0.01):
+    """Compare :code:`results` with the results of :code:`baseline`, case by case."""
+    names = sorted(set(baseline["results"]) | set(results))
+    return [Comparison(name, baseline["results"].get(name), results.get(name), threshold, alpha) for name in names]
+
+
+# -----------------------------------------------------------------------------
+# Command line
+# -----------------------------------------------------------------------------
+
+
+def _results(args):
+    if getattr(args, "results", None):
+        with open(args.results) as f:
+            return json.load(f)
+    return measure(discover(args.paths), args.repeat, args.filter)
+
+
+def record_command(args):
+    results = _results(args)
+    device = args.device or device_name()
+    path = baseline_path(args.baselines, device)
+    # results read from a file weren't measured at this host's clocks
+    clocks = None if args.results else current_clocks()
+    save_baseline(path, results, device, update=not args.replace, clocks=clocks)
+    print(f"recorded {len(results)} cases to {path}")
+
+
+def measure_command(args):
+    results = _results(args)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=1)
+    print(f"measured {len(results)} cases to {args.output}")
+
+
+def compare_command(args):
+    path = baseline_path(args.baselines, args.device or device_name())
+    comparisons = compare(load_baseline(path), _results(args), args.threshold, args.alpha)
+    if args.filter:
+        comparisons = [c for c in comparisons if fnmatch.fnmatch(c.name, args.filter)]
+    for comparison in comparisons:
+        if args.verbose or comparison.status != "unchanged":
+            print(comparison)
+    n_regressions = sum(c.status == "regression" for c in comparisons)
+    print(f"{len(comparisons)} cases compared with {path}: {n_regressions} regressions")
+    return 1 if n_regressions else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Record and compare performance baselines")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    descriptions = {'record': "Measure the benchmarks and store the results in the device's baseline",
+                    'measure': "Measure the benchmarks and write the results to a JSON file",
+                    'compare': "Measure the benchmarks and flag regressions with respect to the baseline"}
+    for command, description in descriptions.items():
+        subparser = subparsers.add_parser(command, help=description)
+        subparser.add_argument('paths', nargs='*', help="Python files, or directories of them, defining benchmarks")
+        subparser.add_argument('--repeat', type=int, default=5, help="Samples per case (default: 5)")
+        subparser.add_argument('--filter', help="Only run the cases whose name matches this glob pattern")
+        if command != 'measure':
+            subparser.add_argument('--baselines', required=True, help="Directory of the baselines")
+            subparser.add_argument('--device', help="Device name of the baseline (default: the current GPU's)")
+            subparser.add_argument('--results', help="Use the results in this JSON file instead of measuring")
+    subparsers.choices['measure'].add_argument('-o', '--output', required=True)
+    subparsers.choices['record'].add_argument('--replace', action='store_true',
+                                              help="Drop the cases of the baseline that weren't measured")
+    compare_parser = subparsers.choices['compare']
+    compare_parser.add_argument('--threshold', type=float, default=0.05,
+                                help="Relative slowdown of the median to flag (default: 0.05)")
+    compare_parser.add_argument('--alpha', type=float, default=0.01, help="Significance level (default: 0.01)")
+    compare_parser.add_argument('-v', '--verbose', action='store_true', help="Also print unchanged cases")
+    args = parser.parse_args()
+    # benchmarks register with the imported module, not with __main__
+    from triton.tools import regression
+    commands = {'record': regression.record_command, 'measure': regression.measure_command,
+                'compare': regression.compare_command}
+    sys.exit(commands[args.command](args) or 0)
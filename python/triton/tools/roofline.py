@@ -0,0 +1,218 @@
+import argparse
+import collections
+import contextlib
+import functools
+import json
+
+import torch
+
+import triton
+
+# -----------------------------------------------------------------------------
+# Roofline reports
+# -----------------------------------------------------------------------------
+#
+# `measure` benchmarks one launch of a compiled kernel and puts its runtime in
+# front of the device's peaks (`triton.testing.get_dram_gbps` and
+# `get_max_{tensorcore,simd}_tflops`): achieved TFLOP/s and GB/s, arithmetic
+# intensity, whether the launch is compute- or memory-bound on the roofline,
+# its efficiency -- the fraction of the roofline's attainable performance it
+# reaches -- and its headroom, the time it would save running at the roofline.
+#
+# FLOPs must be given, since they can't be told from the kernel; bytes default
+# to the compulsory traffic of the launch, i.e. the size of its tensor
+# arguments. Without FLOPs, a launch is assumed to be memory-bound.
+#
+# Launches measured within `collect()` are aggregated per kernel, ranked by
+# total headroom, i.e. by what optimizing each kernel can gain:
+#
+#     with roofline.collect() as report:
+#         run_benchmarks()
+#     print(report.table())
+#     report.dump("roofline.json")    # python -m triton.tools.roofline roofline.json
+
+
+def tensor_bytes(args):
+    """Return the total size, in bytes, of the tensors in :code:`args`."""
+    return sum(arg.numel() * arg.element_size() for arg in args if isinstance(arg, torch.Tensor))
+
+
+def uses_tensor_cores(kernel):
+    """Return whether the compiled :code:`kernel` has matrix multiplications (:code:`tt.dot`)."""
+    return "tt.dot" in kernel.asm.get("ttgir", "")
+
+
+@functools.lru_cache()
+def device_peaks(device, dtype, tensor_cores):
+    """
+    Return the peak TFLOP/s for :code:`dtype` (on tensor cores, or not) and the DRAM GB/s of :code:`device`.
+    The peak TFLOP/s are None if unknown for this dtype.
+    """
+    gbps = triton.testing.get_dram_gbps(device=device)
+    try:
+        if tensor_cores:
+            tflops = triton.testing.get_max_tensorcore_tflops(dtype, device=device)
+        else:
+            tflops = triton.testing.get_max_simd_tflops(dtype, device=device)
+    except (RuntimeError, AssertionError):
+        tflops = None
+    return tflops, gbps
+
+
+class LaunchReport:
+    """
+    The position of a kernel launch on the roofline of its device.
+
+    :param time_ms: runtime of the launch
+    :param flops: floating-point operations of the launch, or None if unknown
+    :param nbytes: bytes moved to and from DRAM by the launch
+    :param peak_tflops: peak compute throughput, or None if unknown
+    :param peak_gbps: peak DRAM bandwidth
+    """
+
+    def __init__(self, name, time_ms, flops, nbytes, peak_tflops, peak_gbps):
+        self.name = name
+        self.time_ms = time_ms
+        self.flops = flops
+        self.nbytes = nbytes
+        self.peak_tflops = peak_tflops
+        self.peak_gbps = peak_gbps
+
+    @property
+    def tflops(self):
+        return None if self.flops is None else self.flops / self.time_ms * 1e-9
+
+    @property
+    def gbps(self):
+        return self.nbytes / self.time_ms * 1e-6
+
+    @property
+    def intensity(self):
+        """Arithmetic intensity, in FLOP/B."""
+        return None if self.flops is None or not self.nbytes else self.flops / self.nbytes
+
+    @property
+    def ridge(self):
+        """Arithmetic intensity above which the device is compute-bound, in FLOP/B."""
+        return None if self.peak_tflops is None else self.peak_tflops * 1e3 / self.peak_gbps
+
+    @property
+    def bound(self):
+        if self.intensity is None or self.ridge is None or self.intensity < self.ridge:
+            return "memory"
+        return "compute"
+
+    @property
+    def efficiency(self):
+        """Fraction of the roofline's attainable performance at this intensity."""
+        if self.bound == "compute":
+            return self.tflops / self.peak_tflops
+        return self.gbps / self.peak_gbps
+
+    @property
+    def headroom_ms(self):
+        """Time the launch would save running at the roofline."""
+        return self.time_ms * max(0.0, 1 - self.efficiency)
+
+    def as_dict(self):
+        return {"name": self.name, "time_ms": self.time_ms, "flops": self.flops, "nbytes": self.nbytes,
+                "peak_tflops": self.peak_tflops, "peak_gbps": self.peak_gbps}
+
+
+class Roofline:
+    """Launch reports of a benchmark run, aggregated per kernel."""
+
+    def __init__(self, reports=()):
+        self.reports = list(reports)
+
+    def add(self, report):
+        self.reports.append(report)
+
+    def summary(self):
+        """
+        Return, per kernel, its launches, total time and headroom, time-weighted efficiency, and
+        the bound most of its time is spent under, sorted by decreasing headroom.
+        """
+        by_name = collections.OrderedDict()
+        for report in self.reports:
+            by_name.setdefault(report.name, []).append(report)
+        rows = []
+        for name, reports in by_name.items():
+            time_ms = sum(report.time_ms for report in reports)
+            bound_ms = collections.Counter()
+            for report in reports:
+                bound_ms[report.bound] += report.time_ms
+            rows.append({
+                "name": name,
+                "launches": len(reports),
+                "time_ms": time_ms,
+                "headroom_ms": sum(report.headroom_ms for report in reports),
+                "efficiency": sum(report.efficiency * report.time_ms for report in reports) / time_ms,
+                "bound": bound_ms.most_common(1)[0][0],
+            })
+        return sorted(rows, key=lambda row: row["headroom_ms"], reverse=True)
+
+    def table(self):
+        rows = self.summary()
+        width = max([len("kernel")] + [len(row["name"]) for row in rows])
+        lines = [f"{'kernel':<{width}}  launches  time (ms)  headroom (ms)  efficiency  bound"]
+        for row in rows:
+            lines.append(f"{row['name']:<{width}}  {row['launches']:>8}  {row['time_ms']:>9.3f}  "
+                         f"{row['headroom_ms']:>13.3f}  {row['efficiency']:>10.1%}  {row['bound']}")
+        return "\n".join(lines)
+
+    def dump(self, path):
+        with open(path, "w") as f:
+            json.dump([report.as_dict() for report in self.reports], f, indent=1)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls(LaunchReport(**report) for report in json.load(f))
+
+
+# reports being collected (see `collect`)
+_collecting = []
+
+
+@contextlib.contextmanager
+def collect():
+    """Aggregate the launches measured within this context into the returned :code:`Roofline`."""
+    roofline = Roofline()
+    _collecting.append(roofline)
+    try:
+        yield roofline
+    finally:
+        _collecting.remove(roofline)
+
+
+def measure(kernel, grid, args, flops=None, nbytes=None, name=None, dtype=None, warmup=25, rep=100):
+    """
+    Benchmark the launch of the compiled :code:`kernel` (as returned by launching a :code:`@triton.jit`
+    function) on :code:`grid` with :code:`args`, its non-constexpr arguments, on the current device.
+
+    :param flops: floating-point operations of the launch
+    :param nbytes: bytes moved to and from DRAM (default: the size of the tensors in :code:`args`)
+    :param dtype: data type of the computation, for its peak TFLOP/s (default: that of the first
+        floating-point tensor in :code:`args`)
+    :return: a :code:`LaunchReport`
+    """
+    if nbytes is None:
+        nbytes = tensor_bytes(args)
+    if dtype is None:
+        dtypes = [arg.dtype for arg in args if isinstance(arg, torch.Tensor) and arg.is_floating_point()]
+        dtype = dtypes[0] if dtypes else torch.float32
+    grid = tuple(grid) + (1,) * (3 - len(grid))
+    peak_tflops, peak_gbps = device_peaks(torch.cuda.current_device(), dtype, uses_tensor_cores(kernel))
+    time_ms = triton.testing.bencher().run(lambda: kernel[grid](*args), warmup, rep).median
+    report = LaunchReport(name or kernel.metadata["name"], time_ms, flops, nbytes, peak_tflops, peak_gbps)
+    for roofline in _collecting:
+        roofline.add(report)
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Print a roofline report saved by Roofline.dump")
+    parser.add_argument('path')
+    args = parser.parse_args()
+    print(Roofline.load(args.path).table())
@@ -0,0 +1,37 @@
+import argparse
+import os
+import tempfile
+
+from triton.runtime import search, tuning_cache, workload
+
+# strategies selectable from the command line
+SEARCH_STRATEGIES = {'exhaustive': search.Exhaustive, 'halving': search.SuccessiveHalving, 'racing': search.Racing}
+
+
+def tune(trace, output, cache_dir, strategy=None):
+    # tuning tables are written to `cache_dir`, and exported from there
+    os.environ['TRITON_CACHE_DIR'] = cache_dir
+    entries = workload.load(trace)
+    strategy = None if strategy is None else SEARCH_STRATEGIES[strategy]()
+    autotuners = workload.replay(entries, persistent=True, search=strategy)
+    for (name, _), autotuner in autotuners.items():
+        print(f"{name}: {len(autotuner.cache)} keys tuned")
+    n_tables = tuning_cache.export_results(output, cache_dir)
+    print(f"exported {n_tables} tuning tables to {output}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Tune the autotuned kernels of a workload trace recorded with $TRITON_RECORD_WORKLOAD, "
+                    "and export the results (see `python -m triton.tools.cache import-tuning`)")
+    parser.add_argument('trace', help="Workload trace, in JSON lines")
+    parser.add_argument('-o', '--output', required=True, help="Tuning database to write")
+    parser.add_argument('--cache-dir', help="Kernel cache to tune into (default: a temporary directory)")
+    parser.add_argument('--search', choices=list(SEARCH_STRATEGIES),
+                        help="Search strategy overriding the autotuners' own")
+    args = parser.parse_args()
+    if args.cache_dir is not None:
+        tune(args.trace, args.output, args.cache_dir, args.search)
+    else:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            tune(args.trace, args.output, cache_dir, args.search)